@@ -0,0 +1,407 @@
+#!/usr/bin/env python
+"""
+Conversion benchmark.
+
+Converts a real corpus (the documentation and the examples) and generated
+corpora (many tiny files, a few huge files, code heavy pages, table heavy
+pages, and frontmatter heavy pages) with the CLI in single file, batch,
+stream (a document piped to stdin), JSON lines, and critic dump modes.  Each run writes a timings report
+(see `--timings`), so end to end and per stage throughput can be reported.
+Everything happens in a temporary folder, and nothing needs the network.
+Results are printed (or saved) as JSON.
+
+    python benchmarks/bench_convert.py --runs 5 --corpus tiny --corpus huge --mode batch
+
+Licensed under MIT
+Copyright (c) 2014 - 2015 Isaac Muse <isaacmuse@gmail.com>
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+from __future__ import division
+import argparse
+import codecs
+import glob
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+sys.path.insert(0, ROOT)
+from pymdown.__version__ import version  # noqa: E402
+
+MODES = ('single', 'batch', 'stream', 'jsonl', 'critic')
+
+# Modes that start a process for each file
+PER_FILE = ('single', 'stream')
+
+# Generated corpora are always the same for the same scale
+SEED = 1
+
+WORDS = (
+    'lorem', 'ipsum', 'dolor', 'sit', 'amet', 'consectetur', 'adipiscing', 'elit', 'sed', 'do', 'eiusmod',
+    'tempor', 'incididunt', 'ut', 'labore', 'et', 'dolore', 'magna', 'aliqua', 'enim', 'ad', 'minim', 'veniam',
+    'quis', 'nostrud', 'exercitation', 'ullamco', 'laboris', 'nisi', 'aliquip', 'ex', 'ea', 'commodo', 'consequat'
+)
+
+# Inline markup mixed into generated paragraphs (including critic marks for critic dumps)
+INLINE = (
+    '**%s**', '*%s*', '`%s`', '[%s](http://example.com)', '~~%s~~', '==%s==', '{++%s++}', '{--%s--}', '{==%s==}'
+)
+
+
+def get_words(rand, count):
+    """Get random words."""
+
+    return [rand.choice(WORDS) for _ in range(count)]
+
+
+def get_paragraph(rand, count=60):
+    """Get a paragraph with some inline markup."""
+
+    words = get_words(rand, count)
+    for index in range(0, len(words), 8):
+        words[index] = rand.choice(INLINE) % words[index]
+    return ' '.join(words).capitalize() + '.\n'
+
+
+def get_heading(rand, level=2):
+    """Get a heading."""
+
+    return '%s %s\n' % ('#' * level, ' '.join(get_words(rand, 4)).title())
+
+
+def get_list(rand, items=5):
+    """Get a list."""
+
+    return ''.join('- %s\n' % ' '.join(get_words(rand, 8)) for _ in range(items))
+
+
+def get_code(rand, lines=20):
+    """Get a fenced Python code block."""
+
+    code = ['```python\n']
+    for index in range(lines):
+        if index % 5 == 0:
+            code.append('def %s(%s):\n' % ('_'.join(get_words(rand, 2)), ', '.join(get_words(rand, 2))))
+        else:
+            code.append('    %s = "%s" + %d\n' % (rand.choice(WORDS), ' '.join(get_words(rand, 3)), index))
+    code.append('```\n')
+    return ''.join(code)
+
+
+def get_table(rand, rows=30, cols=5):
+    """Get a table."""
+
+    table = [
+        '| %s |\n' % ' | '.join(w.title() for w in get_words(rand, cols)),
+        '|%s\n' % ('---|' * cols)
+    ]
+    for index in range(rows):
+        table.append('| %d | %s |\n' % (index, ' | '.join(get_words(rand, cols - 1))))
+    return ''.join(table)
+
+
+def get_frontmatter(rand, keys=100):
+    """Get YAML frontmatter with nested values."""
+
+    frontmatter = ['---\n', 'title: %s\n' % ' '.join(get_words(rand, 4)).title()]
+    for index in range(keys):
+        frontmatter.append('%s_%d:\n' % (rand.choice(WORDS), index))
+        frontmatter.append('  name: %s\n' % ' '.join(get_words(rand, 3)))
+        frontmatter.append('  tags: [%s]\n' % ', '.join(get_words(rand, 4)))
+        frontmatter.append('  weight: %d\n' % rand.randint(0, 1000))
+    frontmatter.append('---\n')
+    return ''.join(frontmatter)
+
+
+def get_page(rand, sections=5, code=0, tables=0):
+    """Get a page of headings, paragraphs, and lists, with code blocks and tables between them."""
+
+    page = [get_heading(rand, 1)]
+    for _ in range(sections):
+        page.append(get_heading(rand))
+        page.append(get_paragraph(rand))
+        page.append(get_list(rand))
+        for _ in range(code):
+            page.append(get_code(rand))
+            page.append(get_paragraph(rand, 20))
+        for _ in range(tables):
+            page.append(get_table(rand))
+            page.append(get_paragraph(rand, 20))
+    return '\n'.join(page)
+
+
+def write_pages(folder, pages):
+    """Write the pages to the folder."""
+
+    os.makedirs(folder)
+    for index, page in enumerate(pages):
+        with codecs.open(os.path.join(folder, 'page%04d.md' % index), 'w', encoding='utf-8') as f:
+            f.write(page)
+
+
+def make_real(folder, rand, scale):
+    """Copy the documentation and the examples."""
+
+    shutil.copytree(os.path.join(ROOT, 'docs', 'src', 'markdown'), os.path.join(folder, 'docs'))
+    os.makedirs(os.path.join(folder, 'examples'))
+    for name in glob.glob(os.path.join(ROOT, 'examples', '*.md')):
+        shutil.copy(name, os.path.join(folder, 'examples'))
+
+
+def make_tiny(folder, rand, scale):
+    """Many tiny files."""
+
+    write_pages(folder, [get_heading(rand, 1) + '\n' + get_paragraph(rand, 20) for _ in range(int(500 * scale))])
+
+
+def make_huge(folder, rand, scale):
+    """A few huge files."""
+
+    write_pages(folder, [get_page(rand, int(300 * scale), code=1, tables=1) for _ in range(3)])
+
+
+def make_code(folder, rand, scale):
+    """Pages that are mostly code blocks."""
+
+    write_pages(folder, [get_page(rand, 5, code=6) for _ in range(int(20 * scale))])
+
+
+def make_tables(folder, rand, scale):
+    """Pages that are mostly tables."""
+
+    write_pages(folder, [get_page(rand, 5, tables=4) for _ in range(int(20 * scale))])
+
+
+def make_frontmatter(folder, rand, scale):
+    """Small pages with a lot of frontmatter."""
+
+    write_pages(folder, [get_frontmatter(rand) + '\n' + get_page(rand, 1) for _ in range(int(100 * scale))])
+
+
+CORPORA = (
+    ('real', make_real),
+    ('tiny', make_tiny),
+    ('huge', make_huge),
+    ('code', make_code),
+    ('tables', make_tables),
+    ('frontmatter', make_frontmatter)
+)
+
+
+def get_files(folder):
+    """Get the Markdown files in the folder (relative to it)."""
+
+    files = []
+    for base, dirs, names in os.walk(folder):
+        dirs.sort()
+        for name in sorted(names):
+            if name.endswith('.md'):
+                files.append(os.path.relpath(os.path.join(base, name), folder))
+    return files
+
+
+def get_env():
+    """Get the environment with the package on the path."""
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([ROOT] + ([env['PYTHONPATH']] if env.get('PYTHONPATH') else []))
+    return env
+
+
+class Runner(object):
+    """Run the CLI on a corpus and gather the wall time and timings reports."""
+
+    def __init__(self, work, env, jobs):
+        """Initialize."""
+
+        self.settings = os.path.join(work, 'pymdown.yml')
+        self.reports = os.path.join(work, 'reports')
+        self.env = env
+        self.jobs = jobs
+        self.count = 0
+        os.makedirs(self.reports)
+
+    def call(self, folder, args, stdin=None, jsonl=False):
+        """Run the CLI in the folder and get whether it passed, how long it took, and its report."""
+
+        self.count += 1
+        report = os.path.join(self.reports, 'report%d.json' % self.count)
+        cmd = [
+            sys.executable, '-m', 'pymdown.cli', '-q', '--settings', self.settings, '--timings', report
+        ] + args
+        with open(os.devnull, 'wb') as devnull:
+            start = time.time()
+            proc = subprocess.Popen(
+                cmd, stdin=subprocess.PIPE if stdin is not None else None, stdout=subprocess.PIPE,
+                stderr=devnull, env=self.env, cwd=folder
+            )
+            out = proc.communicate(stdin)[0]
+            elapsed = time.time() - start
+        ok = proc.returncode == 0
+        if jsonl:
+            # Responses are checked as well since failed records don't stop the stream.
+            ok = ok and all(json.loads(line)['status'] == 'ok' for line in out.decode('utf-8').splitlines())
+        try:
+            with codecs.open(report, 'r', encoding='utf-8') as f:
+                report = json.load(f)
+        except Exception:
+            report = None
+        return ok, elapsed, report
+
+    def run_single(self, folder, files):
+        """Convert each file with its own invocation."""
+
+        results = [self.call(folder, [name, '-o', os.path.splitext(name)[0] + '.html']) for name in files]
+        return (
+            all(r[0] for r in results),
+            sum(r[1] for r in results),
+            [r[2] for r in results]
+        )
+
+    def run_batch(self, folder, files):
+        """Convert the files in one batch."""
+
+        ok, elapsed, report = self.call(folder, ['-b', '-j', str(self.jobs)] + files)
+        return ok, elapsed, [report]
+
+    def run_stream(self, folder, files):
+        """Pipe each file into its own invocation."""
+
+        results = []
+        for name in files:
+            with open(os.path.join(folder, name), 'rb') as f:
+                text = f.read()
+            results.append(self.call(folder, ['--basepath', os.path.dirname(name) or '.'], text))
+        return (
+            all(r[0] for r in results),
+            sum(r[1] for r in results),
+            [r[2] for r in results]
+        )
+
+    def run_jsonl(self, folder, files):
+        """Convert the files as a stream of JSON lines records."""
+
+        records = []
+        for index, name in enumerate(files):
+            with codecs.open(os.path.join(folder, name), 'r', encoding='utf-8') as f:
+                text = f.read()
+            records.append(json.dumps({'id': index, 'text': text, 'basepath': os.path.dirname(name) or '.'}))
+        ok, elapsed, report = self.call(
+            folder, ['--jsonl'], '\n'.join(records).encode('utf-8') + b'\n', jsonl=True
+        )
+        return ok, elapsed, [report]
+
+    def run_critic(self, folder, files):
+        """Dump the files with the critic marks accepted."""
+
+        ok, elapsed, report = self.call(folder, ['--critic-dump', '-a', '-b'] + files)
+        return ok, elapsed, [report]
+
+    def run(self, mode, folder, files):
+        """Run the mode."""
+
+        return getattr(self, 'run_' + mode)(folder, files)
+
+
+def get_stages(reports):
+    """Add up the time of each stage in the reports."""
+
+    stages = {}
+    for report in reports:
+        for stage, stats in report['totals']['stages'].items():
+            if stats['total']:
+                stages[stage] = stages.get(stage, 0.0) + stats['total']
+    return stages
+
+
+def get_case(runs, files, size):
+    """Get the results of a case from its runs (the report of the median run is used for the stages)."""
+
+    runs = sorted(runs, key=lambda r: r[1])
+    times = [r[1] for r in runs]
+    median = runs[len(runs) // 2]
+    reports = [report for report in median[2] if report is not None]
+    return {
+        'ok': all(r[0] for r in runs),
+        'files': len(files),
+        'size': size,
+        'min': times[0],
+        'median': times[len(times) // 2],
+        'max': times[-1],
+        'files_per_second': len(files) / median[1] if median[1] else 0.0,
+        'mb_per_second': size / (1024 * 1024) / median[1] if median[1] else 0.0,
+        # Time inside the converter, without interpreter startup
+        'converted': sum(report['totals']['elapsed'] for report in reports),
+        'stages': get_stages(reports)
+    }
+
+
+def main():
+    """Run the benchmark."""
+
+    names = [name for name, make in CORPORA]
+    parser = argparse.ArgumentParser(prog='bench_convert', description='Conversion benchmark')
+    parser.add_argument('--runs', type=int, default=3, help="Runs per case.")
+    parser.add_argument('--jobs', default='1', help="Jobs for batches (an integer or 'auto').")
+    parser.add_argument('--scale', type=float, default=1.0, help="Scale the size of the generated corpora.")
+    parser.add_argument('--corpus', action='append', choices=names, help="Corpus to run (default is all).")
+    parser.add_argument('--mode', action='append', choices=MODES, help="Mode to run (default is all).")
+    parser.add_argument('--single-limit', type=int, default=5, help="Files converted one at a time in single "
+                                                                    "and stream mode.")
+    parser.add_argument('--output', '-o', default=None, help="Save the results to a file instead of printing them.")
+    parser.add_argument('--keep', action='store_true', default=False, help="Keep the work folder.")
+    args = parser.parse_args()
+
+    corpora = args.corpus or names
+    modes = args.mode or list(MODES)
+    work = tempfile.mkdtemp(prefix='pymdown-bench-')
+    results = {
+        'python': sys.version.split()[0],
+        'pymdown': version,
+        'runs': args.runs,
+        'jobs': args.jobs,
+        'scale': args.scale,
+        'corpora': {},
+        'cases': {}
+    }
+
+    try:
+        runner = Runner(work, get_env(), args.jobs)
+        for name, make in CORPORA:
+            if name not in corpora:
+                continue
+            folder = os.path.join(work, name)
+            make(folder, random.Random(SEED), args.scale)
+            files = get_files(folder)
+            sizes = dict((f, os.path.getsize(os.path.join(folder, f))) for f in files)
+            results['corpora'][name] = {'files': len(files), 'size': sum(sizes.values())}
+            for mode in modes:
+                selected = files[:args.single_limit] if mode in PER_FILE else files
+                size = sum(sizes[f] for f in selected)
+                runs = [runner.run(mode, folder, selected) for _ in range(args.runs)]
+                case = results['cases']['%s/%s' % (name, mode)] = get_case(runs, selected, size)
+                print('%s/%s: %.3fs' % (name, mode, case['median']), file=sys.stderr)
+    finally:
+        if args.keep:
+            print('Work folder: %s' % work, file=sys.stderr)
+        else:
+            shutil.rmtree(work, ignore_errors=True)
+
+    text = json.dumps(results, sort_keys=True, indent=1)
+    if args.output:
+        with codecs.open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    return 0 if all(case['ok'] for case in results['cases'].values()) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
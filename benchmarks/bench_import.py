@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""
+Import time benchmark.
+
+Times short CLI invocations (which are dominated by imports) in fresh
+interpreters and reports which heavy dependencies got loaded.
+Results are printed as JSON.
+
+    python benchmarks/bench_import.py --runs 20
+
+Licensed under MIT
+Copyright (c) 2014 - 2015 Isaac Muse <isaacmuse@gmail.com>
+"""
+from __future__ import unicode_literals
+from __future__ import print_function
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Dependencies that short invocations should not need to import
+HEAVY = ('jinja2', 'markdown', 'yaml', 'pygments', 'pymdownx', 'multiprocessing')
+
+CASES = (
+    ('import', ['-c', 'import pymdown.cli']),
+    ('version', ['-m', 'pymdown.cli', '--version']),
+    ('licenses', ['-m', 'pymdown.cli', '--licenses'])
+)
+
+LOADED = (
+    'import sys, pymdown.cli; '
+    'print(",".join(sorted(set(m.split(".")[0] for m in sys.modules) & set(%r))))' % (HEAVY,)
+)
+
+
+def get_env():
+    """Get the environment with the package on the path."""
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([ROOT] + ([env['PYTHONPATH']] if env.get('PYTHONPATH') else []))
+    return env
+
+
+def run(args, env):
+    """Run the interpreter with the arguments and return the wall time."""
+
+    with open(os.devnull, 'wb') as devnull:
+        start = time.time()
+        subprocess.call([sys.executable] + args, stdout=devnull, stderr=devnull, env=env, cwd=ROOT)
+        return time.time() - start
+
+
+def get_loaded(env):
+    """Get the heavy modules loaded by importing the CLI."""
+
+    out = subprocess.check_output([sys.executable, '-c', LOADED], env=env, cwd=ROOT)
+    return [m for m in out.decode('utf-8').strip().split(',') if m]
+
+
+def main():
+    """Run the benchmark."""
+
+    parser = argparse.ArgumentParser(prog='bench_import', description='Import time benchmark')
+    parser.add_argument('--runs', type=int, default=10, help="Runs per case.")
+    args = parser.parse_args()
+
+    env = get_env()
+    results = {'python': sys.version.split()[0], 'runs': args.runs, 'cases': {}}
+
+    # Baseline interpreter startup so it can be subtracted
+    for name, case in (('python', ['-c', 'pass']),) + CASES:
+        times = sorted(run(case, env) for _ in range(args.runs))
+        results['cases'][name] = {
+            'min': times[0],
+            'median': times[len(times) // 2],
+            'max': times[-1]
+        }
+    results['heavy_modules_loaded'] = get_loaded(env)
+
+    print(json.dumps(results, sort_keys=True, indent=1))
+    return 1 if results['heavy_modules_loaded'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,168 @@
+"""
+Batch.
+
+Spread batch conversions across a pool of worker processes.
+
+Licensed under MIT
+Copyright (c) 2014 - 2015 Isaac Muse <isaacmuse@gmail.com>
+"""
+from __future__ import unicode_literals
+from __future__ import absolute_import
+import logging
+import traceback
+from . import logger
+
+PASS = 0
+FAIL = 1
+
+# Each worker process holds on to a single converter
+# so settings are only read once per process.
+_worker = None
+# Makes sure each worker picks up exactly one of the tasks that finish the batch
+_barrier = None
+
+# Seconds to wait for every worker to pick up a finishing task
+FINISH_TIMEOUT = 30
+
+
+class CaptureHandler(logging.Handler):
+    """Capture log records so the parent process can replay them in order."""
+
+    def __init__(self):
+        """Initialize."""
+
+        logging.Handler.__init__(self)
+        self.records = []
+
+    def emit(self, record):
+        """Store the level and message of the record."""
+
+        self.records.append((record.levelno, record.getMessage()))
+
+    def flush_records(self):
+        """Return the captured records and start fresh."""
+
+        records = self.records
+        self.records = []
+        return records
+
+
+def get_jobs(value):
+    """Resolve the number of jobs from an int, a numeric string, or `auto`."""
+
+    if value in (None, ''):
+        return 1
+
+    if value == 'auto':
+        import multiprocessing
+
+        try:
+            jobs = multiprocessing.cpu_count()
+        except NotImplementedError:  # pragma: no cover
+            jobs = 1
+    else:
+        jobs = int(value)
+        if jobs < 1:
+            raise ValueError("Jobs must be a positive integer or 'auto'!")
+    return jobs
+
+
+def _init_worker(options, level, barrier=None):
+    """Create the worker's converter and redirect its logging."""
+
+    global _worker
+    global _barrier
+
+    from .pymdown import Convert
+
+    # Swap out the console handlers for one that captures
+    # the output so the parent can log it in a stable order.
+    for handler in list(logger.logger.handlers):
+        logger.logger.removeHandler(handler)
+    logger.logger.addHandler(CaptureHandler())
+    logger.Log.set_level(level)
+
+    options = dict(options)
+    options['jobs'] = 1
+    _worker = Convert(**options)
+    _barrier = barrier
+
+
+def _flush_records():
+    """Get the log records captured since the last call."""
+
+    records = []
+    for handler in logger.logger.handlers:
+        if isinstance(handler, CaptureHandler):
+            records.extend(handler.flush_records())
+    return records
+
+
+def _convert(md_file):
+    """Convert a file in the worker and return the status, captured log, and collected results."""
+
+    try:
+        status = _worker.convert_file(md_file)
+    except Exception:
+        logger.Log.error(traceback.format_exc())
+        status = FAIL
+
+    return status, _flush_records(), _worker.collect()
+
+
+def _finish(index):
+    """Wait until every worker has a finishing task and return the captured log and final results."""
+
+    try:
+        _barrier.wait(FINISH_TIMEOUT)
+    except Exception:
+        # A worker went missing, so some results may not be gathered.
+        logger.Log.debug(traceback.format_exc())
+    return _flush_records(), _worker.collect(final=True)
+
+
+def convert(files, options, jobs, merge=None, finish=False):
+    """
+    Convert the files with a pool of worker processes.
+
+    Results are gathered in the order of the files, and unlike
+    sequential conversion, a failure does not stop the batch.
+    Results collected by the workers are passed to `merge`.
+    If `finish` is enabled, each worker also passes on its final
+    results (which can be costly to collect) once the files are done.
+    """
+
+    import multiprocessing
+
+    status = PASS
+    jobs = min(jobs, len(files))
+    chunksize = max(1, min(32, len(files) // (jobs * 16)))
+
+    barrier = multiprocessing.Barrier(jobs) if finish else None
+    pool = multiprocessing.Pool(jobs, _init_worker, (options, logger.logger.level, barrier))
+    try:
+        for result, records, results in pool.imap(_convert, files, chunksize):
+            for level, msg in records:
+                logger.logger.log(level, msg)
+            if merge is not None:
+                merge(results)
+            if result != PASS:
+                status = FAIL
+        if finish:
+            for records, results in pool.imap_unordered(_finish, range(jobs)):
+                for level, msg in records:
+                    logger.logger.log(level, msg)
+                if merge is not None:
+                    merge(results)
+        pool.close()
+    except Exception:
+        pool.terminate()
+        logger.Log.error(traceback.format_exc())
+        status = FAIL
+    except KeyboardInterrupt:  # pragma: no cover
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+
+    return status
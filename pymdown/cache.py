@@ -0,0 +1,212 @@
+"""
+Cache.
+
+Persistent cache of converted HTML, and an in memory cache.
+
+Licensed under MIT
+Copyright (c) 2014 - 2015 Isaac Muse <isaacmuse@gmail.com>
+"""
+from __future__ import unicode_literals
+from __future__ import absolute_import
+import codecs
+import hashlib
+import os
+import os.path as path
+import threading
+import traceback
+from collections import OrderedDict
+from . import compat
+from . import logger
+from . import util
+
+DEFAULT_CACHE_SIZE = 256 * 1024 * 1024
+CACHE_EXT = '.html'
+
+
+def get_size(value):
+    """Get the size of the value in bytes (text is counted by its UTF-8 encoded size)."""
+
+    if isinstance(value, compat.unicode_type):
+        return len(value.encode('utf-8'))
+    return len(value)
+
+
+class MemoryCache(object):
+    """
+    Size bounded LRU cache.
+
+    Sizes are in bytes, and once the total exceeds the maximum, the least
+    recently used values are dropped.  Values larger than the maximum are
+    not stored.
+    """
+
+    def __init__(self, max_size):
+        """Initialize."""
+
+        self.max_size = max_size
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """Get the value, or `None` if it isn't cached."""
+
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                return None
+            self.entries[key] = entry
+        return entry[0]
+
+    def put(self, key, value, size=None):
+        """Store the value (sized with `get_size` if its size isn't given)."""
+
+        if size is None:
+            size = get_size(value)
+        if size > self.max_size:
+            return
+
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is not None:
+                self.size -= entry[1]
+            self.entries[key] = (value, size)
+            self.size += size
+            while self.size > self.max_size:
+                self.size -= self.entries.popitem(last=False)[1][1]
+
+    def clear(self):
+        """Remove all values."""
+
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+class HtmlCache(object):
+    """
+    Content addressed cache of converted HTML.
+
+    Entries are keyed by the hash of the Markdown text and the fingerprint
+    of the conversion configuration.  When the cache grows beyond its size,
+    the least recently used entries (by mtime, which is refreshed on every hit)
+    are removed.
+    """
+
+    def __init__(self, directory, max_size=DEFAULT_CACHE_SIZE):
+        """Initialize."""
+
+        self.directory = path.abspath(path.expanduser(directory))
+        self.max_size = max_size
+        self.size = None
+        if not path.isdir(self.directory):
+            try:
+                os.makedirs(self.directory)
+            except OSError:
+                # Another process may have created it.
+                if not path.isdir(self.directory):
+                    raise
+
+    def get_key(self, text, fingerprint):
+        """Get the key for the text and configuration fingerprint."""
+
+        sha1 = hashlib.sha1(fingerprint.encode('utf-8'))
+        sha1.update(b'\0')
+        sha1.update(text.encode('utf-8'))
+        return sha1.hexdigest()
+
+    def get_path(self, key):
+        """Get the path of the entry."""
+
+        return path.join(self.directory, key[:2], key + CACHE_EXT)
+
+    def get(self, key):
+        """Get the cached HTML, or `None` if it isn't cached."""
+
+        pth = self.get_path(key)
+        try:
+            with codecs.open(pth, 'r', encoding='utf-8') as f:
+                html = f.read()
+        except (IOError, OSError):
+            return None
+
+        try:
+            os.utime(pth, None)
+        except OSError:  # pragma: no cover
+            pass
+        return html
+
+    def put(self, key, html):
+        """Store the HTML."""
+
+        pth = self.get_path(key)
+        data = html.encode('utf-8')
+        try:
+            folder = path.dirname(pth)
+            if not path.isdir(folder):
+                try:
+                    os.mkdir(folder)
+                except OSError:
+                    if not path.isdir(folder):
+                        raise
+            util.write_atomic(pth, data)
+        except Exception:
+            logger.Log.debug(traceback.format_exc())
+            return
+
+        if self.size is None:
+            self.size = self.get_size()
+        else:
+            self.size += len(data)
+        if self.max_size and self.size > self.max_size:
+            self.evict()
+
+    def get_entries(self):
+        """Get the mtime, size, and path of every entry."""
+
+        entries = []
+        for folder in os.listdir(self.directory):
+            folder = path.join(self.directory, folder)
+            if not path.isdir(folder):
+                continue
+            for name in os.listdir(folder):
+                if name.endswith(CACHE_EXT):
+                    pth = path.join(folder, name)
+                    try:
+                        st = os.stat(pth)
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, pth))
+        return entries
+
+    def get_size(self):
+        """Get the total size of the entries."""
+
+        return sum(entry[1] for entry in self.get_entries())
+
+    def evict(self):
+        """Remove the least recently used entries until the cache is comfortably below its size."""
+
+        target = self.max_size * 0.9
+        entries = sorted(self.get_entries())
+        size = sum(entry[1] for entry in entries)
+        for mtime, entry_size, pth in entries:
+            if size <= target:
+                break
+            try:
+                os.remove(pth)
+            except OSError:
+                # Another process may have removed it.
+                pass
+            size -= entry_size
+        self.size = size
+
+    def clear(self):
+        """Remove all entries."""
+
+        for _, _, pth in self.get_entries():
+            try:
+                os.remove(pth)
+            except OSError:  # pragma: no cover
+                pass
+        self.size = 0
@@ -16,12 +16,15 @@ import argparse
 import sys
 import traceback
 import os.path as path
-from . import pymdown
+from .batch import get_jobs as resolve_jobs
 from . import util
 from . import logger
 from . import compat
 from .__version__ import version
 
+PASS = 0
+FAIL = 1
+
 
 def get_files(file_patterns):
     """Find and return files matching the given patterns."""
@@ -35,7 +38,7 @@ def get_files(file_patterns):
             files += glob.glob(pattern)
     for f in files:
         all_files.add(path.abspath(path.normpath(f)))
-    return list(all_files)
+    return sorted(all_files)
 
 
 def get_file_stream(encoding):
@@ -84,15 +87,59 @@ def get_sources(args):
     return files, stream
 
 
+def get_jobs(value):
+    """Validate the number of batch jobs."""
+
+    try:
+        resolve_jobs(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError("'%s' is not a positive integer or 'auto'" % value)
+    return value
+
+
+def get_profile(value):
+    """Check the profile kind and path."""
+
+    from .profiler import parse_profile, PyMdownProfilerException
+
+    try:
+        parse_profile(value)
+    except PyMdownProfilerException as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return value
+
+
+def get_server_options(args):
+    """Get the converter options for the daemon and JSON lines modes."""
+
+    return dict(
+        basepath=args.basepath,
+        relpath=args.relpath,
+        title=args.title,
+        encoding=args.encoding,
+        output_encoding=args.output_encoding or args.encoding,
+        cache=args.cache,
+        cache_size=args.cache_size * 1024 * 1024,
+        scan_dirs=args.scan_dirs,
+        timings=args.timings,
+        extension_timings=args.extension_timings,
+        memory=args.memory,
+        frontmatter_max_size=args.frontmatter_max_size * 1024,
+        settings_path=args.settings,
+        plain=args.plain_html,
+        force_no_template=args.force_no_template
+    )
+
+
 def display_licenses():
     """Display licenses."""
 
-    status = pymdown.PASS
+    status = PASS
     text = util.load_text_resource(path.join('pymdown', 'data', 'licenses.txt'), internal=True)
     if text is not None:
         compat.print_stdout(text.encode('utf-8'))
     else:
-        status = pymdown.FAIL
+        status = FAIL
     return status
 
 
@@ -120,6 +167,42 @@ def main():
     # Output
     parser.add_argument('--output', '-o', default=None, help="Output file. Ignored in batch mode.")
     parser.add_argument('--batch', '-b', action='store_true', default=False, help="Batch mode output.")
+    parser.add_argument('--jobs', '-j', type=get_jobs, default='1', help="Number of processes to use in batch mode "
+                                                                         "(an integer or 'auto').")
+    parser.add_argument('--incremental', '-i', action='store_true', default=False, help="Skip files whose output "
+                                                                                        "is up to date.")
+    parser.add_argument('--manifest', default=None, help="Build manifest location for incremental builds "
+                                                         "(default is '.pymdown-manifest.json').")
+    parser.add_argument('--cache', default=None, help="Folder to cache converted HTML in "
+                                                      "(not used with extensions that read other files).")
+    parser.add_argument('--cache-size', type=int, default=256, help="Maximum size of the HTML cache in MB "
+                                                                    "(default is 256).")
+    parser.add_argument('--scan-dirs', action='store_true', default=False, help="Look up files by listing their "
+                                                                                "folders (faster on network drives).")
+    parser.add_argument('--timings', default=None, metavar='FILE', help="Write a JSON report of the time spent in "
+                                                                        "each stage of each conversion to the file.")
+    parser.add_argument('--extension-timings', action='store_true', default=False, help="Add the time spent in "
+                                                                                        "each Markdown extension to "
+                                                                                        "the timings report.")
+    parser.add_argument('--memory', action='store_true', default=False, help="Add the memory used by each "
+                                                                             "conversion to the timings report "
+                                                                             "(Python 3.4+).")
+    parser.add_argument('--profile', type=get_profile, metavar='KIND:PATH', help="Profile the conversions with "
+                                                                                 "'cprofile' or 'sample' and save "
+                                                                                 "the profile to PATH.")
+    parser.add_argument('--profile-per-file', action='store_true', default=False, help="Save a profile for each "
+                                                                                       "file in the folder given "
+                                                                                       "to --profile.")
+    parser.add_argument('--watch', '-w', action='store_true', default=False, help="Watch the files and what they "
+                                                                                  "use and convert them on change.")
+    parser.add_argument('--focus', default=None, help="In watch mode, convert this file before any others.")
+    parser.add_argument('--daemon', default=None, metavar='SOCKET', help="Serve conversion requests on the given "
+                                                                         "unix socket.")
+    parser.add_argument('--idle-timeout', type=int, default=0, help="In daemon mode, shut down after this many "
+                                                                    "seconds without requests (default is never).")
+    parser.add_argument('--jsonl', action='store_true', default=False, help="Convert JSON records read from stdin, "
+                                                                            "one per line, and write JSON results "
+                                                                            "to stdout.")
     parser.add_argument('--force-stdout', action='store_true', default=False, help="Force output to stdout.")
     parser.add_argument('--force-no-template', action='store_true', default=False, help="Force using no template.")
     parser.add_argument('--output-encoding', '-E', default=None, help="Output encoding.")
@@ -127,6 +210,8 @@ def main():
     parser.add_argument('--settings', '-s', default=default_settings, help="Load the settings file from an alternate "
                                                                            "location.")
     parser.add_argument('--encoding', '-e', default="utf-8", help="Encoding for input.")
+    parser.add_argument('--frontmatter-max-size', type=int, default=256, help="Maximum size of frontmatter in KB "
+                                                                              "(default is 256, 0 is no limit).")
     parser.add_argument('--basepath', default=None, help="The basepath location pymdown should use.")
     parser.add_argument('--relpath', default=None, help="The path that things will be relative to (default is output).")
     parser.add_argument('markdown', nargs='*', default=[], help="Markdown file(s) or file pattern(s).")
@@ -141,6 +226,25 @@ def main():
     else:
         logger.Log.set_level(logger.CRITICAL if args.quiet else logger.INFO)
 
+    if args.daemon:
+        from . import daemon
+        try:
+            status = daemon.serve(args.daemon, get_server_options(args), args.idle_timeout)
+        except daemon.DaemonException as e:
+            logger.Log.error(str(e))
+            status = FAIL
+        sys.exit(status)
+
+    if args.jsonl:
+        from . import jsonl
+        sys.exit(
+            jsonl.serve(
+                get_server_options(args),
+                getattr(sys.stdin, 'buffer', sys.stdin),
+                getattr(sys.stdout, 'buffer', sys.stdout)
+            )
+        )
+
     files, stream = get_sources(args)
     if stream:
         batch = False
@@ -149,32 +253,52 @@ def main():
 
     if not batch and len(files) > 1:
         logger.Log.log("Please use batch mode to process multiple files!")
-        sys.exit(pymdown.FAIL)
+        sys.exit(FAIL)
+
+    if args.watch and stream:
+        logger.Log.error("Watch mode requires files!")
+        sys.exit(FAIL)
 
     # It is assumed that the input encoding is desired for output
     # unless otherwise specified.
     if args.output_encoding is None:
         args.output_encoding = args.encoding
 
-    # Convert
-    sys.exit(
-        pymdown.Convert(
-            basepath=args.basepath,
-            relpath=args.relpath,
-            title=args.title,
-            output=args.output,
-            encoding=args.encoding,
-            output_encoding=args.output_encoding,
-            critic=get_critic_mode(args),
-            batch=batch,
-            stream=stream,
-            preview=args.preview,
-            settings_path=args.settings,
-            plain=args.plain_html,
-            force_stdout=args.force_stdout,
-            force_no_template=args.force_no_template
-        ).convert(files)
+    # Convert (imported here so options like `--licenses` don't pay for loading the converter)
+    from . import pymdown
+
+    converter = pymdown.Convert(
+        basepath=args.basepath,
+        relpath=args.relpath,
+        title=args.title,
+        output=args.output,
+        encoding=args.encoding,
+        output_encoding=args.output_encoding,
+        critic=get_critic_mode(args),
+        batch=batch,
+        jobs=args.jobs,
+        incremental=args.incremental,
+        manifest=args.manifest,
+        cache=args.cache,
+        cache_size=args.cache_size * 1024 * 1024,
+        scan_dirs=args.scan_dirs,
+        timings=args.timings,
+        extension_timings=args.extension_timings,
+        memory=args.memory,
+        profile=args.profile,
+        profile_per_file=args.profile_per_file,
+        frontmatter_max_size=args.frontmatter_max_size * 1024,
+        stream=stream,
+        preview=args.preview,
+        settings_path=args.settings,
+        plain=args.plain_html,
+        force_stdout=args.force_stdout,
+        force_no_template=args.force_no_template
     )
+    if args.watch:
+        from . import watch
+        sys.exit(watch.Watcher(converter, files, focus=args.focus).run())
+    sys.exit(converter.convert(files))
 
 
 if __name__ == '__main__':
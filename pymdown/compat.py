@@ -6,20 +6,20 @@ Copyright (c) 2014 - 2015 Isaac Muse <isaacmuse@gmail.com>
 """
 from __future__ import unicode_literals
 import sys
+import os
+from timeit import default_timer as timer  # noqa
 
 PY2 = sys.version_info >= (2, 0) and sys.version_info < (3, 0)
 PY3 = sys.version_info >= (3, 0) and sys.version_info < (4, 0)
 
 if PY2:
     from urllib import quote  # noqa
-    from urllib import pathname2url  # noqa
     from StringIO import StringIO  # noqa
     unicode_type = unicode  # noqa
     string_type = basestring  # noqa
     binary_type = str
 else:
     from urllib.parse import quote  # noqa
-    from urllib.request import pathname2url  # noqa
     from io import StringIO  # noqa
     unicode_type = str  # noqa
     string_type = str  # noqa
@@ -35,6 +35,30 @@ else:  # pragma: no cover
     PLATFORM = "linux"
 
 
+if PY2:
+    def replace(src, dst):
+        """Rename the file and overwrite the destination if it exists."""
+
+        if PLATFORM == "windows" and os.path.exists(dst):  # pragma: no cover
+            os.remove(dst)
+        os.rename(src, dst)
+else:
+    replace = os.replace
+
+# `scandir` is only available in the standard library on Python 3.5+
+scandir = getattr(os, 'scandir', None)
+
+
+def pathname2url(pth):
+    """Convert a path to a URL path (`urllib.request` is slow to import, so it is imported on first use)."""
+
+    if PY2:
+        from urllib import pathname2url as _pathname2url
+    else:
+        from urllib.request import pathname2url as _pathname2url
+    return _pathname2url(pth)
+
+
 def print_stdout(text, encoding='utf-8'):
     """
     Write text out as bytes where possible.
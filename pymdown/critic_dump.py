@@ -6,7 +6,78 @@ Copyright (c) 2014 Isaac Muse <isaacmuse@gmail.com>
 """
 from __future__ import unicode_literals
 from __future__ import absolute_import
-from pymdownx.critic import CriticViewPreprocessor, CriticsPostprocessor, CriticStash, CRITIC_KEY
+import re
+
+RE_OPEN = re.compile(r'\{(?:\+{2}|-{2}|={2}|>{2}|~{2})')
+
+# Closing token of each mark by the opening token (less the `{`)
+CLOSES = {
+    '++': '++}',
+    '--': '--}',
+    '==': '==}',
+    '>>': '<<}',
+    '~~': '~~}'
+}
+SUB_MID = '~>'
+
+
+def find_closes(chunks):
+    """
+    Find where the last closing tokens are in the text.
+
+    Critic marks can span any amount of text, but a mark can only be completed
+    if its closing token comes somewhere after it.  Knowing where the last ones
+    are means unclosed marks can be passed over without reading ahead for them.
+    For substitutions, the position of the last `~>` that comes before a `~~}`
+    is found instead.
+    """
+
+    closes = dict((token, -1) for token in CLOSES.values())
+    closes[SUB_MID] = -1
+    last_mid = -1
+    offset = 0
+    tail = ''
+    for chunk in chunks:
+        window = tail + chunk
+        start = offset - len(tail)
+        for token in CLOSES.values():
+            index = window.rfind(token)
+            if index != -1:
+                closes[token] = start + index
+        index = window.rfind(CLOSES['~~'])
+        if index != -1:
+            mid = window.rfind(SUB_MID, 0, index)
+            closes[SUB_MID] = start + mid if mid != -1 else last_mid
+        mid = window.rfind(SUB_MID)
+        if mid != -1:
+            last_mid = start + mid
+        offset += len(chunk)
+        tail = window[-2:]
+    return closes
+
+
+def get_partial_open(text):
+    """Get how many characters at the end of the text could be the start of an opening token."""
+
+    if text[-1:] == '{':
+        return 1
+    if text[-2:-1] == '{' and text[-1] in '+-=>~':
+        return 2
+    return 0
+
+
+class PopStash(object):
+    """Critic stash that forgets entries once they are restored."""
+
+    def __init__(self, stash):
+        """Initialize."""
+
+        self.stash = stash
+
+    def get(self, key, default=None):
+        """Get and remove the item."""
+
+        return self.stash.stash.pop(key, default)
 
 
 class CriticDump(object):
@@ -20,6 +91,8 @@ class CriticDump(object):
     def dump(self, source, accept, view=False):
         """Process critic marks and return the file."""
 
+        from pymdownx.critic import CriticViewPreprocessor, CriticsPostprocessor, CriticStash, CRITIC_KEY
+
         text = ''
         if view:
             mode = 'view'
@@ -37,3 +110,137 @@ class CriticDump(object):
             text = critic_post.run(text)
 
         return text
+
+    def can_close(self, opener, pos, closes):
+        """Check if the mark opened at the position has a closing token after it."""
+
+        if opener == '~~':
+            return closes[SUB_MID] >= pos + 3
+        return closes[CLOSES[opener]] >= pos + 3
+
+    def stream(self, chunks, accept, view=False, closes=None):
+        """
+        Process critic marks a chunk at a time and yield the output as it is ready.
+
+        The output is the same as `dump`.  Only the text of a mark that spans chunks
+        is held on to, and `closes` (from `find_closes`, found from the chunks if not
+        given) is used to pass over marks that are never closed.  In view mode, the
+        tags are restored a line at a time (the placeholders never span lines).
+        """
+
+        from pymdownx.critic import CriticViewPreprocessor, CriticsPostprocessor, CriticStash, CRITIC_KEY, RE_CRITIC
+
+        if closes is None:
+            chunks = list(chunks)
+            closes = find_closes(chunks)
+
+        if view:
+            mode = 'view'
+        elif accept:
+            mode = 'accept'
+        else:
+            mode = 'reject'
+
+        critic_stash = CriticStash(CRITIC_KEY)
+        critic = CriticViewPreprocessor(critic_stash)
+        critic.config = {'mode': mode}
+        processor = critic.critic_view if view else critic.critic_parse
+        critic_post = CriticsPostprocessor(PopStash(critic_stash)) if view else None
+
+        def forget(count):
+            """Forget the marks stored since the count."""
+
+            for index in range(count, critic_stash.count):
+                critic_stash.stash.pop(CRITIC_KEY % str(index), None)
+
+        chunks = iter(chunks)
+        buf = ''
+        # Absolute position of the buffer, how much of it is output, and where to search from
+        base = 0
+        done = 0
+        pos = 0
+        eof = False
+        carry = []
+
+        while True:
+            out = []
+            waiting = None
+
+            # Most of the time, every mark in the buffer is complete and it can be processed all at once.
+            count = critic_stash.count
+            text = RE_CRITIC.sub(processor, buf)
+            if RE_OPEN.search(text) is None:
+                partial = 0 if eof else get_partial_open(buf)
+                out.append(text[:len(text) - partial])
+                done = pos = len(buf) - partial
+            else:
+                forget(count)
+                # Usually just a mark at the end of the buffer isn't complete, so process up to it all at once.
+                start = len(buf) - (len(text) - RE_OPEN.search(text).start())
+                if start > 0 and RE_OPEN.match(buf, start):
+                    count = critic_stash.count
+                    text = RE_CRITIC.sub(processor, buf[:start])
+                    if RE_OPEN.search(text) is None:
+                        out.append(text)
+                        done = start
+                    else:
+                        forget(count)
+                pos = done
+                while True:
+                    m = RE_OPEN.search(buf, pos)
+                    if m is None:
+                        break
+                    start = m.start()
+                    opener = m.group(0)[1:]
+                    if self.can_close(opener, base + start, closes):
+                        match = RE_CRITIC.match(buf, start)
+                        if match is not None:
+                            out.append(buf[done:start])
+                            out.append(processor(match))
+                            done = pos = match.end()
+                            continue
+                        elif not eof:
+                            # Wait for the closing token to be read.
+                            waiting = CLOSES[opener]
+                            pos = start
+                            break
+                    # This is never closed, so it is just text.
+                    pos = start + 1
+
+                if eof:
+                    out.append(buf[done:])
+                elif waiting is None:
+                    # The last two characters could be the start of a mark.
+                    pos = max(pos, len(buf) - 2)
+                    out.append(buf[done:pos])
+                    done = pos
+
+            text = ''.join(out)
+            if critic_post is not None:
+                index = len(text) if eof else text.rfind('\n') + 1
+                if index or eof:
+                    carry.append(text[:index])
+                    ready = critic_post.run(''.join(carry))
+                    carry = [text[index:]]
+                else:
+                    ready = ''
+                    carry.append(text)
+                text = ready
+            if text:
+                yield text
+            if eof:
+                break
+
+            # Read more (and for a mark, until its closing token is read).
+            parts = [buf[done:]]
+            while True:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    eof = True
+                    break
+                parts.append(chunk)
+                if waiting is None or waiting in parts[-2][-2:] + chunk:
+                    break
+            base += done
+            done = 0
+            buf = ''.join(parts)
@@ -0,0 +1,305 @@
+"""
+Daemon.
+
+Long lived conversion server for editor integrations.
+
+Requests and responses are JSON objects, one per line, sent over a local unix socket.
+
+Request:
+
+    {"id": 1, "text": "# Markdown", "frontmatter": {}, "basepath": null, "relpath": null, "critic": "ignore"}
+
+Response:
+
+    {"id": 1, "status": "ok", "html": "...", "meta": {"title": "...", "extra": {}}, "log": [],
+     "timings": {"wait": 0.0, "convert": 0.01}}
+
+A request of `{"command": "ping"}` answers with `{"status": "ok"}`, and a request of
+`{"command": "shutdown"}` stops the server.
+
+Licensed under MIT
+Copyright (c) 2014 - 2015 Isaac Muse <isaacmuse@gmail.com>
+"""
+from __future__ import unicode_literals
+from __future__ import absolute_import
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+from . import logger
+from . import util
+from .batch import CaptureHandler
+try:
+    import socketserver
+except ImportError:  # pragma: no cover
+    import SocketServer as socketserver
+
+PASS = 0
+FAIL = 1
+
+CRITIC_MODES = {
+    'ignore': util.CRITIC_IGNORE,
+    'accept': util.CRITIC_ACCEPT,
+    'reject': util.CRITIC_REJECT,
+    'view': util.CRITIC_VIEW
+}
+
+
+class DaemonException(Exception):
+    """Daemon exception."""
+
+
+class Daemon(object):
+    """
+    Holds the warm converters and serves requests.
+
+    There is one converter per critic mode, created on first use, and each keeps
+    its settings, Markdown instances, and templates between requests.  Connections
+    are handled in their own threads, but the conversions themselves take turns
+    as a converter holds the state of the document it is working on.
+    """
+
+    def __init__(self, options, idle_timeout=0):
+        """Initialize."""
+
+        self.options = dict(options)
+        self.options['stream'] = True
+        self.options['batch'] = False
+        self.options['preview'] = False
+        self.idle_timeout = idle_timeout
+        self.converters = {}
+        # The converters share a run report
+        self.report = None
+        if self.options.get('timings') is not None:
+            from .report import Report
+
+            self.report = Report(
+                self.options.pop('timings'),
+                self.options.get('extension_timings', False),
+                self.options.get('memory', False)
+            )
+        self.lock = threading.Lock()
+        self.activity = threading.Lock()
+        self.active = 0
+        self.last_activity = time.time()
+
+    def get_converter(self, critic):
+        """Get the converter for the critic mode."""
+
+        from .pymdown import Convert
+
+        if critic not in self.converters:
+            options = dict(self.options)
+            options['critic'] = CRITIC_MODES[critic]
+            self.converters[critic] = Convert(**options)
+            self.converters[critic].report = self.report
+        return self.converters[critic]
+
+    def save_report(self):
+        """Save the run report if there is one."""
+
+        if self.report is not None:
+            self.report.save()
+
+    def begin(self):
+        """Note that a client is being served."""
+
+        with self.activity:
+            self.active += 1
+            self.last_activity = time.time()
+
+    def end(self):
+        """Note that a client is done being served."""
+
+        with self.activity:
+            self.active -= 1
+            self.last_activity = time.time()
+
+    def is_idle(self):
+        """Check if no client has been served for the idle timeout."""
+
+        with self.activity:
+            if self.idle_timeout <= 0 or self.active:
+                return False
+            return time.time() - self.last_activity >= self.idle_timeout
+
+    def convert(self, request):
+        """Convert the request's markdown and return the response."""
+
+        response = {'id': request.get('id')}
+        critic = request.get('critic', 'ignore')
+        if critic not in CRITIC_MODES:
+            response['status'] = 'error'
+            response['error'] = "Invalid critic mode '%s'!" % critic
+            return response
+
+        start = time.time()
+        with self.lock:
+            started = time.time()
+            handler = CaptureHandler()
+            logger.logger.addHandler(handler)
+            # Files may have changed since the last request
+            util.clear_path_cache()
+            meta = None
+            try:
+                converter = self.get_converter(critic)
+                status, html = converter.render(
+                    request.get('text', ''),
+                    frontmatter=request.get('frontmatter'),
+                    title=request.get('title'),
+                    basepath=request.get('basepath'),
+                    relpath=request.get('relpath')
+                )
+                if status == PASS:
+                    meta = converter.get_meta()
+            except Exception:
+                logger.Log.error(traceback.format_exc())
+                status, html = FAIL, ''
+            finally:
+                logger.logger.removeHandler(handler)
+        end = time.time()
+
+        response['status'] = 'ok' if status == PASS else 'error'
+        response['html'] = html
+        response['meta'] = meta
+        response['log'] = [msg for _, msg in handler.flush_records()]
+        response['timings'] = {'wait': started - start, 'convert': end - started}
+        return response
+
+    def handle(self, request, server):
+        """Handle a request."""
+
+        if not isinstance(request, dict):
+            return {'status': 'error', 'error': 'Requests must be JSON objects!'}
+
+        command = request.get('command', 'convert')
+        if command == 'ping':
+            response = {'id': request.get('id'), 'status': 'ok'}
+        elif command == 'shutdown':
+            threading.Thread(target=server.shutdown).start()
+            response = {'id': request.get('id'), 'status': 'ok'}
+        elif command == 'convert':
+            response = self.convert(request)
+        else:
+            response = {'id': request.get('id'), 'status': 'error', 'error': "Unknown command '%s'!" % command}
+        return response
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    """Read JSON requests a line at a time and write the responses."""
+
+    def handle(self):
+        """Handle the client's requests."""
+
+        daemon = self.server.daemon
+        daemon.begin()
+        try:
+            for line in iter(self.rfile.readline, b''):
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line.decode('utf-8'))
+                except ValueError:
+                    response = {'status': 'error', 'error': 'Invalid JSON!'}
+                else:
+                    response = daemon.handle(request, self.server)
+                self.wfile.write(util.dump_json(response).encode('utf-8') + b'\n')
+                self.wfile.flush()
+        except socket.error:
+            # The client went away.
+            pass
+        finally:
+            daemon.end()
+
+
+class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Threaded unix socket server."""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, daemon):
+        """Initialize."""
+
+        self.daemon = daemon
+        socketserver.UnixStreamServer.__init__(self, socket_path, RequestHandler)
+
+
+def is_listening(socket_path):
+    """Check if a server is listening on the socket."""
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+        return True
+    except socket.error:
+        return False
+    finally:
+        sock.close()
+
+
+def watch_idle(server, daemon, interval=1):
+    """Shut the server down once it has been idle for too long."""
+
+    while True:
+        time.sleep(interval)
+        if daemon.is_idle():
+            logger.Log.info("Idle timeout reached, shutting down...")
+            server.shutdown()
+            break
+
+
+def serve(socket_path, options, idle_timeout=0):
+    """Serve conversions on the unix socket until shutdown or the idle timeout."""
+
+    if not hasattr(socket, 'AF_UNIX'):  # pragma: no cover
+        raise DaemonException("Unix sockets are not supported on this platform!")
+
+    socket_path = os.path.abspath(os.path.expanduser(socket_path))
+    if os.path.exists(socket_path):
+        if is_listening(socket_path):
+            raise DaemonException("A server is already listening on '%s'!" % socket_path)
+        # Left behind by a server that didn't exit cleanly.
+        os.remove(socket_path)
+
+    daemon = Daemon(options, idle_timeout)
+    # Settings are loaded up front so the first request is fast.
+    daemon.get_converter('ignore')
+
+    server = Server(socket_path, daemon)
+    os.chmod(socket_path, 0o600)
+    if idle_timeout > 0:
+        watcher = threading.Thread(target=watch_idle, args=(server, daemon))
+        watcher.daemon = True
+        watcher.start()
+
+    logger.Log.info("Listening on %s..." % socket_path)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        daemon.save_report()
+    return PASS
+
+
+def request(socket_path, requests):
+    """Send the requests to the server and return the responses."""
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(os.path.abspath(os.path.expanduser(socket_path)))
+    try:
+        stream = sock.makefile('rwb')
+        responses = []
+        for req in requests:
+            stream.write(json.dumps(req).encode('utf-8') + b'\n')
+            stream.flush()
+            responses.append(json.loads(stream.readline().decode('utf-8')))
+        stream.close()
+    finally:
+        sock.close()
+    return responses
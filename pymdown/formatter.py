@@ -17,6 +17,51 @@ from . import logger
 from . import compat
 from .template import Template
 
+# Output is written in chunks of about this many characters
+WRITE_SIZE = 64 * 1024
+
+
+def write_chunks(target, chunks, encoding=None, watch=None):
+    """
+    Write the text chunks to the target as they come.
+
+    Small chunks are gathered and large ones are split up so only about
+    `WRITE_SIZE` characters are held (and encoded, if an encoding is given) at once.
+    Writing is timed with the stopwatch if one is given.
+    """
+
+    encoder = codecs.getincrementalencoder(encoding)("xmlcharrefreplace") if encoding else None
+    pending = []
+    size = 0
+
+    def flush(text, final=False):
+        """Write out the text."""
+
+        if watch is not None:
+            watch.start('write')
+        if encoder is not None:
+            text = encoder.encode(text, final)
+        if text:
+            target.write(text)
+        if watch is not None:
+            watch.stop()
+
+    for chunk in chunks:
+        if len(chunk) > WRITE_SIZE:
+            flush(''.join(pending))
+            pending = []
+            size = 0
+            for start in range(0, len(chunk), WRITE_SIZE):
+                flush(chunk[start:start + WRITE_SIZE])
+        elif chunk:
+            pending.append(chunk)
+            size += len(chunk)
+            if size >= WRITE_SIZE:
+                flush(''.join(pending))
+                pending = []
+                size = 0
+    flush(''.join(pending), True)
+
 
 class PyMdownFormatterException(Exception):
     """PyMdown formatter exception."""
@@ -41,16 +86,41 @@ class Terminal(object):
         """There is nothing to close."""
 
 
+class Buffer(object):
+    """Collect output in memory and mimic the file output calls."""
+
+    name = None
+
+    def __init__(self):
+        """Initialize."""
+
+        self.parts = []
+
+    def write(self, text):
+        """Store the text."""
+
+        self.parts.append(text)
+
+    def getvalue(self):
+        """Get the collected text."""
+
+        return ''.join(self.parts)
+
+    def close(self):
+        """There is nothing to close."""
+
+
 class Text(object):
     """Text output object."""
 
-    def __init__(self, settings):
+    def __init__(self, **kwargs):
         """Initialize Text object."""
 
+        settings = kwargs["settings"]
         self.encode_file = True
         self.file = None
-        self.encoding = settings("page", {}).get("encoding", 'utf-8')
-        self.output = settings("page", {}).get("destination", None)
+        self.encoding = settings.get("page", {}).get("encoding", 'utf-8')
+        self.output = settings.get("page", {}).get("destination", None)
 
     def open(self):
         """
@@ -70,10 +140,12 @@ class Text(object):
                 raise PyMdownFormatterException("Could not open output file!")
 
     def write(self, text):
-        """Write the content."""
+        """Write the content (a string or an iterable of strings)."""
 
-        self.file.write(
-            text.encode(self.encoding, errors="xmlcharrefreplace") if self.encode_file else text
+        write_chunks(
+            self.file,
+            [text] if isinstance(text, compat.unicode_type) else text,
+            self.encoding if self.encode_file else None
         )
 
     def close(self):
@@ -98,12 +170,21 @@ class Html(object):
         self.relpath = settings.get("page", {}).get("relpath", None)
         self.output = settings.get("page", {}).get("destination", None)
         self.template_file = self.settings.get("template", None) if not settings.get("plain", False) else None
+        self.stream = kwargs.get("stream", None)
+        self.cache_dir = kwargs.get("cache_dir", None)
+        self.watch = kwargs.get("watch", None)
         self.encode_file = True
         self.file = None
+        self.dependencies = set()
 
     def open(self):
         """Set and create the output target and target related flags."""
 
+        if self.stream is not None:
+            self.file = self.stream
+            self.encode_file = False
+            return
+
         if self.output is None:
             self.file = Terminal(self.encoding)
             self.file.name = self.relpath
@@ -138,15 +219,21 @@ class Html(object):
             relpath=self.relpath,
             force_conversion=self.preview,
             disable_path_conversion=self.settings.get("disable_path_conversion", False),
-            absolute_path_conversion=self.settings.get("path_conversion_absolute", False)
-        ).get_template(self.template_file)
-
-        html = template.render(
-            page=self.page,
-            settings=self.settings,
-            extra=self.extra
+            absolute_path_conversion=self.settings.get("path_conversion_absolute", False),
+            embed_image_max_size=self.settings.get("embed_image_max_size", 0),
+            cache_dir=self.cache_dir
         )
 
-        self.file.write(
-            html.encode(self.encoding, errors="xmlcharrefreplace") if self.encode_file else html
+        # Stream the page out as it is rendered
+        write_chunks(
+            self.file,
+            template.generate(
+                template.get_template(self.template_file),
+                page=self.page,
+                settings=self.settings,
+                extra=self.extra
+            ),
+            self.encoding if self.encode_file else None,
+            self.watch
         )
+        self.dependencies |= template.dependencies
@@ -0,0 +1,101 @@
+"""
+JSON lines.
+
+Convert a stream of Markdown documents in one warm process.  Records are read
+from stdin, one JSON object per line, and a response line is written to stdout
+(and flushed) for each record in order.
+
+Record:
+
+    {"id": 1, "text": "# Markdown", "frontmatter": {}, "basepath": null, "relpath": null, "critic": "ignore"}
+
+Response:
+
+    {"id": 1, "status": "ok", "html": "...", "meta": {"title": "...", "extra": {}}, "log": [],
+     "timings": {"wait": 0.0, "convert": 0.01}}
+
+Licensed under MIT
+Copyright (c) 2014 - 2015 Isaac Muse <isaacmuse@gmail.com>
+"""
+from __future__ import unicode_literals
+from __future__ import absolute_import
+import codecs
+import json
+import os
+from . import util
+from .daemon import Daemon
+
+PASS = 0
+FAIL = 1
+
+# Bytes read from the input at a time
+READ_SIZE = 64 * 1024
+
+
+def get_reader(stream):
+    """Get a function that reads whatever input is available (up to `READ_SIZE`) without waiting for more."""
+
+    if hasattr(stream, 'read1'):
+        return lambda: stream.read1(READ_SIZE)
+    return lambda: os.read(stream.fileno(), READ_SIZE)
+
+
+def read_lines(stream):
+    """Read the stream in bulk, decode it incrementally, and yield it a line at a time."""
+
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    read = get_reader(stream)
+    pending = []
+    while True:
+        data = read()
+        text = decoder.decode(data, not data)
+        if '\n' in text:
+            lines = text.split('\n')
+            pending.append(lines[0])
+            yield ''.join(pending)
+            for line in lines[1:-1]:
+                yield line
+            pending = [lines[-1]]
+        elif text:
+            pending.append(text)
+        if not data:
+            break
+    if ''.join(pending):
+        yield ''.join(pending)
+
+
+def convert(daemon, stdin, stdout):
+    """
+    Convert the records from `stdin` with the daemon and write the responses to `stdout` (both binary).
+
+    Fails if any record fails, but a failed record doesn't stop the rest.
+    """
+
+    status = PASS
+    for line in read_lines(stdin):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            response = {'status': 'error', 'error': 'Invalid JSON!'}
+        else:
+            if isinstance(record, dict):
+                response = daemon.convert(record)
+            else:
+                response = {'status': 'error', 'error': 'Records must be JSON objects!'}
+        if response['status'] != 'ok':
+            status = FAIL
+        stdout.write(util.dump_json(response).encode('utf-8') + b'\n')
+        stdout.flush()
+    return status
+
+
+def serve(options, stdin, stdout):
+    """Convert the records from `stdin` with warm converters created from the options."""
+
+    daemon = Daemon(options)
+    try:
+        return convert(daemon, stdin, stdout)
+    finally:
+        daemon.save_report()
@@ -0,0 +1,198 @@
+"""
+Manifest.
+
+Record what each output was built from so unchanged outputs can be skipped.
+
+Licensed under MIT
+Copyright (c) 2014 - 2015 Isaac Muse <isaacmuse@gmail.com>
+"""
+from __future__ import unicode_literals
+from __future__ import absolute_import
+import codecs
+import json
+import os
+import os.path as path
+import traceback
+from . import logger
+from . import util
+
+DEFAULT_MANIFEST = '.pymdown-manifest.json'
+MANIFEST_VERSION = 1
+
+
+class Manifest(object):
+    """
+    Build manifest.
+
+    Each source is recorded with its output, the fingerprint of the run's
+    global configuration, the fingerprint of its effective settings, and
+    the state of every file that went into the output (the source, the
+    template, and resources included through the template filters).
+    A file's state is its mtime, size, and content hash; the hash is only
+    computed when the mtime changed but the size did not.  Sources converted
+    with extensions that read other files are not recorded (which files they
+    read isn't known), so they are always rebuilt.
+    """
+
+    def __init__(self, manifest_path=None):
+        """Initialize."""
+
+        self.path = path.abspath(manifest_path if manifest_path is not None else DEFAULT_MANIFEST)
+        self.records = {}
+        self.updates = {}
+        self.reset()
+        self.load()
+
+    def load(self):
+        """Load the manifest if there is one."""
+
+        if path.exists(self.path):
+            try:
+                with codecs.open(self.path, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+                if manifest.get('version') == MANIFEST_VERSION:
+                    self.records = manifest.get('records', {})
+            except Exception:
+                logger.Log.debug(traceback.format_exc())
+                logger.Log.error("Could not read manifest '%s'; rebuilding all files!" % self.path)
+
+    def save(self):
+        """Merge the updated records in and write the manifest."""
+
+        if not self.updates:
+            return
+        for source, record in self.updates.items():
+            if record is None:
+                self.records.pop(source, None)
+            else:
+                self.records[source] = record
+        self.updates = {}
+        try:
+            util.write_atomic(
+                self.path,
+                json.dumps(
+                    {'version': MANIFEST_VERSION, 'records': self.records},
+                    sort_keys=True,
+                    indent=1
+                ).encode('utf-8')
+            )
+        except Exception:
+            logger.Log.error(traceback.format_exc())
+
+    def merge(self, updates):
+        """Merge in records updated elsewhere (such as in a worker process)."""
+
+        self.updates.update(updates)
+
+    def reset(self):
+        """Forget the file states gathered so far so they are read again."""
+
+        self.stats = {}
+        self.hashes = {}
+
+    def get_stat(self, pth):
+        """Get the mtime and size of a file (once per run)."""
+
+        if pth not in self.stats:
+            try:
+                st = os.stat(pth)
+                self.stats[pth] = (st.st_mtime, st.st_size)
+            except OSError:
+                self.stats[pth] = None
+        return self.stats[pth]
+
+    def get_hash(self, pth):
+        """Get the content hash of a file (once per run)."""
+
+        if pth not in self.hashes:
+            self.hashes[pth] = util.hash_file(pth)
+        return self.hashes[pth]
+
+    def get_state(self, pth):
+        """Get the mtime, size, and hash of a file."""
+
+        st = os.stat(pth)
+        current = (st.st_mtime, st.st_size)
+        if self.stats.get(pth) != current:
+            self.stats[pth] = current
+            self.hashes.pop(pth, None)
+        return [st.st_mtime, st.st_size, self.get_hash(pth)]
+
+    def check(self, pth, state):
+        """
+        Check the file against the recorded state.
+
+        The content is only hashed when the mtime changed but the size did not.
+        Returns the file's current mtime if it is unchanged, else `None`.
+        """
+
+        current = self.get_stat(pth)
+        if current is None or current[1] != state[1]:
+            return None
+        if current[0] != state[0]:
+            try:
+                if self.get_hash(pth) != state[2]:
+                    return None
+            except Exception:
+                return None
+        return current[0]
+
+    def is_current(self, source, config):
+        """
+        Check if the source's output is up to date.
+
+        Returns `True` if nothing changed, `False` if the output needs to
+        be rebuilt, and `None` if the files are unchanged but the global
+        configuration changed, in which case the effective settings need
+        to be compared with `is_settings_current`.
+        """
+
+        record = self.records.get(source)
+        if record is None or not path.isfile(record['output']):
+            return False
+
+        for pth, state in record['files'].items():
+            mtime = self.check(pth, state)
+            if mtime is None:
+                return False
+            if mtime != state[0]:
+                # Content is the same, so remember the new mtime for the cheap check.
+                state[0] = mtime
+                self.updates[source] = record
+
+        return True if record['config'] == config else None
+
+    def is_settings_current(self, source, config, settings):
+        """Check if the effective settings match the recorded ones and refresh the record if so."""
+
+        record = self.records.get(source)
+        if record is None or record['settings'] != settings:
+            return False
+
+        record['config'] = config
+        self.updates[source] = record
+        return True
+
+    def forget(self, source):
+        """Forget the source so its output is always rebuilt."""
+
+        self.updates[source] = None
+
+    def record(self, source, output, config, settings, dependencies):
+        """Record the state of the inputs that went into the output."""
+
+        files = {}
+        try:
+            for pth in [source] + sorted(set(dependencies)):
+                files[pth] = self.get_state(pth)
+        except Exception:
+            logger.Log.debug(traceback.format_exc())
+            self.updates.pop(source, None)
+            return
+
+        self.updates[source] = {
+            'output': output,
+            'config': config,
+            'settings': settings,
+            'files': files
+        }
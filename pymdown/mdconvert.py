@@ -8,26 +8,67 @@ from __future__ import unicode_literals
 from __future__ import print_function
 from __future__ import absolute_import
 from markdown import Markdown
+from markdown import version as markdown_version
 import codecs
 import traceback
 import re
+import threading
+from collections import OrderedDict
 from . import logger
 from . import compat
 from . import util
 
 RE_TAGS = re.compile(r'''</?[^>]*>''', re.UNICODE)
 RE_WORD = re.compile(r'''[^\w\- ]''', re.UNICODE)
+PATH_PLACEHOLDERS = ('${BASE_PATH}', '${REL_PATH}', '${OUTPUT}')
+# Extensions that pull other files into the HTML, which the HTML cache can't tell have changed
+FILE_EXTENSIONS = ('pymdownx.snippets', 'pymdownx.b64')
+
+# Methods of the processors in each registry that do the work
+PROCESSOR_METHODS = {
+    'preprocessors': ('run',),
+    'blockprocessors': ('test', 'run'),
+    'treeprocessors': ('run',),
+    'inlinePatterns': ('handleMatch',),
+    'postprocessors': ('run',)
+}
+# Processors that are not owned by an extension
+CORE_OWNER = 'markdown'
+
+try:
+    from pymdownx.__version__ import version as pymdownx_version
+except Exception:  # pragma: no cover
+    pymdownx_version = None
 
 
 class MdConvertException(Exception):
     """MdConvert Exception."""
 
 
+class TimedRegex(object):
+    """Compiled pattern whose matches are timed."""
+
+    def __init__(self, regex, match):
+        """Initialize."""
+
+        self.regex = regex
+        self.match = match
+
+    def __getattr__(self, name):
+        """Get everything else from the pattern."""
+
+        return getattr(self.regex, name)
+
+
 class MdWrapper(Markdown):
     """
     Wrapper around Python Markdown's class.
 
     This allows us to gracefully continue when a module doesn't load.
+    It also tracks which processors each extension registered so that
+    extensions that depend on per-document paths can be rebound when
+    the instance is reused.  Processors can also be instrumented so the
+    time spent in each extension can be measured.
     """
 
     Meta = {}
@@ -35,8 +76,38 @@ class MdWrapper(Markdown):
     def __init__(self, *args, **kwargs):
         """Call original init."""
 
+        self.extension_entries = {}
+        self.extension_objects = {}
+        self.bound_paths = kwargs.pop('bound_paths', None)
         super(MdWrapper, self).__init__(*args, **kwargs)
 
+    def get_registries(self):
+        """Get the processor registries that extensions can add to."""
+
+        return (
+            ('preprocessors', self.preprocessors),
+            ('blockprocessors', self.parser.blockprocessors),
+            ('treeprocessors', self.treeprocessors),
+            ('inlinePatterns', self.inlinePatterns),
+            ('postprocessors', self.postprocessors)
+        )
+
+    def get_registry_state(self):
+        """Get the identity of every registered processor."""
+
+        state = set()
+        for name, registry in self.get_registries():
+            for key in registry.keys():
+                state.add((name, key, id(registry[key])))
+        return state
+
+    def extend(self, ext):
+        """Extend Markdown with the extension and return the processor entries it added or replaced."""
+
+        before = self.get_registry_state()
+        ext.extendMarkdown(self, globals())
+        return sorted(set((name, key) for name, key, _ in (self.get_registry_state() - before)))
+
     def registerExtensions(self, extensions, configs):  # noqa
         """
         Register extensions with this instance of Markdown.
@@ -54,10 +125,12 @@ class MdWrapper(Markdown):
 
         for ext in extensions:
             try:
+                name = ext
                 if isinstance(ext, util.string_type):
                     ext = self.build_extension(ext, configs.get(ext, {}))
                 if isinstance(ext, Extension):
-                    ext.extendMarkdown(self, globals())
+                    self.extension_entries[name] = self.extend(ext)
+                    self.extension_objects[name] = ext
                     logger.Log.debug(
                         'Successfully loaded extension "%s.%s".'
                         % (ext.__class__.__module__, ext.__class__.__name__)
@@ -74,6 +147,149 @@ class MdWrapper(Markdown):
 
         return self
 
+    def rebind_extension(self, name, config):
+        """
+        Rebuild an extension with a new config in place.
+
+        The extension's processors are removed, the extension is rebuilt and
+        re-applied, and its processors are moved back to their original positions.
+        Returns `False` if the extension did not register the same processors,
+        in which case the instance should not be reused.
+        """
+
+        entries = self.extension_entries.get(name)
+        old_ext = self.extension_objects.get(name)
+        if entries is None or old_ext is None:
+            return False
+
+        registries = dict(self.get_registries())
+        positions = sorted((registries[reg_name].index(key), reg_name, key) for reg_name, key in entries)
+        for _, reg_name, key in positions:
+            del registries[reg_name][key]
+        index = self.registeredExtensions.index(old_ext) if old_ext in self.registeredExtensions else None
+        if index is not None:
+            del self.registeredExtensions[index]
+
+        ext = self.build_extension(name, config)
+        new_entries = self.extend(ext)
+        if new_entries != entries:
+            return False
+
+        for _, reg_name, key in positions:
+            registries[reg_name].keyOrder.remove(key)
+        for pos, reg_name, key in positions:
+            registries[reg_name].keyOrder.insert(pos, key)
+        if index is not None and ext in self.registeredExtensions:
+            self.registeredExtensions.remove(ext)
+            self.registeredExtensions.insert(index, ext)
+
+        self.extension_objects[name] = ext
+        return True
+
+    def get_owners(self):
+        """Get the extension that registered each processor entry."""
+
+        owners = {}
+        for name, entries in self.extension_entries.items():
+            if not isinstance(name, compat.string_type):
+                name = '%s.%s' % (name.__class__.__module__, name.__class__.__name__)
+            for entry in entries:
+                owners[entry] = name
+        return owners
+
+    def instrument(self, timings):
+        """
+        Time the calls of every registered processor with the extension timings.
+
+        Processors that are already timed are left alone, so this can be called
+        again to pick up processors added since (such as by rebinding).
+        """
+
+        owners = self.get_owners()
+        for reg_name, registry in self.get_registries():
+            for key in registry.keys():
+                processor = registry[key]
+                if getattr(processor, 'pymdown_timed', False):
+                    continue
+                owner = owners.get((reg_name, key), CORE_OWNER)
+                label = '%s.%s' % (reg_name, key)
+                for method in PROCESSOR_METHODS[reg_name]:
+                    setattr(processor, method, timings.wrap(getattr(processor, method), owner, label))
+                if reg_name == 'inlinePatterns':
+                    # Most of an inline pattern's time is spent looking for matches.
+                    regex = processor.getCompiledRegExp()
+                    timed = TimedRegex(regex, timings.wrap(regex.match, owner, label))
+                    processor.getCompiledRegExp = lambda timed=timed: timed
+                processor.pymdown_timed = True
+
+    def bind(self, paths, path_extensions, configs):
+        """Rebind the extensions that use per-document paths if the paths have changed."""
+
+        if paths == self.bound_paths:
+            return True
+
+        for name in path_extensions:
+            if name in self.extension_objects and not self.rebind_extension(name, configs[name]):
+                return False
+        self.bound_paths = paths
+        return True
+
+
+class ConverterPool(object):
+    """
+    Pool of initialized Markdown instances.
+
+    Instances are keyed by a fingerprint of the extension list, the extension
+    configs (before per-document paths are substituted), and the core options.
+    Instances are reset between documents instead of being rebuilt, unless
+    the document changed their processors (such as abbreviations adding
+    patterns), as a reset doesn't undo that.
+    """
+
+    def __init__(self, size=8):
+        """Initialize."""
+
+        self.size = size
+        self.idle = OrderedDict()
+        self.lock = threading.Lock()
+
+    def acquire(self, converter):
+        """Get an instance bound to the converter's paths and the key it should be released under."""
+
+        key = converter.get_fingerprint()
+        md = None
+        with self.lock:
+            instances = self.idle.get(key)
+            if instances:
+                md = instances.pop()
+
+        if md is not None:
+            if not md.bind(converter.get_paths(), converter.path_extensions, converter.extension_configs):
+                md = None
+        if md is None:
+            md = converter.create_markdown()
+        md.pooled_state = md.get_registry_state()
+        return key, md
+
+    def release(self, key, md):
+        """Reset the instance and return it to the pool (if its processors weren't changed by the document)."""
+
+        if md.get_registry_state() != md.pooled_state:
+            return
+        md.reset()
+        with self.lock:
+            instances = self.idle.pop(key, [])
+            instances.append(md)
+            self.idle[key] = instances
+            while len(self.idle) > self.size:
+                self.idle.popitem(last=False)
+
+    def clear(self):
+        """Discard all pooled instances."""
+
+        with self.lock:
+            self.idle.clear()
+
 
 class MdConvert(object):
     """Markdown converter."""
@@ -96,26 +312,125 @@ class MdConvert(object):
         self.lazy_ol = kwargs.get('lazy_ol', True)
         self.enable_attributes = kwargs.get('enable_attributes', True)
         self.output_format = kwargs.get('output_format', 'xhtml1')
+        self.pool = kwargs.get('pool')
+        self.cache = kwargs.get('cache')
+        self.extension_timings = kwargs.get('extension_timings')
+
+    def get_paths(self):
+        """Get the per-document path values."""
+
+        return (self.base_path, self.relative_path, self.output_path)
+
+    def substitute_paths(self, value):
+        """Replace path placeholders with the per-document path values."""
+
+        return value.replace(
+            '${BASE_PATH}', self.base_path
+        ).replace(
+            '${REL_PATH}', self.relative_path
+        ).replace(
+            '${OUTPUT}', self.output_path
+        )
 
     def process_extensions(self, extensions):
-        """Process the extensions separating extension name from configuration."""
+        """
+        Process the extensions separating extension name from configuration.
+
+        The unsubstituted configs are kept so that a pooled Markdown instance
+        can be shared by documents with different paths, and the extensions
+        that use path placeholders are noted so they can be rebound.
+        """
 
         self.md_extensions = []
         self.extension_configs = {}
+        self.extension_templates = {}
+        self.path_extensions = []
+        self.reads_files = False
         for k in extensions.keys():
-            if extensions[k] is None:
-                extensions[k] = {}
-            for sub_k, sub_v in extensions[k].items():
+            if k.split(':')[0] in FILE_EXTENSIONS:
+                self.reads_files = True
+            template = extensions[k] if extensions[k] is not None else {}
+            config = {}
+            for sub_k, sub_v in template.items():
                 if isinstance(sub_v, compat.string_type):
-                    extensions[k][sub_k] = sub_v.replace(
-                        '${BASE_PATH}', self.base_path
-                    ).replace(
-                        '${REL_PATH}', self.relative_path
-                    ).replace(
-                        '${OUTPUT}', self.output_path
-                    )
+                    if k not in self.path_extensions and any(p in sub_v for p in PATH_PLACEHOLDERS):
+                        self.path_extensions.append(k)
+                    sub_v = self.substitute_paths(sub_v)
+                else:
+                    # Settings loaded from a snapshot leave callables to be imported on use
+                    sub_v = util.resolve_names(sub_v)
+                config[sub_k] = sub_v
             self.md_extensions.append(k)
-            self.extension_configs[k] = extensions[k]
+            self.extension_configs[k] = config
+            self.extension_templates[k] = template
+
+    def get_fingerprint(self, resolved=False):
+        """
+        Get the fingerprint of the extensions, their configs, and the core options.
+
+        By default, the configs are fingerprinted before the per-document paths are
+        substituted.  If `resolved` is enabled, the substituted configs and the
+        Markdown versions are used so the fingerprint covers everything that can
+        affect the HTML.
+        """
+
+        return util.fingerprint(
+            [
+                self.md_extensions,
+                self.extension_configs if resolved else self.extension_templates,
+                [markdown_version, pymdownx_version] if resolved else None,
+                self.smart_emphasis,
+                self.tab_length,
+                self.lazy_ol,
+                self.enable_attributes,
+                self.output_format
+            ]
+        )
+
+    def create_markdown(self):
+        """Create a new Markdown instance."""
+
+        return MdWrapper(
+            extensions=self.md_extensions,
+            extension_configs=self.extension_configs,
+            smart_emphasis=self.smart_emphasis,
+            tab_length=self.tab_length,
+            lazy_ol=self.lazy_ol,
+            enable_attributes=self.enable_attributes,
+            output_format=self.output_format,
+            bound_paths=self.get_paths()
+        )
+
+    def run(self, source):
+        """
+        Convert the source.
+
+        The HTML cache is checked first if one was provided (unless an extension
+        reads other files into the HTML), and a pooled instance is used if a pool
+        was provided.  The processors are timed if extension timings were provided.
+        """
+
+        cache = self.cache if not self.reads_files else None
+        if cache is not None:
+            cache_key = cache.get_key(source, self.get_fingerprint(resolved=True))
+            html = cache.get(cache_key)
+            if html is not None:
+                return html
+
+        if self.pool is None:
+            md = self.create_markdown()
+        else:
+            key, md = self.pool.acquire(self)
+        if self.extension_timings is not None:
+            md.instrument(self.extension_timings)
+        # An instance that failed mid conversion is not returned to the pool.
+        html = md.convert(source)
+        if self.pool is not None:
+            self.pool.release(key, md)
+
+        if cache is not None:
+            cache.put(cache_key, html)
+        return html
 
     def convert(self):
         """Convert the file to HTML."""
@@ -123,16 +438,7 @@ class MdConvert(object):
         self.markdown = ""
         try:
             with codecs.open(self.source, "r", encoding=self.encoding) as f:
-                md = MdWrapper(
-                    extensions=self.md_extensions,
-                    extension_configs=self.extension_configs,
-                    smart_emphasis=self.smart_emphasis,
-                    tab_length=self.tab_length,
-                    lazy_ol=self.lazy_ol,
-                    enable_attributes=self.enable_attributes,
-                    output_format=self.output_format
-                )
-                self.markdown = md.convert(f.read())
+                self.markdown = self.run(f.read())
         except Exception:
             raise MdConvertException(str(traceback.format_exc()))
 
@@ -145,15 +451,6 @@ class MdConverts(MdConvert):
 
         self.markdown = ""
         try:
-            md = MdWrapper(
-                extensions=self.md_extensions,
-                extension_configs=self.extension_configs,
-                smart_emphasis=self.smart_emphasis,
-                tab_length=self.tab_length,
-                lazy_ol=self.lazy_ol,
-                enable_attributes=self.enable_attributes,
-                output_format=self.output_format
-            )
-            self.markdown = md.convert(self.source)
+            self.markdown = self.run(self.source)
         except Exception:
             raise MdConvertException(str(traceback.format_exc()))
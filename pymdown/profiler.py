@@ -0,0 +1,275 @@
+"""
+Profiler.
+
+Profile conversions with cProfile or with a sampling profiler that writes collapsed
+stacks for flame graph tools.
+
+Licensed under MIT
+Copyright (c) 2014 - 2015 Isaac Muse <isaacmuse@gmail.com>
+"""
+from __future__ import unicode_literals
+from __future__ import absolute_import
+import codecs
+import hashlib
+import os
+import os.path as path
+import sys
+import threading
+import traceback
+from . import logger
+
+# Seconds between samples
+SAMPLE_INTERVAL = 0.005
+
+
+class PyMdownProfilerException(Exception):
+    """PyMdown profiler exception."""
+
+
+def parse_profile(value):
+    """Split a `kind:path` profile value and check it."""
+
+    kind, sep, pth = value.partition(':')
+    if not sep or not pth:
+        raise PyMdownProfilerException("Profile must be given as 'kind:path'!")
+    if kind not in PROFILERS:
+        raise PyMdownProfilerException(
+            "Profile kind must be one of: %s!" % ', '.join("'%s'" % k for k in sorted(PROFILERS))
+        )
+    return kind, pth
+
+
+def get_profiler(value, per_file=False):
+    """Get the profiler for a `kind:path` profile value."""
+
+    kind, pth = parse_profile(value)
+    return PROFILERS[kind](pth, per_file)
+
+
+class Profiler(object):
+    """
+    Profile conversions.
+
+    Conversions are profiled between calls to `start` and `stop`.  Everything
+    profiled is saved together unless profiles are saved per file, in which
+    case the path is a folder and each source gets its own profile in it.
+    """
+
+    ext = ''
+
+    def __init__(self, pth, per_file=False):
+        """Initialize."""
+
+        self.path = pth
+        self.per_file = per_file
+
+    def get_path(self, source=None):
+        """Get where the profile of the source (or of everything) is saved."""
+
+        if not self.per_file:
+            return self.path
+        if source is None:
+            name = 'stdin'
+        else:
+            # The hash keeps sources with the same name in different folders apart
+            source = path.abspath(source)
+            name = '%s.%s' % (path.basename(source), hashlib.sha1(source.encode('utf-8')).hexdigest()[:8])
+        return path.join(self.path, name + self.ext)
+
+    def start(self):
+        """Start profiling."""
+
+    def stop(self):
+        """Stop profiling."""
+
+    def collect(self):
+        """Get what was profiled since the last call so another process can merge it."""
+
+        return {}
+
+    def merge(self, results):
+        """Merge in what was profiled elsewhere (such as in a worker process)."""
+
+    def write(self, pth):
+        """Write out what was profiled and start fresh."""
+
+    def save(self, source=None):
+        """Save what was profiled."""
+
+        pth = self.get_path(source)
+        try:
+            folder = path.dirname(path.abspath(pth))
+            if not path.exists(folder):
+                os.makedirs(folder)
+            self.write(pth)
+        except Exception:
+            logger.Log.error(traceback.format_exc())
+
+
+class _Stats(object):
+    """Raw profile stats that `pstats` can load."""
+
+    def __init__(self, stats):
+        """Initialize."""
+
+        self.stats = stats
+
+    def create_stats(self):
+        """The stats are already created."""
+
+
+class CProfiler(Profiler):
+    """Profile with cProfile and save the stats for `pstats`."""
+
+    ext = '.pstats'
+
+    def __init__(self, pth, per_file=False):
+        """Initialize."""
+
+        super(CProfiler, self).__init__(pth, per_file)
+        self.profile = None
+        self.stats = None
+
+    def start(self):
+        """Start profiling."""
+
+        import cProfile
+
+        if self.profile is None:
+            self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def stop(self):
+        """Stop profiling."""
+
+        self.profile.disable()
+
+    def get_stats(self):
+        """Get the raw stats profiled since the last call."""
+
+        stats = {}
+        if self.profile is not None:
+            self.profile.create_stats()
+            stats = self.profile.stats
+            self.profile = None
+        return stats
+
+    def collect(self):
+        """Get what was profiled since the last call so another process can merge it."""
+
+        return {'stats': self.get_stats()}
+
+    def merge(self, results):
+        """Merge in what was profiled elsewhere."""
+
+        import pstats
+
+        if results.get('stats'):
+            if self.stats is None:
+                self.stats = pstats.Stats()
+            self.stats.add(_Stats(results['stats']))
+
+    def write(self, pth):
+        """Write out what was profiled and start fresh."""
+
+        self.merge(self.collect())
+        if self.stats is not None:
+            self.stats.dump_stats(pth)
+            self.stats = None
+
+
+class SampleProfiler(Profiler):
+    """
+    Profile by sampling the stack of the converting thread from another thread.
+
+    Samples are saved as collapsed stacks (`outer;inner count`), one per line,
+    which flame graph tools take as input.
+    """
+
+    ext = '.folded'
+
+    def __init__(self, pth, per_file=False, interval=SAMPLE_INTERVAL):
+        """Initialize."""
+
+        super(SampleProfiler, self).__init__(pth, per_file)
+        self.interval = interval
+        self.counts = {}
+        self.stacks = {}
+        self.labels = {}
+        self.thread = None
+        self.stopped = None
+
+    def get_label(self, code):
+        """Get the label of a function in a stack."""
+
+        label = self.labels.get(code)
+        if label is None:
+            label = self.labels[code] = '%s (%s:%d)' % (code.co_name, code.co_filename, code.co_firstlineno)
+        return label
+
+    def sample(self, ident, stopped):
+        """Sample the stack of the thread until stopped."""
+
+        counts = self.counts
+        while not stopped.wait(self.interval):
+            frame = sys._current_frames().get(ident)
+            stack = []
+            while frame is not None:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            if stack:
+                key = tuple(reversed(stack))
+                counts[key] = counts.get(key, 0) + 1
+
+    def start(self):
+        """Start sampling the current thread."""
+
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(
+            target=self.sample, args=(threading.current_thread().ident, self.stopped)
+        )
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        """Stop sampling."""
+
+        self.stopped.set()
+        self.thread.join()
+        self.thread = None
+
+    def collapse(self):
+        """Collapse the sampled stacks."""
+
+        for key, count in self.counts.items():
+            stack = ';'.join(self.get_label(code) for code in key)
+            self.stacks[stack] = self.stacks.get(stack, 0) + count
+        self.counts = {}
+
+    def collect(self):
+        """Get the collapsed stacks sampled since the last call so another process can merge them."""
+
+        self.collapse()
+        stacks = self.stacks
+        self.stacks = {}
+        return {'stacks': stacks}
+
+    def merge(self, results):
+        """Merge in the collapsed stacks sampled elsewhere."""
+
+        for stack, count in results.get('stacks', {}).items():
+            self.stacks[stack] = self.stacks.get(stack, 0) + count
+
+    def write(self, pth):
+        """Write out the collapsed stacks and start fresh."""
+
+        stacks = self.collect()['stacks']
+        with codecs.open(pth, 'w', encoding='utf-8') as f:
+            for stack in sorted(stacks):
+                f.write('%s %d\n' % (stack, stacks[stack]))
+
+
+PROFILERS = {
+    'cprofile': CProfiler,
+    'sample': SampleProfiler
+}
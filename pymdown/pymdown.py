@@ -17,13 +17,25 @@ from .template import Template
 from . import critic_dump
 from . import logger
 from . import formatter
-from . import mdconvert
 from . import settings
+from . import batch
+from . import manifest
+from . import cache
+from . import report
 import traceback
 
 PASS = 0
 FAIL = 1
 
+# Options that control how a run is carried out, but not what it outputs
+RUN_OPTIONS = (
+    'jobs', 'incremental', 'manifest', 'cache', 'cache_size', 'scan_dirs', 'timings', 'extension_timings',
+    'memory', 'profile', 'profile_per_file'
+)
+
+# Characters of a source read at a time when dumping critic marks
+READ_SIZE = 1024 * 1024
+
 
 class Convert(object):
     """Converts markdown files."""
@@ -31,15 +43,65 @@ class Convert(object):
     def __init__(self, **kwargs):
         """Unpack user files and then load up settings."""
 
+        from .mdconvert import ConverterPool
+
         util.unpack_user_files()
-        self.config = settings.Settings(**kwargs)
-        self.config.read_settings()
+        util.set_path_listings(kwargs.get('scan_dirs', False))
+        self.options = kwargs
+        self.jobs = kwargs.get('jobs', 1)
+        self.converters = ConverterPool()
+        self.cache = None
+        if kwargs.get('cache') is not None:
+            self.cache = cache.HtmlCache(kwargs['cache'], kwargs.get('cache_size', cache.DEFAULT_CACHE_SIZE))
+        self.manifest = None
+        if kwargs.get('incremental', False):
+            self.manifest = manifest.Manifest(kwargs.get('manifest'))
+        self.report = None
+        if kwargs.get('timings') is not None:
+            self.report = report.Report(
+                kwargs['timings'], kwargs.get('extension_timings', False), kwargs.get('memory', False)
+            )
+        self.profiler = None
+        if kwargs.get('profile') is not None:
+            from . import profiler
+            self.profiler = profiler.get_profiler(kwargs['profile'], kwargs.get('profile_per_file', False))
+        # Files read into each output
+        self.dependencies = {}
+        self.load_settings()
         self.output = kwargs.get('output')
         self.basepath = kwargs.get('basepath')
         self.relpath = kwargs.get('relpath')
         self.title = kwargs.get('title')
         self.settings_path = kwargs.get('settings_path')
 
+    def load_settings(self):
+        """Load the settings (again), profiling it along with the conversions unless profiles are per file."""
+
+        if self.profiler is None or self.profiler.per_file:
+            self.read_settings()
+            return
+
+        self.profiler.start()
+        try:
+            self.read_settings()
+        finally:
+            self.profiler.stop()
+
+    def read_settings(self):
+        """Read the settings."""
+
+        self.config = settings.Settings(**self.options)
+        self.config.read_settings()
+        self.converters.clear()
+        if self.manifest is not None:
+            # Fingerprint of everything global that can affect an output
+            self.fingerprint = util.fingerprint(
+                [
+                    self.config.settings,
+                    dict((k, v) for k, v in self.options.items() if k not in RUN_OPTIONS)
+                ]
+            )
+
     def strip_frontmatter(self, text):
         """
         Extract settings from file frontmatter and config file.
@@ -47,15 +109,18 @@ class Convert(object):
         Fronmatter options will overwrite config file options.
         """
 
-        frontmatter, text = util.get_frontmatter(text)
+        frontmatter, text = util.get_frontmatter(
+            text, self.options.get('frontmatter_max_size', util.FRONTMATTER_MAX_SIZE)
+        )
         return frontmatter, text
 
-    def get_file_settings(self, file_name, title=None, frontmatter=None):
+    def get_file_settings(self, file_name, title=None, frontmatter=None, basepath=None, relpath=None):
         """
         Get the file settings merged with the file's frontmatter.
 
         Using the filename and/or frontmatter, this retrieves
         the full set of settings for this specific file.
+        The basepath and relpath default to the ones the converter was created with.
         """
 
         status = PASS
@@ -65,8 +130,10 @@ class Convert(object):
 
         try:
             self.settings = self.config.get(
-                file_name, title=title, output=self.output, basepath=self.basepath,
-                relpath=self.relpath, frontmatter=frontmatter
+                file_name, title=title, output=self.output,
+                basepath=basepath if basepath is not None else self.basepath,
+                relpath=relpath if relpath is not None else self.relpath,
+                frontmatter=frontmatter
             )
         except Exception:
             logger.Log.error(traceback.format_exc())
@@ -84,20 +151,52 @@ class Convert(object):
             text = None
         return text
 
+    def read_chunks(self, source):
+        """Read the opened source file from the start a chunk at a time."""
+
+        source.seek(0)
+        while True:
+            chunk = source.read(READ_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+    def get_watch(self, file_name):
+        """Get a stopwatch for the conversion of the file."""
+
+        return self.report.watch(file_name) if self.report is not None else report.Stopwatch(file_name)
+
     def critic_dump(self, file_name, text):
-        """Dump the markdown back out after stripping critic marks."""
+        """
+        Dump the markdown back out after stripping critic marks.
+
+        Files are read and written a chunk at a time so large files don't need to be held in memory.
+        """
 
         status = PASS
+        watch = self.get_watch(file_name)
+        source = None
 
-        status = self.get_file_settings(file_name)
-        is_valid_dump = not (
-            self.config.critic &
-            (util.CRITIC_REJECT | util.CRITIC_ACCEPT)
-        )
+        with watch.time('settings'):
+            status = self.get_file_settings(file_name)
+        is_valid_dump = not self.config.critic & (util.CRITIC_REJECT | util.CRITIC_ACCEPT)
 
         if status == PASS and file_name is not None:
-            text = self.read_file(file_name)
-            if text is None:
+            try:
+                source = codecs.open(file_name, "r", encoding=self.config.encoding)
+            except Exception:
+                logger.Log.error("Failed to open %s!" % file_name)
+                status = FAIL
+
+        if status == PASS:
+            # Find where marks can be closed before anything is written.
+            try:
+                with watch.time('critic'):
+                    closes = critic_dump.find_closes(self.read_chunks(source) if source is not None else [text])
+                if self.report is not None:
+                    watch.size = path.getsize(file_name) if file_name is not None else len(text.encode('utf-8'))
+            except Exception:
+                logger.Log.error(traceback.format_exc())
                 status = FAIL
 
         if status == PASS and is_valid_dump:
@@ -105,52 +204,104 @@ class Convert(object):
             status = FAIL
 
         if status == PASS:
-            txt = formatter.Text(self.settings["page"]["encoding"])
+            txt = formatter.Text(settings=self.settings)
 
             # Create text object
             try:
-                txt.open()
-                # Apply critic stripping
-                text = critic_dump.CriticDump().dump(
-                    text,
-                    self.config.critic & util.CRITIC_ACCEPT,
-                    self.config.critic & util.CRITIC_VIEW
-                )
-
-                # Dump the converted text
-                txt.write(text)
+                with watch.time('write'):
+                    txt.open()
+                # Apply critic stripping and dump the converted text
+                with watch.time('critic'):
+                    txt.write(
+                        critic_dump.CriticDump().stream(
+                            self.read_chunks(source) if source is not None else [text],
+                            self.config.critic & util.CRITIC_ACCEPT,
+                            self.config.critic & util.CRITIC_VIEW,
+                            closes
+                        )
+                    )
             except Exception:
                 logger.Log.error(str(traceback.format_exc()))
                 status = FAIL
 
             # Close up the text file
-            txt.close()
+            with watch.time('write'):
+                txt.close()
+
+        if source is not None:
+            source.close()
+
+        if self.report is not None:
+            self.report.record(watch, status)
 
         return status
 
-    def html_dump(self, file_name, text):
-        """Convet markdown to HTML."""
+    def html_dump(self, file_name, text, check_settings=False, stream=None, overrides=None):
+        """
+        Convet markdown to HTML.
+
+        If `check_settings` is enabled, the file's inputs are known to be
+        unchanged, so the conversion is skipped if the effective settings
+        match the ones recorded in the manifest.
+
+        If a `stream` is given, the HTML is written to it instead of the output.
+        `overrides` can provide frontmatter (merged over the file's frontmatter),
+        a title, a basepath, and a relpath for this file.
+        """
 
         status = PASS
+        settings_fingerprint = None
+        dependencies = set()
+        watch = self.get_watch(file_name)
+        if overrides is None:
+            overrides = {}
 
         if status == PASS and file_name is not None:
-            text = self.read_file(file_name)
+            with watch.time('read'):
+                text = self.read_file(file_name)
             if text is None:
                 status = FAIL
 
+        if status == PASS and self.report is not None:
+            watch.size = len(text.encode('utf-8'))
+
         if status == PASS:
-            frontmatter, text = self.strip_frontmatter(text)
-            status = self.get_file_settings(file_name, frontmatter=frontmatter)
+            with watch.time('frontmatter'):
+                frontmatter, text = self.strip_frontmatter(text)
+            if overrides.get('frontmatter'):
+                frontmatter.update(overrides['frontmatter'])
+            with watch.time('settings'):
+                status = self.get_file_settings(
+                    file_name,
+                    title=overrides.get('title'),
+                    frontmatter=frontmatter,
+                    basepath=overrides.get('basepath'),
+                    relpath=overrides.get('relpath')
+                )
+
+        if status == PASS and self.manifest is not None:
+            settings_fingerprint = util.fingerprint(self.settings)
+            if check_settings and self.manifest.is_settings_current(
+                path.abspath(file_name), self.fingerprint, settings_fingerprint
+            ):
+                logger.Log.info("%s is up to date." % file_name)
+                if self.report is not None:
+                    self.report.record(watch, status, skipped=True)
+                return status
 
         if status == PASS:
             # Create html object
             html = formatter.Html(
                 preview=self.config.preview,
                 plain=self.config.plain,
-                settings=self.settings
+                settings=self.settings,
+                stream=stream,
+                cache_dir=self.options.get('cache'),
+                watch=watch
             )
             try:
-                html.open()
+                with watch.time('write'):
+                    html.open()
 
                 if self.config.preview and html.file.name:
                     # Special case: we have to force relative path to be the output for previews
@@ -158,26 +309,35 @@ class Convert(object):
 
                 # Prepare template from markdown text to apply template variables
                 if self.settings['pymdown_settings']['use_jinja2']:
+                    watch.start('jinja2')
                     template = Template(
                         basepath=self.settings["page"]["basepath"],
                         relpath=self.settings["page"]["relpath"],
                         force_conversion=self.config.preview,
                         disable_path_conversion=self.settings["pymdown_settings"]["disable_path_conversion"],
                         absolute_path_conversion=self.settings["pymdown_settings"]["path_conversion_absolute"],
+                        embed_image_max_size=self.settings["pymdown_settings"]["embed_image_max_size"],
                         template_tags={
                             'block': self.settings["pymdown_settings"]["jinja2_block"],
                             'variable': self.settings["pymdown_settings"]["jinja2_variable"],
                             'comment': self.settings["pymdown_settings"]["jinja2_comment"]
-                        }
-                    ).get_template_from_string(text)
+                        },
+                        cache_dir=self.options.get('cache')
+                    )
                     text = template.render(
+                        template.get_template_from_string(text),
                         settings=self.settings["pymdown_settings"],
                         page=self.settings["page"],
                         extra=self.settings["extra"]
                     )
+                    dependencies |= template.dependencies
+                    watch.stop()
 
                 # Set up Converter
-                converter = mdconvert.MdConverts(
+                watch.start('markdown')
+                from .mdconvert import MdConverts
+
+                converter = MdConverts(
                     text,
                     smart_emphasis=self.settings["pymdown_settings"]['smart_emphasis'],
                     lazy_ol=self.settings["pymdown_settings"]['lazy_ol'],
@@ -187,53 +347,175 @@ class Convert(object):
                     output_path=path.dirname(html.file.name) if html.file.name else self.config.out,
                     enable_attributes=self.settings["pymdown_settings"]['enable_attributes'],
                     output_format=self.settings["pymdown_settings"]['output_format'],
-                    markdown_extensions=self.settings["pymdown_settings"]["markdown_extensions"]
+                    markdown_extensions=self.settings["pymdown_settings"]["markdown_extensions"],
+                    pool=self.converters,
+                    cache=self.cache,
+                    extension_timings=self.report.extension_timings if self.report is not None else None
                 )
 
                 # Markdown -> HTML
                 converter.convert()
+                watch.stop()
 
                 # Write the markdown to the HTML
-                html.write(converter.markdown)
+                with watch.time('template'):
+                    html.write(converter.markdown)
             except Exception:
                 logger.Log.error(str(traceback.format_exc()))
                 status = FAIL
 
             # Close the HTML file
-            html.close()
+            with watch.time('write'):
+                html.close()
+
+            if status == PASS and file_name is not None:
+                dependencies |= html.dependencies
+                self.dependencies[path.abspath(file_name)] = dependencies
+
+                # Record what went into the output for incremental builds
+                destination = self.settings['page']['destination']
+                if settings_fingerprint is not None and converter.reads_files:
+                    # Files read by extensions aren't known, so the output can never be trusted to be current.
+                    self.manifest.forget(path.abspath(file_name))
+                elif settings_fingerprint is not None and not self.config.preview and destination is not None:
+                    self.manifest.record(
+                        path.abspath(file_name),
+                        path.abspath(destination),
+                        self.fingerprint,
+                        settings_fingerprint,
+                        dependencies
+                    )
+
+        if self.report is not None:
+            self.report.record(watch, status)
 
         # Preview the markdown
         if status == PASS and html.file.name is not None and self.config.preview:
             util.open_in_browser(html.file.name)
         return status
 
+    def render(self, text, **kwargs):
+        """
+        Convert a markdown buffer and return the status and the HTML.
+
+        Accepts `frontmatter`, `title`, `basepath`, and `relpath` overrides.
+        """
+
+        stream = formatter.Buffer()
+        status = self.html_dump(None, text, stream=stream, overrides=kwargs)
+        return status, stream.getvalue()
+
+    def get_meta(self):
+        """Get the title and the extra (frontmatter) variables of the last document."""
+
+        return {
+            'title': self.settings['page'].get('title'),
+            'extra': self.settings['extra']
+        }
+
+    def convert_file(self, md_file):
+        """Convert a single markdown file or buffer (and profile it if requested)."""
+
+        if self.profiler is None:
+            return self.process_file(md_file)
+
+        self.profiler.start()
+        try:
+            status = self.process_file(md_file)
+        finally:
+            self.profiler.stop()
+        if self.profiler.per_file:
+            self.profiler.save(md_file if not self.config.is_stream else None)
+        return status
+
+    def process_file(self, md_file):
+        """Convert a single markdown file or buffer."""
+
+        file_name = md_file if not self.config.is_stream else None
+        text = None if not self.config.is_stream else md_file
+        check_settings = False
+
+        # Skip files whose output is up to date
+        if self.manifest is not None and file_name is not None and not self.config.critic & util.CRITIC_DUMP:
+            current = self.manifest.is_current(path.abspath(file_name), self.fingerprint)
+            if current:
+                logger.Log.info("%s is up to date." % file_name)
+                if self.report is not None:
+                    self.report.record(self.report.watch(file_name), PASS, skipped=True)
+                return PASS
+            check_settings = current is None
+
+        if self.config.is_stream:
+            logger.Log.info("Converting buffer...")
+        else:
+            logger.Log.info("Converting %s..." % md_file)
+
+        if self.config.critic & util.CRITIC_DUMP:
+            status = self.critic_dump(file_name, text)
+        else:
+            status = self.html_dump(file_name, text, check_settings)
+        return status
+
+    def collect(self, final=False):
+        """
+        Collect the results gathered since the last call so another process can merge them.
+
+        If `final`, results that are only worth collecting once the process is done are included.
+        """
+
+        results = {}
+        if self.manifest is not None:
+            results['manifest'] = self.manifest.updates
+            self.manifest.updates = {}
+        if self.report is not None:
+            results['report'] = self.report.collect(final)
+        if self.profiler is not None and not self.profiler.per_file:
+            results['profile'] = self.profiler.collect()
+        return results
+
+    def merge(self, results):
+        """Merge results collected in another process."""
+
+        if self.manifest is not None and 'manifest' in results:
+            self.manifest.merge(results['manifest'])
+        if self.report is not None and 'report' in results:
+            self.report.merge(results['report'])
+        if self.profiler is not None and 'profile' in results:
+            self.profiler.merge(results['profile'])
+
     def convert(self, files):
         """Convert markdown file(s)."""
 
         status = PASS
 
+        # Path lookups are only trusted for the length of a run
+        util.clear_path_cache()
+        if self.report is not None:
+            self.report.reset()
+
         # Make sure we have something we can process
         if files is None or len(files) == 0 or files[0] in ('', None):
             logger.Log.error("Nothing to parse!")
             status = FAIL
 
         if status == PASS:
-            for md_file in files:
-                # Quit dumping if there was an error
-                if status != PASS:
-                    break
-
-                if self.config.is_stream:
-                    logger.Log.info("Converting buffer...")
-                else:
-                    logger.Log.info("Converting %s..." % md_file)
-
-                if status == PASS:
-                    file_name = md_file if not self.config.is_stream else None
-                    text = None if not self.config.is_stream else md_file
-                    md_file = None
-                    if self.config.critic & util.CRITIC_DUMP:
-                        status = self.critic_dump(file_name, text)
-                    else:
-                        status = self.html_dump(file_name, text)
+            jobs = batch.get_jobs(self.jobs)
+            if jobs > 1 and self.config.batch and not self.config.is_stream and len(files) > 1:
+                status = batch.convert(
+                    files, self.options, jobs, self.merge,
+                    finish=self.report is not None and self.report.memory is not None
+                )
+            else:
+                for md_file in files:
+                    status = self.convert_file(md_file)
+                    # Quit dumping if there was an error
+                    if status != PASS:
+                        break
+
+        if self.manifest is not None:
+            self.manifest.save()
+        if self.report is not None:
+            self.report.save()
+        if self.profiler is not None and not self.profiler.per_file:
+            self.profiler.save()
         return status
@@ -0,0 +1,452 @@
+"""
+Report.
+
+Record where the time goes in a run and write it out as a JSON report.
+
+Licensed under MIT
+Copyright (c) 2014 - 2015 Isaac Muse <isaacmuse@gmail.com>
+"""
+from __future__ import unicode_literals
+from __future__ import absolute_import
+from __future__ import division
+import json
+import os
+import sys
+import traceback
+from . import compat
+from . import logger
+from . import util
+
+PASS = 0
+FAIL = 1
+
+REPORT_VERSION = 1
+
+# Stages of a conversion in the order they happen (critic dumps are a stage of their own)
+STAGES = ('read', 'frontmatter', 'settings', 'jinja2', 'markdown', 'template', 'write', 'critic')
+PERCENTILES = (50, 95, 99)
+# Number of allocation sites to report
+MEMORY_TOP = 10
+
+
+def get_percentile(values, percent):
+    """Get the percentile of the sorted values (nearest rank)."""
+
+    if not values:
+        return 0.0
+    rank = max(1, int(-(-percent * len(values) // 100)))
+    return values[rank - 1]
+
+
+def get_max_rss():
+    """Get the peak resident set size of the process in bytes (if it is available)."""
+
+    try:
+        import resource
+    except ImportError:  # pragma: no cover
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB and macOS reports bytes
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+class MemoryTracker(object):
+    """
+    Track the memory allocated by conversions with `tracemalloc`.
+
+    For each conversion, the peak and the growth of the traced memory are
+    recorded.  Once the first conversion has loaded everything it needs,
+    a snapshot of the allocations is taken, so the growth of the process
+    from then on, and the allocation sites responsible for it (which is
+    where leaks show up), can be reported.
+    """
+
+    # Allocations that are not the converter's
+    exclude = ('<unknown>', '<frozen importlib._bootstrap>', '<frozen importlib._bootstrap_external>')
+
+    def __init__(self, top=MEMORY_TOP):
+        """Start tracing."""
+
+        import tracemalloc
+
+        self.tracemalloc = tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.top = top
+        self.peak = 0
+        self.baseline = None
+        self.snapshot = None
+
+    def begin(self):
+        """Begin tracking a conversion and return the traced memory it started with."""
+
+        # Peaks can only be reset on Python 3.9+, so before that they are the highest since tracing began.
+        if hasattr(self.tracemalloc, 'reset_peak'):
+            self.tracemalloc.reset_peak()
+        return self.tracemalloc.get_traced_memory()[0]
+
+    def end(self, size):
+        """End tracking a conversion and get its memory usage."""
+
+        current, peak = self.tracemalloc.get_traced_memory()
+        self.peak = max(self.peak, peak)
+        if self.snapshot is None:
+            self.snapshot = self.tracemalloc.take_snapshot()
+            self.baseline = current
+        return {
+            'peak': peak - size,
+            'growth': current - size,
+            'max_rss': get_max_rss()
+        }
+
+    def get_process(self):
+        """Get the memory usage of the process."""
+
+        current, peak = self.tracemalloc.get_traced_memory()
+        return {
+            'baseline': self.baseline,
+            'current': current,
+            'growth': current - self.baseline if self.baseline is not None else 0,
+            'peak': max(self.peak, peak),
+            'max_rss': get_max_rss()
+        }
+
+    def get_top(self):
+        """Get the allocation sites that grew the most in the process since the first conversion."""
+
+        top = []
+        if self.snapshot is None:
+            return top
+        tracemalloc_file = self.tracemalloc.__file__
+        for stat in self.tracemalloc.take_snapshot().compare_to(self.snapshot, 'lineno'):
+            if len(top) == self.top:
+                break
+            frame = stat.traceback[0]
+            if stat.size_diff <= 0 or frame.filename in self.exclude or frame.filename == tracemalloc_file:
+                continue
+            top.append(
+                {'site': '%s:%d' % (frame.filename, frame.lineno), 'size': stat.size_diff, 'count': stat.count_diff}
+            )
+        return top
+
+
+class Stopwatch(object):
+    """
+    Time the stages of a single conversion.
+
+    Stages can be started while another is running (such as writing while
+    the template is rendered), in which case the running stage is paused so
+    each stage only counts its own time.
+    """
+
+    def __init__(self, source, memory=None):
+        """Initialize."""
+
+        self.source = source
+        self.size = 0
+        self.stages = {}
+        self.running = []
+        self.memory = memory
+        self.memory_state = memory.begin() if memory is not None else None
+        self.started = compat.timer()
+
+    def start(self, stage):
+        """Start (or resume) timing the stage."""
+
+        now = compat.timer()
+        if self.running:
+            self.pause(now)
+        self.running.append([stage, now])
+
+    def stop(self):
+        """Stop timing the current stage and resume the one it interrupted."""
+
+        now = compat.timer()
+        self.pause(now)
+        self.running.pop()
+        if self.running:
+            self.running[-1][1] = now
+
+    def pause(self, now):
+        """Add the time the current stage has been running."""
+
+        stage, start = self.running[-1]
+        self.stages[stage] = self.stages.get(stage, 0.0) + now - start
+
+    def time(self, stage):
+        """Time the stage for the length of a `with` block."""
+
+        return _Stage(self, stage)
+
+    def finish(self, status, skipped=False):
+        """Finish and get the report row (of a skipped file if the output was up to date)."""
+
+        while self.running:
+            self.stop()
+        row = {
+            'source': self.source,
+            'size': self.size,
+            'status': 'skipped' if skipped else ('ok' if status == PASS else 'fail'),
+            'total': compat.timer() - self.started,
+            'stages': self.stages
+        }
+        if self.memory is not None:
+            row['memory'] = self.memory.end(self.memory_state)
+        return row
+
+
+class _Stage(object):
+    """Stage of a stopwatch used with `with`."""
+
+    def __init__(self, watch, stage):
+        """Initialize."""
+
+        self.watch = watch
+        self.stage = stage
+
+    def __enter__(self):
+        """Start the stage."""
+
+        self.watch.start(self.stage)
+        return self
+
+    def __exit__(self, *args):
+        """Stop the stage."""
+
+        self.watch.stop()
+
+
+class ExtensionTimings(object):
+    """
+    Time and count the calls of Markdown processors by the extension that owns them.
+
+    When a processor calls another (such as the inline treeprocessor applying the
+    inline patterns), the time is only counted by the one being called.
+    """
+
+    def __init__(self):
+        """Initialize."""
+
+        self.processors = {}
+        self.running = []
+
+    def wrap(self, func, owner, processor):
+        """Wrap the processor's method so its calls are timed."""
+
+        stats = self.processors.get((owner, processor))
+        if stats is None:
+            stats = self.processors[(owner, processor)] = [0.0, 0]
+        running = self.running
+
+        def timed(*args, **kwargs):
+            """Time the call."""
+
+            now = compat.timer()
+            if running:
+                outer = running[-1]
+                outer[0][0] += now - outer[1]
+            entry = [stats, now]
+            running.append(entry)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                now = compat.timer()
+                stats[0] += now - entry[1]
+                stats[1] += 1
+                running.pop()
+                if running:
+                    running[-1][1] = now
+
+        return timed
+
+    def collect(self):
+        """Get the times and counts by extension and processor since the last call."""
+
+        extensions = {}
+        for (owner, processor), stats in self.processors.items():
+            if stats[1]:
+                extensions.setdefault(owner, {})[processor] = list(stats)
+                stats[0] = 0.0
+                stats[1] = 0
+        return extensions
+
+
+class Report(object):
+    """
+    Run report.
+
+    Each converted file gets a row with its size, status, total time, and
+    the time spent in each stage (files skipped by incremental builds get a
+    `skipped` row).  If enabled, the time spent in the processors
+    of each Markdown extension is added up as well, and the memory used by
+    each conversion is tracked.  Results from worker processes are merged in
+    so the totals cover the whole batch.
+    """
+
+    def __init__(self, report_path, extensions=False, memory=False):
+        """Initialize."""
+
+        self.path = report_path
+        self.rows = []
+        self.updates = []
+        self.extension_timings = ExtensionTimings() if extensions else None
+        self.extensions = {}
+        self.memory = None
+        self.processes = {}
+        # Allocation sites that grew the most by process
+        self.sites = {}
+        if memory:
+            try:
+                self.memory = MemoryTracker()
+            except ImportError:  # pragma: no cover
+                logger.Log.error("Memory reports require tracemalloc (Python 3.4+)!")
+        self.started = compat.timer()
+        self.elapsed = 0.0
+
+    def watch(self, source):
+        """Get a stopwatch for a conversion."""
+
+        return Stopwatch(source, self.memory)
+
+    def record(self, watch, status, skipped=False):
+        """Record the finished conversion (or the skipped file)."""
+
+        self.updates.append(watch.finish(status, skipped))
+
+    def collect(self, final=False):
+        """
+        Get the rows recorded since the last call so another process can merge them.
+
+        If `final`, the allocation sites that grew the most in the process are included
+        (which takes a snapshot of every allocation, so it is only done at the end).
+        """
+
+        updates = self.updates
+        self.updates = []
+        return {
+            'rows': updates,
+            'extensions': self.extension_timings.collect() if self.extension_timings is not None else {},
+            'process': self.get_process(final)
+        }
+
+    def get_process(self, final=False):
+        """Get the memory usage of this process if it has converted anything."""
+
+        if self.memory is None or self.memory.baseline is None:
+            return None
+        process = self.memory.get_process()
+        process['pid'] = os.getpid()
+        if final:
+            process['top'] = self.memory.get_top()
+        return process
+
+    def merge(self, results):
+        """Merge in results collected elsewhere (such as in a worker process)."""
+
+        self.updates.extend(results['rows'])
+        for owner, processors in results['extensions'].items():
+            totals = self.extensions.setdefault(owner, {})
+            for processor, stats in processors.items():
+                total = totals.setdefault(processor, [0.0, 0])
+                total[0] += stats[0]
+                total[1] += stats[1]
+        process = results.get('process')
+        if process is not None:
+            process = dict(process)
+            if 'top' in process:
+                self.sites[process['pid']] = process.pop('top')
+            self.processes[process['pid']] = process
+
+    def reset(self):
+        """Start timing a new run."""
+
+        self.started = compat.timer()
+
+    def get_totals(self):
+        """Get the totals for the batch."""
+
+        size = sum(row['size'] for row in self.rows)
+        elapsed = self.elapsed
+        stages = {}
+        for stage in STAGES:
+            values = sorted(row['stages'].get(stage, 0.0) for row in self.rows)
+            stats = {'total': sum(values)}
+            for percent in PERCENTILES:
+                stats['p%d' % percent] = get_percentile(values, percent)
+            stages[stage] = stats
+        return {
+            'files': len(self.rows),
+            'failed': sum(1 for row in self.rows if row['status'] == 'fail'),
+            'skipped': sum(1 for row in self.rows if row['status'] == 'skipped'),
+            'size': size,
+            'elapsed': elapsed,
+            'files_per_second': len(self.rows) / elapsed if elapsed else 0.0,
+            'mb_per_second': size / (1024 * 1024) / elapsed if elapsed else 0.0,
+            'stages': stages
+        }
+
+    def get_extensions(self):
+        """Get the time and calls of each extension, and of each of its processors."""
+
+        extensions = {}
+        for owner, processors in self.extensions.items():
+            extensions[owner] = {
+                'time': sum(stats[0] for stats in processors.values()),
+                'calls': sum(stats[1] for stats in processors.values()),
+                'processors': dict(
+                    (processor, {'time': stats[0], 'calls': stats[1]}) for processor, stats in processors.items()
+                )
+            }
+        return extensions
+
+    def get_top(self):
+        """Get the allocation sites that grew the most across the processes."""
+
+        sites = {}
+        for top in self.sites.values():
+            for entry in top:
+                site = sites.setdefault(entry['site'], {'site': entry['site'], 'size': 0, 'count': 0})
+                site['size'] += entry['size']
+                site['count'] += entry['count']
+        return sorted(sites.values(), key=lambda site: (-site['size'], site['site']))[:self.memory.top]
+
+    def get_memory(self):
+        """Get the memory usage of the run (by process if the batch was run in parallel)."""
+
+        processes = sorted(self.processes.values(), key=lambda process: process['pid'])
+        peaks = [row['memory']['peak'] for row in self.rows if 'memory' in row]
+        return {
+            'growth': sum(process['growth'] for process in processes),
+            'peak': max(peaks) if peaks else 0,
+            'processes': processes,
+            'top': self.get_top()
+        }
+
+    def get_report(self):
+        """Get the report for everything recorded so far."""
+
+        self.merge(self.collect(final=True))
+        self.rows.extend(self.updates)
+        self.updates = []
+        self.elapsed = compat.timer() - self.started
+        report = {
+            'version': REPORT_VERSION,
+            'totals': self.get_totals(),
+            'files': self.rows
+        }
+        if self.extension_timings is not None:
+            report['extensions'] = self.get_extensions()
+        if self.memory is not None:
+            report['memory'] = self.get_memory()
+        return report
+
+    def save(self):
+        """Write the report."""
+
+        try:
+            util.write_atomic(
+                self.path,
+                json.dumps(self.get_report(), sort_keys=True, indent=1).encode('utf-8')
+            )
+        except Exception:
+            logger.Log.error(traceback.format_exc())
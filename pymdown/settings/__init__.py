@@ -9,34 +9,239 @@ Copyright (c) 2014 - 2015 Isaac Muse <isaacmuse@gmail.com>
 from __future__ import unicode_literals
 from __future__ import absolute_import
 import codecs
+import hashlib
+import json
+import os
+import sys
 import traceback
 import os.path as path
 import cgi
 from collections import OrderedDict
-from copy import deepcopy
+from copy import copy
 from .. import util
 from .. import logger
 from .. import compat
 from .merge import MergeSettings
 from .validate import Validate
-try:
-    from pygments.styles import get_style_by_name
-    from pygments.formatters import get_formatter_by_name
-    PYGMENTS_AVAILABLE = True
-except Exception:  # pragma: no cover
-    PYGMENTS_AVAILABLE = False
+from ..__version__ import version
 
+# Key used to store `!!python/name` references in settings snapshots
+SNAPSHOT_NAME = '!!python/name'
+# Snapshots are kept per settings file; beyond this many, the oldest are removed
+SNAPSHOT_LIMIT = 32
 
-def get_pygment_style(style, css_class='codehilite'):
-    """Get the specified pygments sytle CSS."""
+
+# Pygments lookups and CSS are the same for every file, so they are only done once per process.
+_pygments_styles = {}
+_pygments_css = {}
+
+
+def has_pygment_style(style):
+    """Check if Pygments has the style."""
+
+    if style not in _pygments_styles:
+        from pygments.styles import get_style_by_name
+
+        try:
+            get_style_by_name(style)
+            _pygments_styles[style] = True
+        except Exception:
+            _pygments_styles[style] = False
+    return _pygments_styles[style]
+
+
+def get_pygment_style_cache(style, css_class, cache_dir):
+    """Get the location of the style's CSS in the cache folder (it differs between Pygments versions)."""
+
+    import pygments
+
+    key = hashlib.sha1(('%s\0%s' % (style, css_class)).encode('utf-8')).hexdigest()
+    return path.join(cache_dir, 'pygments', pygments.__version__, key + '.css')
+
+
+def get_pygment_style(style, css_class='codehilite', cache_dir=None):
+    """
+    Get the specified pygments sytle CSS.
+
+    The CSS is generated once per process, and if a cache folder is given,
+    once per Pygments version.
+    """
+
+    key = (style, css_class)
+    if key in _pygments_css:
+        return _pygments_css[key]
+
+    text = None
+    cache_file = None
+    if cache_dir is not None:
+        cache_file = get_pygment_style_cache(style, css_class, cache_dir)
+        try:
+            with codecs.open(cache_file, 'r', encoding='utf-8') as f:
+                text = f.read()
+        except (IOError, OSError):
+            pass
+
+    if text is None:
+        from pygments.formatters import get_formatter_by_name
+
+        try:
+            # Try and request pygments to generate it
+            text = get_formatter_by_name('html', style=style).get_style_defs('.' + css_class)
+        except Exception:
+            # Try and request pygments to generate default
+            text = get_formatter_by_name('html', style="default").get_style_defs('.' + css_class)
+        text = '<style>\n%s\n</style>\n' % text if text is not None else ""
+
+        if cache_file is not None:
+            try:
+                if not path.isdir(path.dirname(cache_file)):
+                    try:
+                        os.makedirs(path.dirname(cache_file))
+                    except OSError:
+                        # Another process may have created it.
+                        pass
+                util.write_atomic(cache_file, text.encode('utf-8'))
+            except Exception:
+                logger.Log.debug(traceback.format_exc())
+
+    _pygments_css[key] = text
+    return text
+
+
+def encode_snapshot(value):
+    """
+    Convert the validated settings to something JSON can store exactly.
+
+    Callables are stored by module and name.  Raises `ValueError` if anything
+    can't be stored and restored as it is.
+    """
+
+    if isinstance(value, dict):
+        if SNAPSHOT_NAME in value:
+            raise ValueError("Reserved key")
+        encoded = OrderedDict()
+        for k, v in value.items():
+            if not isinstance(k, compat.string_type):
+                raise ValueError("Key is not a string")
+            encoded[k] = encode_snapshot(v)
+        return encoded
+    elif isinstance(value, list):
+        return [encode_snapshot(v) for v in value]
+    elif value is None or isinstance(value, (compat.string_type, bool, int, float)):
+        return value
+    elif isinstance(value, util.PythonName):
+        return {SNAPSHOT_NAME: [value.__module__, value.__name__]}
+    elif callable(value):
+        module = getattr(value, '__module__', None)
+        name = getattr(value, '__name__', None)
+        if module in sys.modules and getattr(sys.modules[module], name, None) is value:
+            return {SNAPSHOT_NAME: [module, name]}
+    raise ValueError("Cannot store %r" % value)
+
+
+def decode_snapshot(pairs):
+    """Restore dictionaries as ordered dicts and callables as `PythonName` references."""
+
+    if len(pairs) == 1 and pairs[0][0] == SNAPSHOT_NAME:
+        return util.PythonName(*pairs[0][1])
+    return OrderedDict(pairs)
+
+
+def get_package_version(name):
+    """Get the installed version of a package from its metadata (without importing the package)."""
+
+    try:
+        try:
+            from importlib import metadata
+        except ImportError:  # pragma: no cover
+            import importlib_metadata as metadata
+        return metadata.version(name)
+    except Exception:
+        return None
+
+
+def get_snapshot_key(settings_path, contents):
+    """Get the key of the settings file's content and location and everything that affects how it is read."""
+
+    try:
+        mtime = os.stat(settings_path).st_mtime
+    except OSError:
+        mtime = None
+
+    return util.fingerprint(
+        [
+            path.abspath(settings_path),
+            mtime,
+            hashlib.sha1(contents.encode('utf-8')).hexdigest(),
+            version,
+            get_package_version('Markdown'),
+            get_package_version('pymdown-extensions'),
+            list(sys.version_info[:2])
+        ]
+    )
+
+
+def get_snapshot_path(settings_path, cache_dir=None):
+    """Get the location of the settings file's snapshot."""
+
+    folder = path.join(cache_dir, 'settings') if cache_dir is not None else path.join(util.get_user_path(), 'cache')
+    name = hashlib.sha1(path.abspath(settings_path).encode('utf-8')).hexdigest()
+    return path.join(folder, name + '.json')
+
+
+def load_snapshot(snapshot_path, key):
+    """Load the validated settings from the snapshot if it is for the given key."""
 
     try:
-        # Try and request pygments to generate it
-        text = get_formatter_by_name('html', style=style).get_style_defs('.' + css_class)
+        with codecs.open(snapshot_path, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f, object_pairs_hook=decode_snapshot)
+        if snapshot.get('key') == key:
+            return snapshot['settings']
     except Exception:
-        # Try and request pygments to generate default
-        text = get_formatter_by_name('html', style="default").get_style_defs('.' + css_class)
-    return '<style>\n%s\n</style>\n' % text if text is not None else ""
+        pass
+    return None
+
+
+def save_snapshot(snapshot_path, key, settings):
+    """Save a snapshot of the validated settings (if they can be stored exactly)."""
+
+    try:
+        data = json.dumps(OrderedDict([('key', key), ('settings', encode_snapshot(settings))]))
+    except ValueError:
+        logger.Log.debug("Settings can't be stored in a snapshot.")
+        return
+
+    try:
+        if not path.isdir(path.dirname(snapshot_path)):
+            try:
+                os.makedirs(path.dirname(snapshot_path))
+            except OSError:
+                # Another process may have created it.
+                pass
+        util.write_atomic(snapshot_path, data.encode('utf-8'))
+    except Exception:
+        logger.Log.debug(traceback.format_exc())
+
+    prune_snapshots(path.dirname(snapshot_path))
+
+
+def prune_snapshots(folder, limit=SNAPSHOT_LIMIT):
+    """Remove the least recently saved snapshots once the folder holds more than the limit."""
+
+    try:
+        snapshots = [
+            path.join(folder, name) for name in os.listdir(folder) if name.endswith('.json')
+        ]
+        snapshots.sort(key=lambda p: os.stat(p).st_mtime, reverse=True)
+    except OSError:
+        return
+
+    for snapshot_path in snapshots[limit:]:
+        try:
+            os.remove(snapshot_path)
+        except OSError:
+            # Another process may have removed it.
+            pass
 
 
 class Settings(object):
@@ -45,6 +250,11 @@ class Settings(object):
 
     Contains global settings, and a user can
     retrieve a settings dict merged with a file's frontmatter.
+
+    The global settings are treated as read only.  A file's settings
+    share them, and a layer is only copied when frontmatter writes to it,
+    so files that don't override `pymdown_settings` all share a single
+    processed copy of them.
     """
 
     def __init__(self, **kwargs):
@@ -73,6 +283,11 @@ class Settings(object):
         self.force_stdout = kwargs.get('force_stdout', False)
         self.force_no_template = kwargs.get('force_no_template', False)
         self.pygments_noclasses = False
+        self.cache_dir = kwargs.get('cache', None)
+        # Processed global PyMdown settings
+        self.processed = None
+        # Whether a template references the Pygments CSS by template path
+        self.templates = {}
 
         # Use default settings file if one was not provided
         settings_path = kwargs.get('settings_path', None)
@@ -93,6 +308,11 @@ class Settings(object):
         Get and read the settings.
 
         Unpack the settings file if needed.
+
+        The validated settings are stored in a snapshot, and as long as the file
+        (and PyMdown, Python Markdown, and PyMdown Extensions) doesn't change,
+        they are loaded from the snapshot instead of parsing the YAML.  Callables
+        in snapshots are only imported once they are used.
         """
 
         settings = None
@@ -105,16 +325,24 @@ class Settings(object):
         try:
             with codecs.open(self.settings_path, "r", encoding='utf-8') as f:
                 contents = f.read()
+            snapshot_path = get_snapshot_path(self.settings_path, self.cache_dir)
+            key = get_snapshot_key(self.settings_path, contents)
+            settings = load_snapshot(snapshot_path, key)
+            if settings is None:
                 settings = util.yaml_load(contents)
+                if settings is None:
+                    settings = OrderedDict()
+                Validate(provide_defaults=True).validate(settings)
+                save_snapshot(snapshot_path, key, settings)
         except Exception:  # pragma: no cover
             logger.Log.error(traceback.format_exc())
 
         if settings is None:
             settings = OrderedDict()
-
-        Validate(provide_defaults=True).validate(settings)
+            Validate(provide_defaults=True).validate(settings)
 
         self.settings["pymdown_settings"] = settings
+        self.processed = None
 
     def get(self, file_name, **kwargs):
         """Get the complete settings object for the given file."""
@@ -126,7 +354,14 @@ class Settings(object):
         title = kwargs.get('title', None)
 
         self.file_name = file_name
-        settings = deepcopy(self.settings)
+        page = dict(self.settings["page"])
+        page["css"] = list(page["css"])
+        page["js"] = list(page["js"])
+        settings = {
+            "page": page,
+            "extra": self.settings["extra"],
+            "pymdown_settings": self.settings["pymdown_settings"]
+        }
         settings["page"]["destination"] = util.resolve_destination(
             output,
             self.file_name,
@@ -178,13 +413,55 @@ class Settings(object):
         # Process special output flags
         if self.force_stdout:
             settings["page"]["destination"] = None
-        if self.force_no_template:
-            settings['pymdown_settings']['template'] = None
 
         # Do some post processing on the settings
         self.post_process_settings(settings)
+
+        # Only load the Pygments CSS if something can use it
+        settings["page"]["pygments_style"] = None
+        if self.uses_pygments_style(settings):
+            settings["page"]["pygments_style"] = self.load_highlight(
+                settings["pymdown_settings"]["pygments_style"],
+                settings["pymdown_settings"]["use_pygments_css"],
+                settings["pymdown_settings"]['pygments_class']
+            )
         return settings
 
+    def uses_pygments_style(self, settings):
+        """
+        Check if the page's template references `pygments_style`.
+
+        Content is rendered as a template when Jinja2 is enabled, so it
+        could reference anything.  A template is only read again when it
+        has been modified.
+        """
+
+        if settings["pymdown_settings"]["use_jinja2"]:
+            return True
+
+        template_path, encoding = util.resolve_template_path(
+            settings["pymdown_settings"]["template"],
+            settings["page"]["basepath"],
+            util.get_user_path()
+        )
+        if template_path is None:
+            return False
+
+        try:
+            mtime = os.stat(template_path).st_mtime
+        except OSError:
+            return False
+
+        cached = self.templates.get(template_path)
+        if cached is None or cached[0] != mtime:
+            try:
+                with codecs.open(template_path, "r", encoding=encoding) as f:
+                    cached = (mtime, 'pygments_style' in f.read())
+            except Exception:
+                cached = (mtime, True)
+            self.templates[template_path] = cached
+        return cached[1]
+
     def load_highlight(self, highlight_style, use_pygments_css, pygments_class):
         """Load Syntax highlighter CSS."""
 
@@ -193,38 +470,55 @@ class Settings(object):
         if not self.plain:
             if highlight_style is not None and use_pygments_css:
                 # Ensure pygments is enabled in the highlighter
-                style = get_pygment_style(highlight_style, pygments_class)
+                style = get_pygment_style(highlight_style, pygments_class, self.cache_dir)
 
         return style
 
-    def set_style(self, extensions, settings):
-        """Load up needed Pygments style."""
+    def set_style(self, settings):
+        """Ensure the Pygments style is available."""
 
-        style = settings["pymdown_settings"]['pygments_style']
+        style = settings['pygments_style']
 
-        if not PYGMENTS_AVAILABLE:  # pragma: no cover
-            settings["pymdown_settings"]["use_pygments_css"] = False
+        if settings["use_pygments_css"]:
+            # Pygments is only imported when its CSS is wanted.
+            try:
+                import pygments  # noqa
+            except Exception:  # pragma: no cover
+                settings["use_pygments_css"] = False
 
-        if settings["pymdown_settings"]["use_pygments_css"]:
+        if settings["use_pygments_css"]:
             # Ensure a working style is set
-            try:
-                # Check if the desired style exists internally
-                get_style_by_name(style)
-            except Exception:
+            if not has_pygment_style(style):
                 logger.Log.error("Cannot find style: %s! Falling back to 'default' style." % style)
                 style = "default"
 
-        settings["pymdown_settings"]["pygments_style"] = style
-        settings["page"]["pygments_style"] = self.load_highlight(
-            style,
-            settings["pymdown_settings"]["use_pygments_css"],
-            settings["pymdown_settings"]['pygments_class']
-        )
+        settings["pygments_style"] = style
 
     def post_process_settings(self, settings):
-        """Process the settings files making needed adjustement."""
+        """
+        Process the settings files making needed adjustement.
 
-        extensions = settings["pymdown_settings"]["markdown_extensions"]
+        PyMdown settings left untouched by frontmatter are only processed once.
+        """
+
+        if settings["pymdown_settings"] is self.settings["pymdown_settings"]:
+            if self.processed is None:
+                self.processed = self.process_pymdown_settings(copy(self.settings["pymdown_settings"]))
+            settings["pymdown_settings"] = self.processed
+        else:
+            settings["pymdown_settings"] = self.process_pymdown_settings(settings["pymdown_settings"])
+
+    def process_pymdown_settings(self, settings):
+        """
+        Process the file's own copy of the PyMdown settings.
+
+        Values shared with the global settings (like the extensions) are copied before they are changed.
+        """
+
+        if self.force_no_template:
+            settings['template'] = None
+
+        extensions = OrderedDict(settings["markdown_extensions"])
 
         critic_mode = "ignore"
         if self.critic & util.CRITIC_ACCEPT:
@@ -242,17 +536,19 @@ class Settings(object):
             del extensions["pymdownx.plainhtml"]
 
         # Ensure previews are using absolute paths or relative paths
-        if self.preview or not settings["pymdown_settings"]["disable_path_conversion"]:
+        if self.preview or not settings["disable_path_conversion"]:
             # Add pathconverter extension if not already set.
             if "pymdownx.pathconverter" not in extensions:
                 extensions["pymdownx.pathconverter"] = {
                     "base_path": "${BASE_PATH}",
                     "relative_path": "${REL_PATH}" if not self.preview else "${OUTPUT}",
-                    "absolute": settings["pymdown_settings"]["path_conversion_absolute"]
+                    "absolute": settings["path_conversion_absolute"]
                 }
             elif self.preview and "pymdownx.pathconverter" in extensions:
                 if extensions["pymdownx.pathconverter"] is None:
                     extensions["pymdownx.pathconverter"] = {}
+                else:
+                    extensions["pymdownx.pathconverter"] = copy(extensions["pymdownx.pathconverter"])
                 if "base_path" not in extensions["pymdownx.pathconverter"]:
                     extensions["pymdownx.pathconverter"]["base_path"] = "${BASE_PATH}"
                 extensions["pymdownx.pathconverter"]["relative_path"] = "${OUTPUT}"
@@ -267,7 +563,8 @@ class Settings(object):
             extensions['pymdownx.plainhtml'] = None
 
         # Set extensions to its own key
-        settings["pymdown_settings"]["markdown_extensions"] = extensions
+        settings["markdown_extensions"] = extensions
 
         # Set style
-        self.set_style(extensions, settings)
+        self.set_style(settings)
+        return settings
@@ -5,6 +5,7 @@ Licensed under MIT
 Copyright (c) 2014 - 2015 Isaac Muse <isaacmuse@gmail.com>
 """
 from os import path
+from copy import copy
 from .. import util
 from .. import compat
 from collections import OrderedDict
@@ -19,6 +20,9 @@ class MergeSettings(object):
                js, css, title, encoding, content
     SETTINGS KEY: settings.
     EXTRA KEYS: all other keys that aren't handled above.
+
+    The settings' `pymdown_settings` and `extra` may be shared with other
+    files, so they are copied before they are changed.
     """
 
     def __init__(self, file_name, is_stream):
@@ -39,7 +43,7 @@ class MergeSettings(object):
             pth,
             base
         )
-        if file_path is None or not path.isfile(file_path):
+        if file_path is None or not util.isfile(file_path):
             file_path = None
         else:
             file_path = path.normpath(file_path)
@@ -78,11 +82,11 @@ class MergeSettings(object):
                     path.dirname(value),
                     self.base
                 )
-                if file_name is not None and path.isdir(file_name):
+                if file_name is not None and util.isdir(file_name):
                     value = path.normpath(
                         path.join(file_name, path.basename(value))
                     )
-                    if path.exists(value) and path.isdir(value):
+                    if util.isdir(value):
                         value = None
                 else:
                     value = None
@@ -93,8 +97,8 @@ class MergeSettings(object):
     def merge_includes(self, frontmatter, settings):
         """Find css and js includes and merge them."""
 
-        css = settings['pymdown_settings'].get('css', [])
-        js = settings['pymdown_settings'].get('js', [])
+        css = list(settings['pymdown_settings'].get('css', []))
+        js = list(settings['pymdown_settings'].get('js', []))
 
         # Javascript and CSS include
         for key in ("css", "js"):
@@ -111,6 +115,8 @@ class MergeSettings(object):
         """Handle and merge PyMdown settings."""
 
         value = frontmatter['pymdown_settings']
+        if value:
+            settings['pymdown_settings'] = copy(settings['pymdown_settings'])
         for subkey, subvalue in value.items():
 
             # Html template
@@ -128,6 +134,8 @@ class MergeSettings(object):
         """Resolve all other frontmatter items as meta/extra items."""
 
         settings["extra"] = settings["pymdown_settings"].get("extra", OrderedDict())
+        if frontmatter:
+            settings["extra"] = copy(settings["extra"])
 
         for key, value in frontmatter.items():
             if key == 'title' and validate.is_string(value):
@@ -78,6 +78,7 @@ class Validate(object):
         "pygments_style": 'default',
         "pygments_class": 'codehilite',
         "template": 'default/template.html',
+        "embed_image_max_size": 0,
         "disable_path_conversion": False,
         "path_conversion_absolute": False,
         "tab_length": 4,
@@ -199,6 +200,7 @@ class Validate(object):
         self.val_str_array('css', settings)
         self.val_str_array('js', settings)
         self.val_extra(settings)
+        self.val_int('embed_image_max_size', settings)
 
         # PyMdown path conversion settings
         self.val_bool('disable_path_conversion', settings)
@@ -9,7 +9,6 @@ Copyright (c) 2014 - 2015 Isaac Muse <isaacmuse@gmail.com>
 from __future__ import absolute_import
 from __future__ import unicode_literals
 from __future__ import print_function
-import jinja2
 from os import path
 from . import util
 import codecs
@@ -17,8 +16,11 @@ import cgi
 import traceback
 from . import logger
 from . import compat
+from . import cache
 import base64
+import os
 import re
+import threading
 
 image_types = {
     (".png",): "image/png",
@@ -28,6 +30,183 @@ image_types = {
 
 RE_URL_START = re.compile(r"^(http|ftp)s?://|tel:|mailto:|data:|news:|#")
 
+# The render variable that gives filters access to the `Template` of the document being rendered
+TEMPLATE_KEY = '__pymdown_template__'
+
+FILTERS = {
+    'embedimage': 'embed_image',
+    'getpath': 'get_path',
+    'getpathurl': 'get_path_url',
+    'getcss': 'get_css',
+    'getjs': 'get_js',
+    'gettxt': 'get_txt',
+    'getmeta': 'get_meta'
+}
+
+# Shared environments by delimiters and bytecode cache folder
+_environments = {}
+_environments_lock = threading.Lock()
+# Templates for when there is no template by environment
+_content_templates = {}
+
+# Resources included in the output and their rendered tags, by path, mtime, size, and encoding
+RESOURCE_CACHE_SIZE = 32 * 1024 * 1024
+_resources = cache.MemoryCache(RESOURCE_CACHE_SIZE)
+
+# Embedded images by path, mtime, and size
+IMAGE_CACHE_SIZE = 64 * 1024 * 1024
+_images = cache.MemoryCache(IMAGE_CACHE_SIZE)
+
+# Read images in chunks that encode without padding
+IMAGE_CHUNK_SIZE = 3 * 64 * 1024
+
+
+def get_resource_stamp(abs_path):
+    """Get the path, mtime, and size that identify the current content of a file."""
+
+    try:
+        st = os.stat(abs_path)
+    except OSError:
+        return None
+    return (abs_path, st.st_mtime, st.st_size)
+
+
+def load_resource(abs_path, encoding):
+    """Load the text of a resource (each version of a file is only read once)."""
+
+    stamp = get_resource_stamp(abs_path)
+    if stamp is None:
+        return None
+
+    key = ('text', stamp, encoding)
+    text = _resources.get(key)
+    if text is None:
+        text = util.load_text_resource(abs_path, encoding=encoding)
+        if text is not None:
+            _resources.put(key, text)
+    return text
+
+
+def encode_image(abs_path, mime_type):
+    """Get the data URI of the image (base64 encoded a chunk at a time)."""
+
+    chunks = ["data:%s;base64," % mime_type]
+    with open(abs_path, "rb") as f:
+        for chunk in iter(lambda: f.read(IMAGE_CHUNK_SIZE), b''):
+            chunks.append(base64.b64encode(chunk).decode('ascii'))
+    return ''.join(chunks)
+
+
+def load_include(abs_path, encoding, res_get):
+    """Load the resource and wrap it with `res_get` (the result is cached along with the text)."""
+
+    stamp = get_resource_stamp(abs_path)
+    if stamp is None:
+        return res_get(None, link=False, encoding=encoding)
+
+    key = (res_get.__name__, stamp, encoding)
+    include = _resources.get(key)
+    if include is None:
+        text = load_resource(abs_path, encoding)
+        include = res_get(text, link=False, encoding=encoding)
+        if text is not None:
+            _resources.put(key, include)
+    return include
+
+
+def _create_filter(name, pass_context):
+    """Create a filter that calls the method of the document's `Template`."""
+
+    def run_filter(context, *args, **kwargs):
+        """Run the filter."""
+
+        return getattr(context[TEMPLATE_KEY], name)(*args, **kwargs)
+
+    return pass_context(run_filter)
+
+
+def _create_loader(jinja2):
+    """
+    Create a loader for templates named by their path and encoding (`path;encoding`).
+
+    Compiled templates are cached by the environment and are
+    reused until the template's file is modified.
+    """
+
+    class TemplateLoader(jinja2.BaseLoader):
+        """Load templates from their absolute path."""
+
+        def get_source(self, environment, template):
+            """Get the template's source, path, and a check for modifications."""
+
+            template_path, encoding = util.splitenc(template)
+            try:
+                mtime = os.stat(template_path).st_mtime
+                with codecs.open(template_path, "r", encoding=encoding) as f:
+                    source = f.read()
+            except Exception:
+                logger.Log.error(str(traceback.format_exc()))
+                raise jinja2.TemplateNotFound(template)
+
+            def uptodate():
+                """Check if the template has been modified."""
+
+                try:
+                    return os.stat(template_path).st_mtime == mtime
+                except OSError:
+                    return False
+
+            return source, template_path, uptodate
+
+    return TemplateLoader()
+
+
+def get_environment(template_tags=None, cache_dir=None):
+    """
+    Get the shared environment for the delimiters.
+
+    If a cache folder is given, compiled templates are also kept on disk.
+    """
+
+    if template_tags is None:
+        template_tags = {}
+    block_tags = tuple(template_tags.get('block', ('{%', '%}')))
+    variable_tags = tuple(template_tags.get('variable', ('{{', '}}')))
+    comment_tags = tuple(template_tags.get('comment', ('{#', '#}')))
+    key = (block_tags, variable_tags, comment_tags, cache_dir)
+
+    with _environments_lock:
+        env = _environments.get(key)
+        if env is None:
+            import jinja2
+
+            bytecode_cache = None
+            if cache_dir is not None:
+                bytecode_dir = path.join(cache_dir, 'jinja2')
+                if not path.isdir(bytecode_dir):
+                    try:
+                        os.makedirs(bytecode_dir)
+                    except OSError:
+                        # Another process may have created it.
+                        pass
+                bytecode_cache = jinja2.FileSystemBytecodeCache(bytecode_dir)
+
+            env = jinja2.Environment(
+                block_start_string=block_tags[0],
+                block_end_string=block_tags[1],
+                variable_start_string=variable_tags[0],
+                variable_end_string=variable_tags[1],
+                comment_start_string=comment_tags[0],
+                comment_end_string=comment_tags[1],
+                loader=_create_loader(jinja2),
+                bytecode_cache=bytecode_cache
+            )
+            pass_context = getattr(jinja2, 'pass_context', None) or getattr(jinja2, 'contextfilter')
+            for name, method in FILTERS.items():
+                env.filters[name] = _create_filter(method, pass_context)
+            _environments[key] = env
+    return env
+
 
 def get_js(js, **kwargs):
     """Get the specified JS code."""
@@ -52,6 +231,15 @@ def get_style(style, **kwargs):
         return '<style>\n%s\n</style>\n' % style if style is not None else ""
 
 
+def get_content_template(env):
+    """Get the template used when there is no template (it just outputs the content)."""
+
+    key = id(env)
+    if key not in _content_templates:
+        _content_templates[key] = env.from_string('{{ page.content }}')
+    return _content_templates[key]
+
+
 class Template(object):
     """Class for handling templates."""
 
@@ -64,67 +252,56 @@ class Template(object):
         self.force_conversion = kwargs.get('force_conversion', False)
         self.disable_path_conversion = kwargs.get('disable_path_conversion', False)
         self.absolute_path_conversion = kwargs.get('absolute_path_conversion', False)
+        # Larger images are linked instead of embedded (0 is no limit)
+        self.embed_image_max_size = kwargs.get('embed_image_max_size', 0)
+        # Files whose content is read into the output
+        self.dependencies = set()
 
-        # Setup template environment
-        template_tags = kwargs.get('template_tags', {})
-        block_tags = template_tags.get('block', ('{%', '%}'))
-        variable_tags = template_tags.get('variable', ('{{', '}}'))
-        comment_tags = template_tags.get('comment', ('{#', '#}'))
-        self.env = jinja2.Environment(
-            block_start_string=block_tags[0],
-            block_end_string=block_tags[1],
-            variable_start_string=variable_tags[0],
-            variable_end_string=variable_tags[1],
-            comment_start_string=comment_tags[0],
-            comment_end_string=comment_tags[1]
-        )
-        self.env.filters['embedimage'] = self.embed_image
-        self.env.filters['getpath'] = self.get_path
-        self.env.filters['getpathurl'] = self.get_path_url
-        self.env.filters['getcss'] = self.get_css
-        self.env.filters['getjs'] = self.get_js
-        self.env.filters['gettxt'] = self.get_txt
-        self.env.filters['getmeta'] = self.get_meta
+        # Setup template environment (shared by all templates with the same delimiters)
+        self.env = get_environment(kwargs.get('template_tags', {}), kwargs.get('cache_dir'))
 
     def get_template(self, template_file):
         """Output the HTML head and body up to the {{ content }} specifier."""
 
+        import jinja2
+
         template = None
         if template_file is not None:
-            template_path, encoding = util.splitenc(template_file)
-
-            if not util.is_absolute(template_path) and self.basepath:
-                template_base = path.join(self.basepath, template_path)
-            else:
-                template_base = ''
-
-            if (
-                (not path.exists(template_base) or not path.isfile(template_base)) and
-                self.userpath is not None
-            ):
-                template_path = path.join(self.userpath, template_path)
-            else:
-                template_path = template_base
+            template_path, encoding = util.resolve_template_path(template_file, self.basepath, self.userpath)
+            template_path = path.abspath(template_path)
 
             try:
-                with codecs.open(template_path, "r", encoding=encoding) as f:
-                    template = f.read()
-            except Exception:
-                logger.Log.error(str(traceback.format_exc()))
+                template = self.env.get_template('%s;%s' % (template_path, encoding))
+                self.dependencies.add(template_path)
+            except jinja2.TemplateNotFound:
+                # The loader logged why.
+                pass
 
-        return self.env.from_string('{{ page.content }}' if template is None else template)
+        return get_content_template(self.env) if template is None else template
 
     def get_template_from_string(self, text):
         """Get the template from the provided string."""
 
         return self.env.from_string(text)
 
+    def render(self, template, **kwargs):
+        """Render the template with the variables (filters are run against this document)."""
+
+        kwargs[TEMPLATE_KEY] = self
+        return template.render(**kwargs)
+
+    def generate(self, template, **kwargs):
+        """Render the template with the variables a piece at a time."""
+
+        kwargs[TEMPLATE_KEY] = self
+        return template.generate(**kwargs)
+
     def get_template_res_path(self, file_name):
         """Get the filepath and absolute filepath of the resource."""
 
         abs_path = None
         file_path = None
-        user_path = util.get_user_path()
+        user_path = self.userpath
 
         is_abs = util.is_absolute(file_name)
 
@@ -135,14 +312,14 @@ class Template(object):
             # Is relative path
             if self.basepath is not None:
                 base_temp = path.normpath(path.join(self.basepath, file_name))
-                if path.exists(base_temp) and path.isfile(base_temp):
+                if util.isfile(base_temp):
                     file_path = base_temp
             if file_path is None and user_path is not None:
                 user_temp = path.normpath(path.join(user_path, file_name))
-                if path.exists(user_temp) and path.isfile(user_temp):
+                if util.isfile(user_temp):
                     file_path = user_temp
 
-        elif is_abs and path.exists(file_name) and path.isfile(file_name):
+        elif is_abs and util.isfile(file_name):
             # Is absolute path
             file_path = file_name
 
@@ -180,6 +357,8 @@ class Template(object):
         Return the content of the file instead of the file name.
 
         If "image" is "True", base64 encode the content.
+        Encoded images are cached until the file changes, and images
+        larger than the size limit are linked instead.
         """
 
         file_name = name.strip()
@@ -192,12 +371,17 @@ class Template(object):
             for b64_ext in image_types:
                 if ext in b64_ext:
                     try:
-                        with open(abs_path, "rb") as f:
-                            file_name = "data:%s;base64,%s" % (
-                                image_types[b64_ext],
-                                base64.b64encode(f.read()).decode('ascii')
-                            )
-                            embedded = True
+                        abs_path = path.abspath(abs_path)
+                        self.dependencies.add(abs_path)
+                        stamp = get_resource_stamp(abs_path)
+                        if self.embed_image_max_size and stamp is not None and stamp[2] > self.embed_image_max_size:
+                            return self.get_path_url(file_name)
+                        data = _images.get(stamp)
+                        if data is None:
+                            data = encode_image(abs_path, image_types[b64_ext])
+                            _images.put(stamp, data)
+                        file_name = data
+                        embedded = True
                     except Exception:
                         pass
                     break
@@ -216,12 +400,12 @@ class Template(object):
             # Is relative path
             if self.basepath is not None:
                 base_temp = path.normpath(path.join(self.basepath, resource))
-                if path.exists(base_temp) and path.isfile(base_temp):
+                if util.isfile(base_temp):
                     res_path = resource
 
             if res_path is None and self.userpath is not None:
                 user_temp = path.normpath(path.join(self.userpath, resource))
-                if path.exists(user_temp) and path.isfile(user_temp):
+                if util.isfile(user_temp):
                     try:
                         res_path = path.relpath(user_temp, self.basepath) if self.basepath else user_temp
                     except Exception:
@@ -229,7 +413,7 @@ class Template(object):
                         res_path = user_temp
                         is_abs = True
 
-        elif is_abs and path.exists(resource) and path.isfile(resource):
+        elif is_abs and util.isfile(resource):
             # Is absolute path
             res_path = path.relpath(resource, self.basepath) if self.basepath else resource
 
@@ -306,11 +490,10 @@ class Template(object):
                     if res_path:
                         if not direct_include:
                             res_path = compat.pathname2url(res_path.replace('\\', '/'))
-                            link = True
+                            resources.append(res_get(res_path, link=True, encoding=encoding))
                         else:
-                            res_path = util.load_text_resource(abs_path, encoding=encoding)
-                            link = False
-                        resources.append(res_get(res_path, link=link, encoding=encoding))
+                            self.dependencies.add(path.abspath(abs_path))
+                            resources.append(load_include(path.abspath(abs_path), encoding, res_get))
 
                     # Not a known path and not a url, just add as is
                     else:
@@ -345,7 +528,8 @@ class Template(object):
             res_path, abs_path = self.get_res_path(t)
 
             if res_path is not None:
-                texts.append(util.load_text_resource(abs_path, encoding=encoding))
+                self.dependencies.add(path.abspath(abs_path))
+                texts.append(load_resource(path.abspath(abs_path), encoding))
         return texts
 
     def get_css(self, css):
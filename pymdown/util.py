@@ -13,15 +13,16 @@ import sys
 import traceback
 import codecs
 import re
-import yaml
 import os
-import subprocess
-import webbrowser
+import stat
 import json
+import hashlib
+import tempfile
 import os.path as path
 from collections import OrderedDict
 from . import logger
 from . import compat
+from .__version__ import version
 
 RESOURCE_PATH = path.abspath(path.join(path.dirname(__file__), ".."))
 WIN_DRIVE = re.compile(r"(^[A-Za-z]{1}:(?:\\|/))")
@@ -33,6 +34,14 @@ USER_VERSION = "pymdown/data/version.txt"
 NO_COPY = ('licenses.txt',)
 NO_UPDATE = ('__init__.py',)
 NOT_DEFAULT = ('version.txt',)
+USER_STAMP = '.unpacked-%s'
+RE_FRONTMATTER_START = re.compile(r'-{3}\r?\n(?!\r?\n)')
+FRONTMATTER_END = ('---', '...', '---\r', '...\r')
+RE_JSON_FRONTMATTER_START = re.compile(r';{3}\r?\n')
+JSON_FRONTMATTER_END = (';;;', ';;;\r')
+RE_JSON_HEADER_END = re.compile(r'[ \t]*(?:\r?\n|$)')
+# Frontmatter larger than this (in characters) is not looked for
+FRONTMATTER_MAX_SIZE = 256 * 1024
 
 CRITIC_IGNORE = 0
 CRITIC_ACCEPT = 1
@@ -40,67 +49,258 @@ CRITIC_REJECT = 2
 CRITIC_VIEW = 4
 CRITIC_DUMP = 8
 
+# Resolved once per process
+_user_path = None
+_unpacked = False
 
-def yaml_load(stream, loader=yaml.Loader, object_pairs_hook=OrderedDict):
+# File system lookups cached for the current run (see `get_path_kind`)
+PATH_MISSING = 0
+PATH_FILE = 1
+PATH_DIR = 2
+PATH_OTHER = 3
+_path_kinds = {}
+_listings = {}
+_use_listings = False
+
+# Custom YAML loaders by base loader and mapping type
+_yaml_loaders = {}
+
+
+def get_yaml_loader(loader=None, object_pairs_hook=OrderedDict, safe=False):
     """
-    Custom yaml loader.
+    Get the custom YAML loader (created once per base loader and mapping type).
 
     Make all YAML dictionaries load as ordered Dicts.
     http://stackoverflow.com/a/21912744/3609487
 
     Load all strings as unicode.
     http://stackoverflow.com/a/2967461/3609487
+
+    The loader defaults to `yaml.CLoader` when libyaml is available and `yaml.Loader`
+    when it isn't (or the safe versions if `safe` is enabled).
+    """
+
+    import yaml
+
+    if loader is None:
+        if safe:
+            loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+        else:
+            loader = getattr(yaml, 'CLoader', yaml.Loader)
+
+    key = (loader, object_pairs_hook)
+    custom = _yaml_loaders.get(key)
+    if custom is None:
+        def construct_mapping(loader, node):
+            """Convert to ordered dict."""
+
+            loader.flatten_mapping(node)
+            return object_pairs_hook(loader.construct_pairs(node))
+
+        def construct_yaml_str(self, node):
+            """Override the default string handling function to always return unicode objects."""
+
+            return self.construct_scalar(node)
+
+        class Loader(loader):
+            """Custom Loader."""
+
+        Loader.add_constructor(
+            yaml.resolver.BaseResolver.DEFAULT_MAPPING_TAG,
+            construct_mapping
+        )
+
+        Loader.add_constructor(
+            'tag:yaml.org,2002:str',
+            construct_yaml_str
+        )
+
+        custom = _yaml_loaders[key] = Loader
+    return custom
+
+
+def yaml_load(stream, loader=None, object_pairs_hook=OrderedDict, safe=False):
+    """Load the YAML with the custom loader (see `get_yaml_loader`)."""
+
+    import yaml
+
+    return yaml.load(stream, get_yaml_loader(loader, object_pairs_hook, safe))
+
+
+def _json_default(obj):
+    """Represent objects that JSON can't serialize."""
+
+    if callable(obj) and hasattr(obj, '__name__'):
+        return '%s.%s' % (getattr(obj, '__module__', ''), obj.__name__)
+    return repr(obj)
+
+
+def fingerprint(obj):
+    """Get a stable hash of a settings object."""
+
+    return hashlib.sha1(
+        json.dumps(
+            obj, sort_keys=True, separators=(',', ':'), default=_json_default
+        ).encode('utf-8')
+    ).hexdigest()
+
+
+def _dump_json_default(obj):
+    """Represent objects that JSON can't serialize in output (dates from YAML are written in ISO format)."""
+
+    if hasattr(obj, 'isoformat'):
+        return obj.isoformat()
+    return _json_default(obj)
+
+
+def dump_json(obj):
+    """Serialize the object to JSON (objects JSON can't serialize are represented as strings)."""
+
+    return json.dumps(obj, default=_dump_json_default)
+
+
+class PythonName(object):
+    """
+    A `!!python/name` reference that is only imported when it is first used.
+
+    It has the module and name of what it references, so it fingerprints the same.
     """
 
-    def construct_mapping(loader, node):
-        """Convert to ordered dict."""
+    def __init__(self, module, name):
+        """Initialize."""
 
-        loader.flatten_mapping(node)
-        return object_pairs_hook(loader.construct_pairs(node))
+        self.__module__ = module
+        self.__name__ = name
+        self.obj = None
 
-    def construct_yaml_str(self, node):
-        """Override the default string handling function to always return unicode objects."""
+    def resolve(self):
+        """Import the referenced object."""
 
-        return self.construct_scalar(node)
+        if self.obj is None:
+            import importlib
 
-    class Loader(loader):
-        """Custom Loader."""
+            self.obj = getattr(importlib.import_module(self.__module__), self.__name__)
+        return self.obj
 
-    Loader.add_constructor(
-        yaml.resolver.BaseResolver.DEFAULT_MAPPING_TAG,
-        construct_mapping
-    )
+    def __call__(self, *args, **kwargs):
+        """Call the referenced object."""
 
-    Loader.add_constructor(
-        'tag:yaml.org,2002:str',
-        construct_yaml_str
-    )
+        return self.resolve()(*args, **kwargs)
 
-    return yaml.load(stream, Loader)
+    def __repr__(self):
+        """Representation."""
 
+        return 'PythonName(%r, %r)' % (self.__module__, self.__name__)
 
-def get_frontmatter(string):
-    """Get frontmatter from string."""
+
+def resolve_names(value):
+    """Replace `PythonName` references (in dictionaries and lists too) with what they reference."""
+
+    if isinstance(value, PythonName):
+        value = value.resolve()
+    elif isinstance(value, dict):
+        value = value.__class__((k, resolve_names(v)) for k, v in value.items())
+    elif isinstance(value, list):
+        value = [resolve_names(v) for v in value]
+    return value
+
+
+def json_load(text, object_pairs_hook=OrderedDict):
+    """Load the JSON with objects as ordered dicts."""
+
+    return json.loads(text, object_pairs_hook=object_pairs_hook)
+
+
+def find_frontmatter(string, max_size=FRONTMATTER_MAX_SIZE, start=RE_FRONTMATTER_START, end=FRONTMATTER_END):
+    """
+    Find the frontmatter block a line at a time.
+
+    Returns the start and end of the content and the end of the block,
+    or `None` if there is no block.  The search gives up after `max_size`
+    characters (0 is no limit), so a missing end doesn't cause the whole
+    file to be scanned.
+    """
+
+    m = start.match(string)
+    if m is None:
+        return None
+
+    begin = pos = m.end()
+    limit = len(string) if not max_size else min(len(string), begin + max_size + 5)
+    while True:
+        eol = string.find('\n', pos, limit)
+        if eol == -1:
+            if limit < len(string):
+                logger.Log.warn("Frontmatter not found within %d characters!" % max_size)
+            return None
+        if string[pos:eol] in end:
+            return begin, pos, eol + 1
+        pos = eol + 1
+
+
+def get_json_header(string, max_size=FRONTMATTER_MAX_SIZE):
+    """
+    Get the JSON object the string starts with, if it is on its own line(s).
+
+    As content can start with a `{` too (Jinja2 tags for instance), anything that
+    doesn't decode as an object is left alone quietly.  Returns the object and the
+    remaining string, or `None`.
+    """
+
+    text = string[:max_size] if max_size and len(string) > max_size else string
+    try:
+        obj, end = json.JSONDecoder(object_pairs_hook=OrderedDict).raw_decode(text)
+    except ValueError:
+        return None
+    m = RE_JSON_HEADER_END.match(string, end)
+    if not isinstance(obj, dict) or m is None:
+        return None
+    return obj, string[m.end():]
+
+
+def load_frontmatter(text, loader):
+    """Load the frontmatter, or return `None` if it isn't valid frontmatter."""
+
+    try:
+        frontmatter = loader(text)
+        if frontmatter is None:
+            frontmatter = OrderedDict()
+        # If we didn't get a dictionary, we don't want this as it isn't frontmatter.
+        assert isinstance(frontmatter, (dict, OrderedDict)), TypeError
+    except Exception:
+        # We had a parsing error. This is not the frontmatter we are looking for.
+        frontmatter = None
+        logger.Log.error(traceback.format_exc())
+    return frontmatter
+
+
+def get_frontmatter(string, max_size=FRONTMATTER_MAX_SIZE):
+    """
+    Get frontmatter from string.
+
+    Frontmatter is YAML fenced with `---`, or JSON (which is much faster to parse)
+    fenced with `;;;` or as an object at the very start.
+    """
 
     frontmatter = OrderedDict()
 
+    block = None
     if string.startswith("---"):
-        m = re.search(r'^(-{3}\r?\n(?!\r?\n)(.*?)(?<=\n)(?:-{3}|\.{3})\r?\n)', string, re.DOTALL)
-        if m:
-            yaml_okay = True
-            try:
-                frontmatter = yaml_load(m.group(2))
-                if frontmatter is None:
-                    frontmatter = OrderedDict()
-                # If we didn't get a dictionary, we don't want this as it isn't frontmatter.
-                assert isinstance(frontmatter, (dict, OrderedDict)), TypeError
-            except Exception:
-                # We had a parsing error. This is not the YAML we are looking for.
-                yaml_okay = False
-                frontmatter = OrderedDict()
-                logger.Log.error(traceback.format_exc())
-            if yaml_okay:
-                string = string[m.end(1):]
+        block = find_frontmatter(string, max_size)
+        loader = yaml_load
+    elif string.startswith(";;;"):
+        block = find_frontmatter(string, max_size, RE_JSON_FRONTMATTER_START, JSON_FRONTMATTER_END)
+        loader = json_load
+    elif string.startswith("{"):
+        header = get_json_header(string, max_size)
+        if header is not None:
+            frontmatter, string = header
+
+    if block:
+        data = load_frontmatter(string[block[0]:block[1]], loader)
+        if data is not None:
+            frontmatter = data
+            string = string[block[2]:]
 
     return frontmatter, string
 
@@ -146,8 +346,120 @@ def is_absolute(pth):
     return absolute
 
 
-def get_user_path():
-    """Get user data path."""
+def set_path_listings(enable):
+    """
+    Answer path lookups from directory listings.
+
+    Listing a folder once can be much cheaper than stating each file in it
+    when the file system is slow (like a network mount).
+    """
+
+    global _use_listings
+
+    _use_listings = bool(enable) and compat.scandir is not None
+
+
+def clear_path_cache():
+    """Forget cached file system lookups (call when files may have changed)."""
+
+    _path_kinds.clear()
+    _listings.clear()
+
+
+def get_listing(folder):
+    """Get the kinds of the files and folders in the folder from one directory listing."""
+
+    listing = _listings.get(folder)
+    if listing is None:
+        listing = {}
+        try:
+            for entry in compat.scandir(folder):
+                try:
+                    if entry.is_dir():
+                        listing[entry.name] = PATH_DIR
+                    elif entry.is_file():
+                        listing[entry.name] = PATH_FILE
+                except OSError:
+                    pass
+        except OSError:
+            pass
+        _listings[folder] = listing
+    return listing
+
+
+def get_path_kind(pth):
+    """
+    Get whether the path is a file, a folder, something else, or missing.
+
+    Results are cached until `clear_path_cache` is called.  Names not found in a
+    directory listing are still stated as the file system may not be case sensitive.
+    """
+
+    kind = _path_kinds.get(pth)
+    if kind is None:
+        if _use_listings:
+            folder, name = path.split(pth)
+            if name:
+                kind = get_listing(folder if folder else os.curdir).get(name)
+        if kind is None:
+            try:
+                mode = os.stat(pth).st_mode
+                if stat.S_ISDIR(mode):
+                    kind = PATH_DIR
+                elif stat.S_ISREG(mode):
+                    kind = PATH_FILE
+                else:
+                    kind = PATH_OTHER
+            except (OSError, ValueError):
+                kind = PATH_MISSING
+        _path_kinds[pth] = kind
+    return kind
+
+
+def exists(pth):
+    """Check if the path exists (cached)."""
+
+    return get_path_kind(pth) != PATH_MISSING
+
+
+def isfile(pth):
+    """Check if the path is a file (cached)."""
+
+    return get_path_kind(pth) == PATH_FILE
+
+
+def isdir(pth):
+    """Check if the path is a folder (cached)."""
+
+    return get_path_kind(pth) == PATH_DIR
+
+
+def resolve_template_path(template_file, basepath, userpath):
+    """
+    Get the path and encoding of the template.
+
+    Relative templates are looked for under the basepath first and then under the user path.
+    """
+
+    if template_file is None:
+        return None, None
+
+    template_path, encoding = splitenc(template_file)
+
+    if not is_absolute(template_path) and basepath:
+        template_base = path.join(basepath, template_path)
+    else:
+        template_base = ''
+
+    if not isfile(template_base) and userpath is not None:
+        template_path = path.join(userpath, template_path)
+    else:
+        template_path = template_base
+    return template_path, encoding
+
+
+def get_user_folder():
+    """Get the location of the user data folder."""
 
     if compat.PLATFORM == "windows":
         folder = path.expanduser("~\\.PyMdown")
@@ -155,21 +467,26 @@ def get_user_path():
         folder = path.expanduser("~/.PyMdown")
     elif compat.PLATFORM == "linux":
         folder = path.expanduser("~/.config/PyMdown")
+    return folder
 
-    if not path.exists(folder):
-        try:
-            os.mkdir(folder)
-        except Exception:
-            pass
 
-    defaults = path.join(folder, 'default')
-    if not path.exists(defaults):
-        try:
-            os.mkdir(defaults)
-        except Exception:
-            pass
+def get_user_path():
+    """Get user data path (it is created on the first call)."""
 
-    return folder
+    global _user_path
+
+    if _user_path is None:
+        folder = get_user_folder()
+        for pth in (folder, path.join(folder, 'default')):
+            if not path.exists(pth):
+                try:
+                    os.makedirs(pth)
+                except Exception:
+                    # Another process may have created it.
+                    pass
+        _user_path = folder
+
+    return _user_path
 
 
 def update_user_files():
@@ -179,12 +496,12 @@ def update_user_files():
     ver = load_text_resource(USER_VERSION, internal=True)
     if ver is not None:
         try:
-            current_ver = yaml_load(ver).get('version', 0)
+            current_ver = yaml_load(ver, safe=True).get('version', 0)
         except Exception:
             current_ver = 0
     try:
         with codecs.open(user_ver_file, 'r', encoding='utf-8') as f:
-            user_ver = yaml_load(f.read()).get('version', 0)
+            user_ver = yaml_load(f.read(), safe=True).get('version', 0)
     except Exception:
         user_ver = 0
 
@@ -192,13 +509,35 @@ def update_user_files():
 
 
 def unpack_user_files():
-    """Unpack user data files."""
+    """
+    Unpack user data files.
+
+    Once a version's files are unpacked, a stamp file is left in the user folder,
+    so from then on this only costs a single stat (and nothing after the first call).
+    Files are written atomically and `version.txt` is written last, so processes
+    unpacking at the same time never see half written or half updated files.
+    Removing the stamp causes missing files to be restored on the next run.
+    """
+
+    global _user_path
+    global _unpacked
+
+    if _unpacked:
+        return
+
+    stamp = path.join(get_user_folder(), USER_STAMP % version)
+    if path.exists(stamp):
+        # The stamp lives in the user folder, so the folders are known to exist.
+        _user_path = get_user_folder()
+        _unpacked = True
+        return
 
     user_path = get_user_path()
     folder = resource_exists(DATA_FOLDER, internal=True, dir=True)
     should_update = update_user_files()
+    complete = folder is not None
     if folder is not None:
-        for f in os.listdir(folder):
+        for f in sorted(os.listdir(folder), key=lambda f: f in NOT_DEFAULT):
             if f in NOT_DEFAULT:
                 dest = path.join(user_path, path.basename(f))
             else:
@@ -209,10 +548,44 @@ def unpack_user_files():
                     text = load_text_resource(source, internal=True)
                     if text is not None:
                         try:
-                            with codecs.open(dest, "w", encoding='utf-8') as f:
-                                f.write(text)
+                            write_atomic(dest, text.encode('utf-8'))
                         except Exception:
-                            pass
+                            complete = False
+
+    if complete:
+        try:
+            write_atomic(stamp, version.encode('utf-8'))
+        except Exception:
+            pass
+    _unpacked = True
+
+
+def write_atomic(pth, data):
+    """
+    Write the bytes to the file by way of a temp file in the same folder.
+
+    Readers will either see the old file or the complete new file.
+    """
+
+    fd, temp = tempfile.mkstemp(dir=path.dirname(path.abspath(pth)), prefix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        compat.replace(temp, pth)
+    except Exception:
+        if path.exists(temp):
+            os.remove(temp)
+        raise
+
+
+def hash_file(pth):
+    """Get the SHA1 of the file's content."""
+
+    sha1 = hashlib.sha1()
+    with open(pth, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
 
 
 def resource_exists(*args, **kwargs):
@@ -258,6 +631,9 @@ def load_text_resource(*args, **kwargs):
 def open_in_browser(name):
     """Auto open HTML."""
 
+    import subprocess
+    import webbrowser
+
     if compat.PLATFORM == "osx":
         web_handler = None
         try:
@@ -304,9 +680,9 @@ def resolve_destination(out_name, file_name, critic_mode=0, batch=False):
     if not batch:
         if out_name is not None:
             name = path.abspath(out_name)
-            if path.isdir(out_name):
+            if isdir(out_name):
                 logger.Log.error("'%s' is a directory!" % name)
-            elif path.exists(path.dirname(name)):
+            elif exists(path.dirname(name)):
                 output = name
             else:
                 logger.Log.error("'%s' directory does not exist!" % name)
@@ -332,10 +708,10 @@ def resolve_base_path(basepath, file_name, is_stream=False):
 
     if basepath is not None:
         basepath = path.expanduser(basepath)
-    if basepath is not None and path.exists(basepath):
+    if basepath is not None and exists(basepath):
         # A valid path was fed in
         pth = basepath
-        basepath = path.dirname(path.abspath(pth)) if path.isfile(pth) else path.abspath(pth)
+        basepath = path.dirname(path.abspath(pth)) if isfile(pth) else path.abspath(pth)
     elif not is_stream:
         # Use the current file path
         basepath = path.dirname(path.abspath(file_name))
@@ -353,10 +729,10 @@ def resolve_relative_path(relpath):
 
     if relpath is not None:
         relpath = path.expanduser(relpath)
-    if relpath is not None and path.exists(relpath):
+    if relpath is not None and exists(relpath):
         # A valid path was fed in
         pth = relpath
-        relpath = path.dirname(path.abspath(pth)) if path.isfile(pth) else path.abspath(pth)
+        relpath = path.dirname(path.abspath(pth)) if isfile(pth) else path.abspath(pth)
     else:
         # Okay, there is no way to tell the orign.
         # We are probably a stream that has no specified
@@ -383,9 +759,9 @@ def resolve_meta_path(target, basepath):
             new_target = None
             if basepath is not None:
                 temp = path.join(basepath, target)
-                if path.exists(temp):
+                if exists(temp):
                     new_target = temp
             target = new_target
-        elif not path.exists(target):
+        elif not exists(target):
             target = None
     return target
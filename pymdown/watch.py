@@ -0,0 +1,186 @@
+"""
+Watch.
+
+Keep a converter warm and reconvert files as they change.
+
+Licensed under MIT
+Copyright (c) 2014 - 2015 Isaac Muse <isaacmuse@gmail.com>
+"""
+from __future__ import unicode_literals
+from __future__ import absolute_import
+import os
+import os.path as path
+import time
+import traceback
+from . import logger
+from . import util
+
+PASS = 0
+FAIL = 1
+
+
+class Watcher(object):
+    """
+    Watch sources and what they depend on, and reconvert the affected files.
+
+    Watched files are polled for changes to their mtime and size.  Once a change
+    is seen, polling continues until nothing has changed for the debounce period
+    so a burst of saves results in a single rebuild.  A change to the settings
+    file reloads the settings and rebuilds everything.  The focus file (the one
+    being previewed) is always converted first, followed by the most recently
+    modified sources.  The timings report covers every rebuild and is saved
+    after each one, while the profile saved after each one only covers it.
+    """
+
+    def __init__(self, converter, files, interval=0.5, debounce=0.25, focus=None):
+        """Initialize."""
+
+        self.converter = converter
+        self.files = [path.abspath(f) for f in files]
+        self.interval = interval
+        self.debounce = debounce
+        self.focus = path.abspath(focus) if focus is not None else None
+        self.states = {}
+        self.pending = set()
+
+    def get_settings_path(self):
+        """Get the absolute path of the settings file."""
+
+        return path.abspath(self.converter.config.settings_path)
+
+    def get_watched(self):
+        """Get all the files that should be watched."""
+
+        watched = set(self.files)
+        watched.add(self.get_settings_path())
+        for dependencies in self.converter.dependencies.values():
+            watched |= dependencies
+        return watched
+
+    def get_state(self, pth):
+        """Get the mtime and size of the file."""
+
+        try:
+            st = os.stat(pth)
+            state = (st.st_mtime, st.st_size)
+        except OSError:
+            state = None
+        return state
+
+    def scan(self):
+        """Check the watched files and return the ones that changed since the last scan."""
+
+        changed = set()
+        states = {}
+        for pth in self.get_watched():
+            state = self.get_state(pth)
+            if pth in self.states and self.states[pth] != state:
+                changed.add(pth)
+            states[pth] = state
+        self.states = states
+        return changed
+
+    def get_targets(self, changed):
+        """
+        Get the sources that need to be converted for the changed files.
+
+        Returns whether settings need to be reloaded and the sources in
+        the order they should be converted.
+        """
+
+        reload_settings = self.get_settings_path() in changed
+        if reload_settings:
+            targets = set(self.files)
+        else:
+            targets = set(f for f in self.files if f in changed)
+            for source, dependencies in self.converter.dependencies.items():
+                if source in self.files and dependencies & changed:
+                    targets.add(source)
+
+        def sort_key(source):
+            """Sort focus first and then most recently modified."""
+
+            state = self.states.get(source)
+            return (source != self.focus, -(state[0] if state else 0), source)
+
+        return reload_settings, sorted((t for t in targets if self.states.get(t) is not None), key=sort_key)
+
+    def convert(self, sources):
+        """Convert the sources."""
+
+        status = PASS
+        try:
+            for source in sources:
+                try:
+                    if self.converter.convert_file(source) != PASS:
+                        status = FAIL
+                except Exception:
+                    logger.Log.error(traceback.format_exc())
+                    status = FAIL
+        finally:
+            # Save even if interrupted part way through
+            self.save()
+        return status
+
+    def save(self):
+        """Save the manifest, the timings report of the rebuilds so far, and the profile of this rebuild."""
+
+        if self.converter.manifest is not None:
+            self.converter.manifest.save()
+            self.converter.manifest.reset()
+        if self.converter.report is not None:
+            self.converter.report.save()
+        if self.converter.profiler is not None and not self.converter.profiler.per_file:
+            self.converter.profiler.save()
+
+    def process(self, changed):
+        """Reconvert what is affected by the changed files."""
+
+        reload_settings, targets = self.get_targets(changed)
+        # Files may have been added or removed since the last build
+        util.clear_path_cache()
+        if reload_settings:
+            logger.Log.info("Reloading settings...")
+            try:
+                self.converter.load_settings()
+            except Exception:
+                logger.Log.error(traceback.format_exc())
+                return FAIL
+
+        status = self.convert(targets)
+
+        # Start watching files that outputs now depend on, and hold on to
+        # anything that was changed while we were converting.
+        self.pending = self.scan()
+        return status
+
+    def wait(self):
+        """Wait for changes and then for them to settle."""
+
+        changed = self.pending
+        self.pending = set()
+        while not changed:
+            time.sleep(self.interval)
+            changed = self.scan()
+
+        while True:
+            time.sleep(self.debounce)
+            more = self.scan()
+            if not more:
+                break
+            changed |= more
+        return changed
+
+    def run(self):
+        """Convert everything, watch for changes until interrupted, and return the status of the first build."""
+
+        self.scan()
+        status = self.convert(self.get_targets(set(self.files))[1])
+        self.scan()
+        logger.Log.info("Watching for changes...")
+        try:
+            while True:
+                self.process(self.wait())
+        except KeyboardInterrupt:
+            pass
+        return status
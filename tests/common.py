@@ -3,6 +3,10 @@ import textwrap
 import sys
 from contextlib import contextmanager
 from pymdown import compat
+from pymdown import logger
+
+PASS = 0
+FAIL = 1
 
 
 @contextmanager
@@ -25,3 +29,47 @@ def dedent(text):
     """De-indent strings."""
 
     return textwrap.dedent(text).strip()
+
+
+class EchoConverter(object):
+    """Converter that echos what it was asked to render."""
+
+    def __init__(self, critic):
+        """Initialize."""
+
+        self.critic = critic
+
+    def render(self, text, **kwargs):
+        """Log the request and wrap the text."""
+
+        logger.Log.warn('rendering')
+        if text == 'fail':
+            return FAIL, ''
+        return PASS, '<p>%s %s %s</p>' % (text, self.critic, kwargs.get('basepath'))
+
+    def get_meta(self):
+        """Get the meta."""
+
+        return {'title': 'Title', 'extra': {}}
+
+
+def echo_daemon(options):
+    """
+    Get a daemon with stand-in converters.
+
+    The daemon lib is only imported here so tests that don't need it don't load it.
+    """
+
+    from pymdown import daemon
+
+    class EchoDaemon(daemon.Daemon):
+        """Daemon with stand-in converters."""
+
+        def get_converter(self, critic):
+            """Get a stand-in converter."""
+
+            if critic not in self.converters:
+                self.converters[critic] = EchoConverter(daemon.CRITIC_MODES[critic])
+            return self.converters[critic]
+
+    return EchoDaemon(options)
@@ -0,0 +1,110 @@
+"""Test the batch lib."""
+from __future__ import unicode_literals
+import unittest
+import codecs
+import json
+import logging
+import os
+import shutil
+import tempfile
+from pymdown import batch
+from pymdown import logger
+from pymdown.pymdown import Convert
+
+
+class TestBatch(unittest.TestCase):
+    """TestBatch."""
+
+    def test_jobs(self):
+        """Test resolving the number of jobs."""
+
+        self.assertEqual(batch.get_jobs(None), 1)
+        self.assertEqual(batch.get_jobs('4'), 4)
+        self.assertEqual(batch.get_jobs(2), 2)
+        self.assertTrue(batch.get_jobs('auto') >= 1)
+        self.assertRaises(ValueError, batch.get_jobs, '0')
+        self.assertRaises(ValueError, batch.get_jobs, 'many')
+
+    def test_capture(self):
+        """Test that log records are captured in order."""
+
+        log = logging.getLogger('PYMDOWN.test_batch')
+        log.propagate = False
+        handler = batch.CaptureHandler()
+        log.addHandler(handler)
+        log.error('first')
+        log.warning('second')
+        log.removeHandler(handler)
+
+        self.assertEqual(
+            handler.flush_records(),
+            [(logging.ERROR, 'first'), (logging.WARNING, 'second')]
+        )
+        self.assertEqual(handler.flush_records(), [])
+
+
+class TestBatchConvert(unittest.TestCase):
+    """Test converting a batch with worker processes."""
+
+    def setUp(self):
+        """Setup temp folder with sources and capture the log."""
+
+        self.tempdir = tempfile.mkdtemp()
+        self.files = []
+        for name in ('a', 'b', 'c'):
+            source = os.path.join(self.tempdir, name + '.md')
+            if name != 'b':
+                with codecs.open(source, 'w', encoding='utf-8') as f:
+                    f.write('# Title %s\n\nText.\n' % name)
+            self.files.append(source)
+        self.handlers = list(logger.logger.handlers)
+        for handler in self.handlers:
+            logger.logger.removeHandler(handler)
+        self.capture = batch.CaptureHandler()
+        logger.logger.addHandler(self.capture)
+
+    def tearDown(self):
+        """Cleanup temp folder and restore the log."""
+
+        logger.logger.removeHandler(self.capture)
+        for handler in self.handlers:
+            logger.logger.addHandler(handler)
+        shutil.rmtree(self.tempdir)
+
+    def test_convert(self):
+        """Test that a batch is converted in order and a failed file fails it without stopping it."""
+
+        report = os.path.join(self.tempdir, 'report.json')
+        converter = Convert(
+            batch=True,
+            jobs=2,
+            timings=report,
+            settings_path=os.path.join(self.tempdir, 'pymdown.yml')
+        )
+        status = converter.convert(self.files)
+
+        self.assertEqual(status, batch.FAIL)
+        self.assertTrue(os.path.exists(os.path.join(self.tempdir, 'a.html')))
+        self.assertFalse(os.path.exists(os.path.join(self.tempdir, 'b.html')))
+        self.assertTrue(os.path.exists(os.path.join(self.tempdir, 'c.html')))
+        with codecs.open(os.path.join(self.tempdir, 'c.html'), 'r', encoding='utf-8') as f:
+            self.assertTrue('>Title c<' in f.read())
+
+        # Logs from the workers are replayed in the order of the files.
+        self.assertEqual(
+            self.capture.flush_records(),
+            [
+                (logging.INFO, 'Converting %s...' % self.files[0]),
+                (logging.INFO, 'Converting %s...' % self.files[1]),
+                (logging.ERROR, 'Failed to open %s!' % self.files[1]),
+                (logging.INFO, 'Converting %s...' % self.files[2])
+            ]
+        )
+
+        # Results from the workers are merged into the report.
+        with codecs.open(report, 'r', encoding='utf-8') as f:
+            rows = json.load(f)['files']
+        self.assertEqual(
+            sorted((row['source'], row['status']) for row in rows),
+            [(self.files[0], 'ok'), (self.files[1], 'fail'), (self.files[2], 'ok')]
+        )
@@ -0,0 +1,129 @@
+"""Test the cache lib."""
+from __future__ import unicode_literals
+import unittest
+import os
+import shutil
+import tempfile
+import codecs
+from pymdown import cache
+from pymdown import mdconvert
+
+
+class TestHtmlCache(unittest.TestCase):
+    """TestHtmlCache."""
+
+    def setUp(self):
+        """Setup temp folder."""
+
+        self.tempdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Remove temp folder."""
+
+        shutil.rmtree(self.tempdir)
+
+    def test_keys(self):
+        """Test that keys depend on the text and the fingerprint."""
+
+        c = cache.HtmlCache(self.tempdir)
+        self.assertEqual(c.get_key('text', 'a'), c.get_key('text', 'a'))
+        self.assertNotEqual(c.get_key('text', 'a'), c.get_key('text', 'b'))
+        self.assertNotEqual(c.get_key('text', 'a'), c.get_key('text2', 'a'))
+
+    def test_get_put(self):
+        """Test storing and retrieving HTML."""
+
+        c = cache.HtmlCache(self.tempdir)
+        key = c.get_key('# Ā ā', 'a')
+        self.assertEqual(c.get(key), None)
+        c.put(key, '<h1>Ā ā</h1>\r\n')
+        self.assertEqual(cache.HtmlCache(self.tempdir).get(key), '<h1>Ā ā</h1>\r\n')
+
+    def test_evict(self):
+        """Test that the least recently used entries are evicted."""
+
+        c = cache.HtmlCache(self.tempdir, max_size=350)
+        keys = [c.get_key(str(i), 'a') for i in range(3)]
+        for i, key in enumerate(keys):
+            c.put(key, 'x' * 100)
+            os.utime(c.get_path(key), (i, i))
+
+        # Mark the oldest entry as used so the second is evicted instead.
+        c.get(keys[0])
+        c.put(c.get_key('3', 'a'), 'x' * 100)
+        self.assertNotEqual(c.get(keys[0]), None)
+        self.assertEqual(c.get(keys[1]), None)
+        self.assertTrue(c.size <= 350)
+
+    def _write(self, name, text):
+        """Write the text to the file in the temp folder."""
+
+        with codecs.open(os.path.join(self.tempdir, name), 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def test_file_extensions(self):
+        """Test that the cache is not used when an extension reads other files into the HTML."""
+
+        c = cache.HtmlCache(os.path.join(self.tempdir, 'cache'))
+        extensions = {'pymdownx.snippets': {'base_path': self.tempdir}}
+
+        def convert():
+            """Convert text that pulls in a snippet."""
+
+            converter = mdconvert.MdConverts('--8<-- "snippet.md"\n', markdown_extensions=extensions, cache=c)
+            converter.convert()
+            return converter.markdown
+
+        self._write('snippet.md', 'first')
+        self.assertEqual(convert(), '<p>first</p>')
+        self._write('snippet.md', 'second')
+        self.assertEqual(convert(), '<p>second</p>')
+        self.assertEqual(c.get_entries(), [])
+
+        converter = mdconvert.MdConverts('text\n', cache=c)
+        converter.convert()
+        self.assertEqual(len(c.get_entries()), 1)
+
+
+class TestMemoryCache(unittest.TestCase):
+    """TestMemoryCache."""
+
+    def test_lru(self):
+        """Test that the least recently used values are dropped once the cache is full."""
+
+        c = cache.MemoryCache(30)
+        c.put('a', 'a' * 10, 10)
+        c.put('b', 'b' * 10, 10)
+        c.put('c', 'c' * 10, 10)
+        self.assertEqual(c.get('a'), 'a' * 10)
+        c.put('d', 'd' * 10, 10)
+        self.assertEqual(c.get('b'), None)
+        self.assertEqual(c.get('a'), 'a' * 10)
+        self.assertEqual(c.size, 30)
+
+    def test_replace_and_oversize(self):
+        """Test replacing values and not storing values larger than the cache."""
+
+        c = cache.MemoryCache(30)
+        c.put('a', 'a' * 10, 10)
+        c.put('a', 'a' * 20, 20)
+        self.assertEqual(c.size, 20)
+        c.put('b', 'b' * 31, 31)
+        self.assertEqual(c.get('b'), None)
+        self.assertEqual(c.get('a'), 'a' * 20)
+        c.clear()
+        self.assertEqual(c.get('a'), None)
+        self.assertEqual(c.size, 0)
+
+    def test_size(self):
+        """Test that values are sized in bytes unless a size is given."""
+
+        c = cache.MemoryCache(30)
+        c.put('a', 'Ā' * 10)
+        self.assertEqual(c.size, 20)
+        c.put('b', b'b' * 5)
+        self.assertEqual(c.size, 25)
+        c.put('c', 'c' * 20, 1)
+        self.assertEqual(c.size, 26)
+        c.put('d', 'Ā' * 16)
+        self.assertEqual(c.get('d'), None)
@@ -1,8 +1,14 @@
 """Test critic lib."""
 from __future__ import unicode_literals
 import unittest
+import codecs
+import os
+import shutil
+import tempfile
 from . import common
 from pymdown import critic_dump
+from pymdown import pymdown
+from pymdown import util
 
 
 class TestCritic(unittest.TestCase):
@@ -67,3 +73,44 @@ class TestCritic(unittest.TestCase):
         )
 
         self.assertEqual(result, expected)
+
+    def test_stream(self):
+        """Test that processing the text in chunks gives the same result."""
+
+        cd = critic_dump.CriticDump()
+        text = self.text + '{++ never closed {~~ a ~> b\n{>>spans\nlines<<} ~~}'
+        for accept, view in ((True, False), (False, False), (False, True)):
+            expected = cd.dump(text, accept, view)
+            for size in (1, 2, 3, 7, len(text)):
+                chunks = [text[i:i + size] for i in range(0, len(text), size)]
+                result = ''.join(cd.stream(chunks, accept, view, critic_dump.find_closes(chunks)))
+                self.assertEqual(result, expected)
+            self.assertEqual(''.join(cd.stream(iter([text]), accept, view)), expected)
+
+    def test_dump_file(self):
+        """Test that a file is dumped a chunk at a time and that one that can't be decoded fails."""
+
+        tempdir = tempfile.mkdtemp()
+        read_size = pymdown.READ_SIZE
+        try:
+            source = os.path.join(tempdir, 'test.md')
+            with codecs.open(source, 'w', encoding='utf-8') as f:
+                f.write(self.text)
+            bad = os.path.join(tempdir, 'bad.md')
+            with open(bad, 'wb') as f:
+                f.write(b'\xff\xfe{++bad++}')
+
+            pymdown.READ_SIZE = 7
+            converter = pymdown.Convert(
+                critic=util.CRITIC_DUMP | util.CRITIC_ACCEPT,
+                batch=True,
+                settings_path=os.path.join(tempdir, 'pymdown.yml'),
+                cache=os.path.join(tempdir, 'cache')
+            )
+            self.assertEqual(converter.convert([source]), pymdown.PASS)
+            with codecs.open(os.path.join(tempdir, 'test.accepted.md'), 'r', encoding='utf-8') as f:
+                self.assertEqual(f.read(), critic_dump.CriticDump().dump(self.text, True, False))
+            self.assertEqual(converter.convert([bad]), pymdown.FAIL)
+        finally:
+            pymdown.READ_SIZE = read_size
+            shutil.rmtree(tempdir)
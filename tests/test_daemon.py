@@ -0,0 +1,151 @@
+"""Test the daemon lib."""
+from __future__ import unicode_literals
+import unittest
+import os
+import shutil
+import tempfile
+import threading
+from pymdown import daemon
+from . import common
+
+
+@unittest.skipIf(not hasattr(daemon.socket, 'AF_UNIX'), "Unix sockets are not supported")
+class TestDaemon(unittest.TestCase):
+    """TestDaemon."""
+
+    def setUp(self):
+        """Start a server on a temp socket."""
+
+        self.tempdir = tempfile.mkdtemp()
+        self.socket = os.path.join(self.tempdir, 'pymdown.sock')
+        self.daemon = common.echo_daemon({})
+        self.server = daemon.Server(self.socket, self.daemon)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        """Stop the server and cleanup."""
+
+        self.server.shutdown()
+        self.thread.join()
+        self.server.server_close()
+        shutil.rmtree(self.tempdir)
+
+    def test_convert(self):
+        """Test conversion requests over a single connection."""
+
+        responses = daemon.request(
+            self.socket,
+            [
+                {'id': 1, 'text': 'one', 'basepath': '/docs'},
+                {'id': 2, 'text': 'two', 'critic': 'accept'},
+                {'id': 3, 'text': 'fail'},
+                {'id': 4, 'text': 'bad', 'critic': 'maybe'}
+            ]
+        )
+
+        self.assertEqual([r['id'] for r in responses], [1, 2, 3, 4])
+        self.assertEqual(responses[0]['status'], 'ok')
+        self.assertEqual(responses[0]['html'], '<p>one %d /docs</p>' % daemon.CRITIC_MODES['ignore'])
+        self.assertEqual(responses[0]['log'], ['rendering'])
+        self.assertTrue(set(responses[0]['timings']) >= set(['wait', 'convert']))
+        self.assertEqual(responses[1]['html'], '<p>two %d None</p>' % daemon.CRITIC_MODES['accept'])
+        self.assertEqual(responses[2]['status'], 'error')
+        self.assertEqual(responses[3]['status'], 'error')
+
+    def test_clients(self):
+        """Test that several clients are served at once."""
+
+        results = {}
+
+        def client(name):
+            """Send a request and store the response."""
+
+            results[name] = daemon.request(self.socket, [{'id': name, 'text': name}])[0]
+
+        threads = [threading.Thread(target=client, args=('client%d' % i,)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(sorted(results), ['client0', 'client1', 'client2', 'client3'])
+        for name, response in results.items():
+            self.assertEqual(response['id'], name)
+            self.assertTrue(response['html'].startswith('<p>%s ' % name))
+
+    def test_commands(self):
+        """Test the ping and unknown commands and invalid requests."""
+
+        responses = daemon.request(self.socket, [{'command': 'ping'}, {'command': 'nap'}, []])
+        self.assertEqual(responses[0]['status'], 'ok')
+        self.assertEqual(responses[1]['status'], 'error')
+        self.assertEqual(responses[2]['status'], 'error')
+        self.assertTrue(daemon.is_listening(self.socket))
+
+    def test_idle(self):
+        """Test idle detection."""
+
+        self.daemon.idle_timeout = 60
+        self.assertFalse(self.daemon.is_idle())
+        self.daemon.last_activity -= 120
+        self.assertTrue(self.daemon.is_idle())
+        self.daemon.begin()
+        self.daemon.last_activity -= 120
+        self.assertFalse(self.daemon.is_idle())
+        self.daemon.end()
+        self.daemon.idle_timeout = 0
+        self.daemon.last_activity -= 120
+        self.assertFalse(self.daemon.is_idle())
+
+
+@unittest.skipIf(not hasattr(daemon.socket, 'AF_UNIX'), "Unix sockets are not supported")
+class TestConvertDaemon(unittest.TestCase):
+    """Test the daemon with real converters."""
+
+    def setUp(self):
+        """Start a server on a temp socket."""
+
+        self.tempdir = tempfile.mkdtemp()
+        self.socket = os.path.join(self.tempdir, 'pymdown.sock')
+        self.daemon = daemon.Daemon(
+            {'settings_path': os.path.join(self.tempdir, 'pymdown.yml'), 'force_no_template': True}
+        )
+        self.server = daemon.Server(self.socket, self.daemon)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        """Stop the server and cleanup."""
+
+        self.server.shutdown()
+        self.thread.join()
+        self.server.server_close()
+        shutil.rmtree(self.tempdir)
+
+    def test_convert(self):
+        """Test that Markdown is rendered through the socket with a converter for each critic mode."""
+
+        text = '# Title\n\nSome {++added++} text.\n'
+        responses = daemon.request(
+            self.socket,
+            [
+                {'id': 1, 'text': text, 'frontmatter': {'title': 'Frontmatter'}},
+                {'id': 2, 'text': text, 'critic': 'accept'},
+                {'id': 3, 'text': text, 'critic': 'view'},
+                {'id': 4, 'text': text}
+            ]
+        )
+
+        self.assertEqual([r['status'] for r in responses], ['ok'] * 4)
+        self.assertTrue('>Title<' in responses[0]['html'])
+        self.assertTrue('<p>Some {++added++} text.</p>' in responses[0]['html'])
+        self.assertEqual(responses[0]['meta']['title'], 'Frontmatter')
+        self.assertTrue('<p>Some added text.</p>' in responses[1]['html'])
+        self.assertTrue('<p>Some <ins class="critic">added</ins> text.</p>' in responses[2]['html'])
+        self.assertEqual(responses[3]['html'], responses[0]['html'])
+        self.assertEqual(responses[3]['meta']['title'], 'Untitled')
+
+        self.assertEqual(sorted(self.daemon.converters), ['accept', 'ignore', 'view'])
+        for critic, converter in self.daemon.converters.items():
+            self.assertEqual(converter.config.critic, daemon.CRITIC_MODES[critic])
@@ -0,0 +1,85 @@
+"""Test the formatter lib."""
+from __future__ import unicode_literals
+import unittest
+import codecs
+import os
+import shutil
+import tempfile
+from pymdown import formatter
+
+
+class Target(object):
+    """Record what gets written."""
+
+    def __init__(self):
+        """Initialize."""
+
+        self.writes = []
+
+    def write(self, data):
+        """Record the write."""
+
+        self.writes.append(data)
+
+
+class TestFormatter(unittest.TestCase):
+    """TestFormatter."""
+
+    def setUp(self):
+        """Setup temp folder."""
+
+        self.tempdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Cleanup."""
+
+        shutil.rmtree(self.tempdir)
+
+    def test_write_chunks(self):
+        """Test that small chunks are gathered, large chunks are split, and the text is encoded."""
+
+        target = Target()
+        formatter.write_chunks(target, ['a', 'b', 'c' * (formatter.WRITE_SIZE * 2 + 1), 'd', '‘'], 'ascii')
+        self.assertEqual(
+            [len(w) for w in target.writes],
+            [2, formatter.WRITE_SIZE, formatter.WRITE_SIZE, 1, 8]
+        )
+        self.assertEqual(b''.join(target.writes), b'ab' + b'c' * (formatter.WRITE_SIZE * 2 + 1) + b'd&#8216;')
+
+    def test_write_chunks_bom(self):
+        """Test that stateful encodings are encoded as one stream."""
+
+        target = Target()
+        formatter.write_chunks(target, ['a' * formatter.WRITE_SIZE, 'b'], 'utf-16')
+        self.assertEqual(
+            b''.join(target.writes).decode('utf-16'),
+            'a' * formatter.WRITE_SIZE + 'b'
+        )
+
+    def test_html(self):
+        """Test that the page is rendered into the output file."""
+
+        output = os.path.join(self.tempdir, 'out.html')
+        html = formatter.Html(
+            settings={
+                'page': {'destination': output, 'encoding': 'utf-8', 'title': 'Title'},
+                'pymdown_settings': {},
+                'extra': {}
+            }
+        )
+        html.open()
+        html.write('<p>‘content’</p>')
+        html.close()
+        with codecs.open(output, 'r', encoding='utf-8') as f:
+            self.assertEqual(f.read(), '<p>‘content’</p>')
+
+    def test_text(self):
+        """Test that text is written to the output file."""
+
+        output = os.path.join(self.tempdir, 'out.md')
+        txt = formatter.Text(settings={'page': {'destination': output, 'encoding': 'utf-8'}})
+        txt.open()
+        txt.write(iter(['one ', 'two']))
+        txt.close()
+        with codecs.open(output, 'r', encoding='utf-8') as f:
+            self.assertEqual(f.read(), 'one two')
@@ -0,0 +1,41 @@
+"""Test that heavy dependencies are only imported when needed."""
+from __future__ import unicode_literals
+import unittest
+import os
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+CHECK = (
+    'import sys; import %s; '
+    'print(",".join(sorted(set(m.split(".")[0] for m in sys.modules) & set(%r))))'
+)
+
+
+class TestImports(unittest.TestCase):
+    """TestImports."""
+
+    def _loaded(self, module, heavy):
+        """Import the module in a fresh interpreter and return the heavy modules it loaded."""
+
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join([ROOT] + ([env['PYTHONPATH']] if env.get('PYTHONPATH') else []))
+        out = subprocess.check_output([sys.executable, '-c', CHECK % (module, heavy)], env=env, cwd=ROOT)
+        return [m for m in out.decode('utf-8').strip().split(',') if m]
+
+    def test_cli(self):
+        """Test that the CLI doesn't import the converter's dependencies up front."""
+
+        self.assertEqual(
+            self._loaded('pymdown.cli', ('jinja2', 'markdown', 'yaml', 'pygments', 'pymdownx', 'multiprocessing')),
+            []
+        )
+
+    def test_pymdown(self):
+        """Test that importing the converter doesn't load the template, YAML, or Pygments libraries."""
+
+        self.assertEqual(
+            self._loaded('pymdown.pymdown', ('jinja2', 'markdown', 'yaml', 'pygments', 'pymdownx')),
+            []
+        )
@@ -0,0 +1,49 @@
+"""Test the JSON lines lib."""
+from __future__ import unicode_literals
+import unittest
+import io
+import json
+from pymdown import daemon
+from pymdown import jsonl
+from . import common
+
+
+class TestJsonLines(unittest.TestCase):
+    """TestJsonLines."""
+
+    def test_read_lines(self):
+        """Test that lines split across reads and multi-byte characters are put back together."""
+
+        text = '{"text": "‘one’"}\n\n{"text": "two"}\n{"text": "three"}'
+        data = text.encode('utf-8')
+        original = jsonl.READ_SIZE
+        try:
+            jsonl.READ_SIZE = 3
+            lines = list(jsonl.read_lines(io.BytesIO(data)))
+        finally:
+            jsonl.READ_SIZE = original
+        self.assertEqual(lines, text.split('\n'))
+
+    def test_convert(self):
+        """Test that there is a response line for each record."""
+
+        stdin = io.BytesIO(
+            b'{"id": 1, "text": "one"}\n'
+            b'not json\n'
+            b'[1, 2]\n'
+            b'{"id": 2, "text": "two", "critic": "view"}\n'
+        )
+        stdout = io.BytesIO()
+        status = jsonl.convert(common.echo_daemon({}), stdin, stdout)
+        responses = [json.loads(line) for line in stdout.getvalue().decode('utf-8').splitlines()]
+
+        self.assertEqual(status, jsonl.FAIL)
+        self.assertEqual(len(responses), 4)
+        self.assertEqual(responses[0]['id'], 1)
+        self.assertEqual(responses[0]['status'], 'ok')
+        self.assertEqual(responses[0]['meta'], {'title': 'Title', 'extra': {}})
+        self.assertEqual(responses[0]['log'], ['rendering'])
+        self.assertEqual(responses[1], {'status': 'error', 'error': 'Invalid JSON!'})
+        self.assertEqual(responses[2], {'status': 'error', 'error': 'Records must be JSON objects!'})
+        self.assertEqual(responses[3]['id'], 2)
+        self.assertEqual(responses[3]['html'], '<p>two %d None</p>' % daemon.CRITIC_MODES['view'])
@@ -0,0 +1,155 @@
+"""Test the manifest lib."""
+from __future__ import unicode_literals
+import unittest
+import os
+import shutil
+import tempfile
+import codecs
+from pymdown import manifest
+from pymdown import util
+from pymdown import pymdown
+import json
+
+
+class TestManifest(unittest.TestCase):
+    """TestManifest."""
+
+    def setUp(self):
+        """Setup temp folder with a source and output."""
+
+        self.tempdir = tempfile.mkdtemp()
+        self.source = os.path.join(self.tempdir, 'test.md')
+        self.output = os.path.join(self.tempdir, 'test.html')
+        self.manifest = os.path.join(self.tempdir, 'manifest.json')
+        self._write(self.source, 'source')
+        self._write(self.output, 'output')
+
+    def tearDown(self):
+        """Remove temp folder."""
+
+        shutil.rmtree(self.tempdir)
+
+    def _write(self, pth, text, mtime=None):
+        """Write the file."""
+
+        with open(pth, 'w') as f:
+            f.write(text)
+        if mtime is not None:
+            os.utime(pth, (mtime, mtime))
+
+    def _record(self):
+        """Record the source and save the manifest."""
+
+        m = manifest.Manifest(self.manifest)
+        m.record(self.source, self.output, 'config', 'settings', [])
+        m.save()
+
+    def test_unchanged(self):
+        """Test that an unchanged source is current."""
+
+        self._record()
+        self.assertTrue(manifest.Manifest(self.manifest).is_current(self.source, 'config'))
+
+    def test_touched(self):
+        """Test that a source with a new mtime but the same content is current."""
+
+        self._record()
+        self._write(self.source, 'source', mtime=1)
+        m = manifest.Manifest(self.manifest)
+        self.assertTrue(m.is_current(self.source, 'config'))
+        m.save()
+        self.assertEqual(manifest.Manifest(self.manifest).records[self.source]['files'][self.source][0], 1)
+
+    def test_changed(self):
+        """Test that a changed source or missing output is not current."""
+
+        self._record()
+        self._write(self.source, 'sourcf', mtime=1)
+        self.assertFalse(manifest.Manifest(self.manifest).is_current(self.source, 'config'))
+
+        self._record()
+        os.remove(self.output)
+        self.assertFalse(manifest.Manifest(self.manifest).is_current(self.source, 'config'))
+
+    def test_config(self):
+        """Test that a new global config defers to the effective settings."""
+
+        self._record()
+        m = manifest.Manifest(self.manifest)
+        self.assertEqual(m.is_current(self.source, 'config2'), None)
+        self.assertFalse(m.is_settings_current(self.source, 'config2', 'settings2'))
+        self.assertTrue(m.is_settings_current(self.source, 'config2', 'settings'))
+        m.save()
+        self.assertTrue(manifest.Manifest(self.manifest).is_current(self.source, 'config2'))
+
+
+class TestIncremental(unittest.TestCase):
+    """Test incremental builds."""
+
+    def setUp(self):
+        """Setup temp folder with a source that includes a snippet."""
+
+        self.tempdir = tempfile.mkdtemp()
+        self.settings = os.path.join(self.tempdir, 'pymdown.yml')
+        text = util.load_text_resource(util.DEFAULT_SETTINGS, internal=True)
+        with codecs.open(self.settings, 'w', encoding='utf-8') as f:
+            f.write(
+                text.replace(
+                    'markdown_extensions:\n',
+                    'markdown_extensions:\n  pymdownx.snippets:\n    base_path: %s\n' % self.tempdir
+                )
+            )
+        self.source = os.path.join(self.tempdir, 'test.md')
+        self._write('test.md', '--8<-- "snippet.md"\n')
+
+    def tearDown(self):
+        """Remove temp folder."""
+
+        shutil.rmtree(self.tempdir)
+
+    def _write(self, name, text):
+        """Write the file in the temp folder."""
+
+        with codecs.open(os.path.join(self.tempdir, name), 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def _build(self, source=None, **kwargs):
+        """Build incrementally and get the output."""
+
+        source = self.source if source is None else source
+        kwargs.setdefault('settings_path', self.settings)
+        converter = pymdown.Convert(
+            batch=True,
+            incremental=True,
+            manifest=os.path.join(self.tempdir, 'manifest.json'),
+            force_no_template=True,
+            **kwargs
+        )
+        self.assertEqual(converter.convert([source]), pymdown.PASS)
+        with codecs.open(os.path.splitext(source)[0] + '.html', 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def test_snippet(self):
+        """Test that a source is rebuilt after a snippet it includes changes."""
+
+        self._write('snippet.md', 'snip1')
+        self.assertTrue('<p>snip1</p>' in self._build())
+        self._write('snippet.md', 'snip2')
+        self.assertTrue('<p>snip2</p>' in self._build())
+
+    def test_report(self):
+        """Test that files skipped because they are up to date are in the timings report."""
+
+        # Files are always rebuilt when snippets are used
+        self._write('plain.yml', util.load_text_resource(util.DEFAULT_SETTINGS, internal=True))
+        settings_path = os.path.join(self.tempdir, 'plain.yml')
+        source = os.path.join(self.tempdir, 'plain.md')
+        timings = os.path.join(self.tempdir, 'timings.json')
+        self._write('plain.md', '# Plain\n')
+        self._build(source, settings_path=settings_path, timings=timings)
+        # Unchanged inputs, and then a new global option that leaves the file's settings alone
+        for options in ({}, {'frontmatter_max_size': 1024}):
+            self._build(source, settings_path=settings_path, timings=timings, **options)
+            with codecs.open(timings, 'r', encoding='utf-8') as f:
+                totals = json.load(f)['totals']
+            self.assertEqual((totals['files'], totals['skipped'], totals['failed']), (1, 1, 0))
@@ -0,0 +1,113 @@
+"""Test the markdown converter lib."""
+from __future__ import unicode_literals
+import unittest
+import os
+from collections import OrderedDict
+from pymdown import mdconvert
+from pymdown import report
+
+
+class TestConverterPool(unittest.TestCase):
+    """TestConverterPool."""
+
+    text = '![image](images/test.png)\n\n[^1]\n\n[^1]: footnote\n'
+
+    extensions = OrderedDict(
+        [
+            ('markdown.extensions.footnotes', None),
+            ('pymdownx.pathconverter', OrderedDict(
+                [('base_path', '${BASE_PATH}'), ('relative_path', '${REL_PATH}')]
+            )),
+            ('markdown.extensions.attr_list', None)
+        ]
+    )
+
+    def _convert(self, base, rel, pool=None, timings=None):
+        """Convert the text with the given paths."""
+
+        converter = mdconvert.MdConverts(
+            self.text,
+            base_path=base,
+            relative_path=rel,
+            markdown_extensions=self.extensions,
+            pool=pool,
+            extension_timings=timings
+        )
+        converter.convert()
+        return converter.markdown
+
+    def test_reuse(self):
+        """Test that pooled instances are reused and rebound to new paths."""
+
+        pool = mdconvert.ConverterPool()
+        root = os.path.abspath('.')
+        paths = [
+            (root, os.path.join(root, 'tests')),
+            (root, os.path.join(root, 'docs')),
+            (os.path.join(root, 'docs'), root),
+            (root, os.path.join(root, 'tests'))
+        ]
+        for base, rel in paths:
+            self.assertEqual(self._convert(base, rel, pool), self._convert(base, rel))
+
+        self.assertEqual(len(pool.idle), 1)
+        self.assertEqual(len(list(pool.idle.values())[0]), 1)
+
+    def test_abbreviations(self):
+        """Test that abbreviations from one document don't carry over to the next."""
+
+        pool = mdconvert.ConverterPool()
+        extensions = OrderedDict([('markdown.extensions.abbr', None)])
+        results = []
+        for text in ('HTML here\n\n*[HTML]: Hyper Text\n', 'plain HTML text\n', 'plain HTML text\n'):
+            converter = mdconvert.MdConverts(text, markdown_extensions=extensions, pool=pool)
+            converter.convert()
+            results.append(converter.markdown)
+
+        self.assertEqual(results[0], '<p><abbr title="Hyper Text">HTML</abbr> here</p>')
+        self.assertEqual(results[1], '<p>plain HTML text</p>')
+        self.assertEqual(results[2], '<p>plain HTML text</p>')
+        # Only the instance that wasn't changed is kept.
+        self.assertEqual(len(list(pool.idle.values())[0]), 1)
+
+    def test_rebind_order(self):
+        """Test that rebinding keeps the processor order."""
+
+        md = mdconvert.MdConverts(self.text, base_path='a', markdown_extensions=self.extensions).create_markdown()
+        order = list(md.postprocessors.keys())
+        converter = mdconvert.MdConverts(self.text, base_path='b', markdown_extensions=self.extensions)
+        self.assertTrue(md.bind(converter.get_paths(), converter.path_extensions, converter.extension_configs))
+        self.assertEqual(list(md.postprocessors.keys()), order)
+        self.assertEqual(md.postprocessors['path-converter'].config['base_path'], 'b')
+
+    def test_templates_unchanged(self):
+        """Test that the extension configs passed in are not altered."""
+
+        mdconvert.MdConverts(self.text, base_path='a', markdown_extensions=self.extensions)
+        self.assertEqual(self.extensions['pymdownx.pathconverter']['base_path'], '${BASE_PATH}')
+        self.assertEqual(self.extensions['markdown.extensions.footnotes'], None)
+
+    def test_instrument(self):
+        """Test that processors are timed by extension without changing the output."""
+
+        pool = mdconvert.ConverterPool()
+        timings = report.ExtensionTimings()
+        root = os.path.abspath('.')
+        for rel in ('tests', 'docs'):
+            self.assertEqual(
+                self._convert(root, os.path.join(root, rel), pool, timings),
+                self._convert(root, os.path.join(root, rel))
+            )
+
+        extensions = timings.collect()
+        self.assertEqual(
+            set(extensions),
+            set(
+                ['markdown', 'markdown.extensions.footnotes', 'pymdownx.pathconverter', 'markdown.extensions.attr_list']
+            )
+        )
+        # Rebound processors are timed too, and each conversion is only counted once.
+        self.assertEqual(extensions['pymdownx.pathconverter']['postprocessors.path-converter'][1], 2)
+        self.assertIn('inlinePatterns.image_link', extensions['markdown'])
+        self.assertIn('inlinePatterns.footnote', extensions['markdown.extensions.footnotes'])
+        self.assertEqual(timings.collect(), {})
@@ -0,0 +1,116 @@
+"""Test the profiler lib."""
+from __future__ import unicode_literals
+import unittest
+import codecs
+import os
+import pstats
+import shutil
+import tempfile
+import time
+from pymdown import profiler
+from pymdown import pymdown
+from pymdown import util
+
+
+def busy(seconds):
+    """Keep busy for a while."""
+
+    end = time.time() + seconds
+    while time.time() < end:
+        pass
+
+
+class TestProfiler(unittest.TestCase):
+    """TestProfiler."""
+
+    def setUp(self):
+        """Setup temp folder."""
+
+        self.tempdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Cleanup."""
+
+        shutil.rmtree(self.tempdir)
+
+    def test_parse(self):
+        """Test that the kind and path are checked."""
+
+        self.assertEqual(profiler.parse_profile('cprofile:out.pstats'), ('cprofile', 'out.pstats'))
+        self.assertEqual(profiler.parse_profile('sample:C:\\out.folded'), ('sample', 'C:\\out.folded'))
+        for value in ('out.pstats', 'cprofile:', 'other:out.pstats'):
+            self.assertRaises(profiler.PyMdownProfilerException, profiler.parse_profile, value)
+        self.assertIsInstance(profiler.get_profiler('sample:out.folded'), profiler.SampleProfiler)
+
+    def test_per_file(self):
+        """Test that per file profiles are saved in the folder by source."""
+
+        p = profiler.get_profiler('cprofile:' + self.tempdir, per_file=True)
+        first = p.get_path(os.path.join('a', 'test.md'))
+        self.assertEqual(os.path.dirname(first), self.tempdir)
+        self.assertTrue(os.path.basename(first).startswith('test.md.'))
+        self.assertTrue(first.endswith('.pstats'))
+        self.assertNotEqual(first, p.get_path(os.path.join('b', 'test.md')))
+        self.assertEqual(p.get_path(None), os.path.join(self.tempdir, 'stdin.pstats'))
+
+    def test_cprofile(self):
+        """Test that profiles from elsewhere are merged in."""
+
+        pth = os.path.join(self.tempdir, 'out', 'out.pstats')
+        p = profiler.CProfiler(pth)
+        worker = profiler.CProfiler(None)
+        for prof in (p, worker):
+            prof.start()
+            busy(0.01)
+            prof.stop()
+        p.merge(worker.collect())
+        p.save()
+
+        stats = pstats.Stats(pth).stats
+        self.assertEqual([v[1] for k, v in stats.items() if k[2] == 'busy'], [2])
+
+    def test_sample(self):
+        """Test that sampled stacks are collapsed and merged."""
+
+        pth = os.path.join(self.tempdir, 'out.folded')
+        p = profiler.SampleProfiler(pth, interval=0.001)
+        worker = profiler.SampleProfiler(None, interval=0.001)
+        for prof in (p, worker):
+            prof.start()
+            busy(0.1)
+            prof.stop()
+        p.merge(worker.collect())
+        p.save()
+
+        with codecs.open(pth, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        samples = 0
+        for line in lines:
+            stack, count = line.rsplit(' ', 1)
+            if stack.split(';')[-1].startswith('busy ('):
+                samples += int(count)
+        self.assertGreater(samples, 10)
+
+    def test_settings(self):
+        """Test that reading the settings is profiled along with the conversions."""
+
+        settings_path = os.path.join(self.tempdir, 'pymdown.yml')
+        with codecs.open(settings_path, 'w', encoding='utf-8') as f:
+            f.write(util.load_text_resource(util.DEFAULT_SETTINGS, internal=True))
+        source = os.path.join(self.tempdir, 'test.md')
+        with codecs.open(source, 'w', encoding='utf-8') as f:
+            f.write('# Test\n')
+
+        pth = os.path.join(self.tempdir, 'out.pstats')
+        converter = pymdown.Convert(
+            batch=True,
+            settings_path=settings_path,
+            cache=os.path.join(self.tempdir, 'cache'),
+            force_no_template=True,
+            profile='cprofile:' + pth
+        )
+        self.assertEqual(converter.convert([source]), pymdown.PASS)
+
+        names = set(k[2] for k in pstats.Stats(pth).stats)
+        self.assertTrue('read_settings' in names)
+        self.assertTrue('process_file' in names)
@@ -0,0 +1,178 @@
+"""Test the report lib."""
+from __future__ import unicode_literals
+import unittest
+import json
+import os
+import shutil
+import tempfile
+from pymdown import report
+try:
+    import tracemalloc
+except ImportError:  # pragma: no cover
+    tracemalloc = None
+
+
+class FakeTimer(object):
+    """Timer that only moves when told to."""
+
+    def __init__(self):
+        """Initialize."""
+
+        self.now = 0.0
+
+    def __call__(self):
+        """Get the time."""
+
+        return self.now
+
+
+class TestReport(unittest.TestCase):
+    """TestReport."""
+
+    def setUp(self):
+        """Setup a temp folder and a timer we control."""
+
+        self.tempdir = tempfile.mkdtemp()
+        self.timer = FakeTimer()
+        self.original_timer = report.compat.timer
+        report.compat.timer = self.timer
+
+    def tearDown(self):
+        """Cleanup."""
+
+        report.compat.timer = self.original_timer
+        shutil.rmtree(self.tempdir)
+
+    def test_percentile(self):
+        """Test nearest rank percentiles."""
+
+        values = list(range(1, 101))
+        self.assertEqual(report.get_percentile(values, 50), 50)
+        self.assertEqual(report.get_percentile(values, 95), 95)
+        self.assertEqual(report.get_percentile([1, 2, 3], 99), 3)
+        self.assertEqual(report.get_percentile([7], 50), 7)
+        self.assertEqual(report.get_percentile([], 50), 0.0)
+
+    def test_stopwatch(self):
+        """Test that stages only count their own time."""
+
+        watch = report.Stopwatch('test.md')
+        with watch.time('template'):
+            self.timer.now += 1
+            with watch.time('write'):
+                self.timer.now += 2
+            self.timer.now += 3
+            with watch.time('write'):
+                self.timer.now += 4
+        with watch.time('write'):
+            self.timer.now += 5
+        row = watch.finish(report.PASS)
+        self.assertEqual(row['stages'], {'template': 4, 'write': 11})
+        self.assertEqual(row['total'], 15)
+        self.assertEqual(row['status'], 'ok')
+
+    def test_report(self):
+        """Test that rows from elsewhere are merged into the totals and saved."""
+
+        pth = os.path.join(self.tempdir, 'report.json')
+        r = report.Report(pth)
+        worker = report.Report(None)
+        for index, source in enumerate(('a.md', 'b.md', 'c.md')):
+            watch = (r if index else worker).watch(source)
+            watch.size = 1024 * 1024
+            with watch.time('markdown'):
+                self.timer.now += index + 1
+            (r if index else worker).record(watch, report.FAIL if index == 2 else report.PASS)
+        r.merge(worker.collect())
+        self.assertEqual(worker.collect(), {'rows': [], 'extensions': {}, 'process': None})
+        r.save()
+
+        with open(pth) as f:
+            totals = json.load(f)['totals']
+        self.assertEqual(totals['files'], 3)
+        self.assertEqual(totals['failed'], 1)
+        self.assertEqual(totals['elapsed'], 6)
+        self.assertEqual(totals['files_per_second'], 0.5)
+        self.assertEqual(totals['mb_per_second'], 0.5)
+        self.assertEqual(totals['stages']['markdown'], {'total': 6, 'p50': 2, 'p95': 3, 'p99': 3})
+        self.assertEqual(totals['stages']['read']['total'], 0)
+
+    def test_extensions(self):
+        """Test that nested processor calls are only counted by the innermost one and merged by extension."""
+
+        r = report.Report(None, extensions=True)
+        timings = r.extension_timings
+
+        def pattern():
+            self.timer.now += 2
+
+        def inline():
+            self.timer.now += 1
+            timed_pattern()
+            timed_pattern()
+            self.timer.now += 1
+
+        timed_pattern = timings.wrap(pattern, 'pymdownx.mark', 'inlinePatterns.mark')
+        timings.wrap(inline, 'markdown', 'treeprocessors.inline')()
+        worker = report.ExtensionTimings()
+        worker.wrap(pattern, 'pymdownx.mark', 'inlinePatterns.mark')()
+        r.merge({'rows': [], 'extensions': worker.collect()})
+
+        extensions = r.get_report()['extensions']
+        self.assertEqual(extensions['markdown'], {
+            'time': 2, 'calls': 1, 'processors': {'treeprocessors.inline': {'time': 2, 'calls': 1}}
+        })
+        self.assertEqual(extensions['pymdownx.mark']['time'], 6)
+        self.assertEqual(extensions['pymdownx.mark']['calls'], 3)
+
+    @unittest.skipIf(tracemalloc is None, "Requires tracemalloc")
+    def test_memory(self):
+        """Test that the memory of each conversion and the growth of the process are tracked."""
+
+        if not tracemalloc.is_tracing():
+            self.addCleanup(tracemalloc.stop)
+        r = report.Report(None, memory=True)
+        held = []
+        for source in ('a.md', 'b.md'):
+            watch = r.watch(source)
+            held.append(bytearray(1024 * 1024))
+            temp = bytearray(4 * 1024 * 1024)
+            del temp
+            r.record(watch, report.PASS)
+
+        result = r.get_report()
+        rows = result['files']
+        for row in rows:
+            # Other objects come and go, so only roughly what was held on to
+            self.assertGreater(row['memory']['growth'], 512 * 1024)
+            self.assertLess(row['memory']['growth'], 2 * 1024 * 1024)
+            self.assertGreater(row['memory']['peak'], 4 * 1024 * 1024)
+        memory = result['memory']
+        self.assertEqual(len(memory['processes']), 1)
+        self.assertGreater(memory['growth'], 512 * 1024)
+        self.assertGreaterEqual(memory['top'][0]['size'], 1024 * 1024)
+        self.assertTrue(memory['top'][0]['site'].startswith(__file__.rstrip('c')))
+
+    @unittest.skipIf(tracemalloc is None, "Requires tracemalloc")
+    def test_memory_processes(self):
+        """Test that the allocation sites of worker processes are merged by site."""
+
+        if not tracemalloc.is_tracing():
+            self.addCleanup(tracemalloc.stop)
+        r = report.Report(None, memory=True)
+        for pid, top in (
+            (1, [{'site': 'a.py:1', 'size': 10, 'count': 1}, {'site': 'b.py:2', 'size': 5, 'count': 2}]),
+            (2, [{'site': 'b.py:2', 'size': 20, 'count': 3}])
+        ):
+            process = {'pid': pid, 'baseline': 0, 'current': 1, 'growth': 1, 'peak': 1, 'max_rss': None}
+            r.merge({'rows': [], 'extensions': {}, 'process': process})
+            r.merge({'rows': [], 'extensions': {}, 'process': dict(process, top=top)})
+
+        memory = r.get_report()['memory']
+        self.assertEqual([p['pid'] for p in memory['processes']], [1, 2])
+        self.assertFalse(any('top' in p for p in memory['processes']))
+        self.assertEqual(memory['growth'], 2)
+        self.assertEqual(
+            memory['top'],
+            [{'site': 'b.py:2', 'size': 25, 'count': 5}, {'site': 'a.py:1', 'size': 10, 'count': 1}]
+        )
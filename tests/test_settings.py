@@ -6,6 +6,9 @@ from pymdown import util
 from pymdown import settings
 from pymdown import logger
 import os
+import codecs
+import shutil
+import tempfile
 
 
 class TestSettings(unittest.TestCase):
@@ -219,3 +222,140 @@ class TestSettings(unittest.TestCase):
         ).get('test.md', frontmatter={"destination": dest})
         self.assertEqual(s.get('page').get('destination'), None)
         self.assertEqual(s.get('pymdown_settings').get('template'), None)
+
+    def test_shared_settings(self):
+        """Test that files without settings in their frontmatter share their settings."""
+
+        sobj = self._get_settings('critic.yml')
+        s1 = sobj.get('test1.md', frontmatter=OrderedDict())
+        s2 = sobj.get('test2.md', frontmatter=OrderedDict([('title', 'Test')]))
+        self.assertIs(s1['pymdown_settings'], s2['pymdown_settings'])
+        self.assertIsNot(s1['page'], s2['page'])
+        self.assertEqual(s1['page']['title'], 'test1')
+        self.assertEqual(s2['page']['title'], 'Test')
+
+    def test_copy_on_write(self):
+        """Test that frontmatter changes don't leak into the global settings or other files."""
+
+        sobj = self._get_settings('critic.yml')
+        s1 = sobj.get(
+            'test1.md',
+            frontmatter=OrderedDict(
+                [
+                    ('pymdown_settings', OrderedDict(
+                        [('markdown_extensions', OrderedDict(
+                            [('pymdownx.critic', OrderedDict([('mode', 'accept')]))]
+                        ))]
+                    )),
+                    ('css', ['test.css']),
+                    ('key', 'value')
+                ]
+            )
+        )
+        s2 = sobj.get('test2.md', frontmatter=OrderedDict())
+
+        self.assertEqual(s1['pymdown_settings']['markdown_extensions']['pymdownx.critic']['mode'], 'accept')
+        self.assertEqual(s1['page']['css'], ['test.css'])
+        self.assertEqual(s1['extra']['key'], 'value')
+        self.assertEqual(s2['pymdown_settings']['markdown_extensions']['pymdownx.critic']['mode'], 'reject')
+        self.assertEqual(s2['page']['css'], [])
+        self.assertNotIn('key', s2['extra'])
+        self.assertNotIn('pymdownx.pathconverter', sobj.settings['pymdown_settings']['markdown_extensions'])
+
+    def test_pygments_css_skipped(self):
+        """Test that the Pygments CSS is only loaded when the template uses it."""
+
+        s = self._get_settings('template.yml').get('test.md', frontmatter=OrderedDict())
+        self.assertTrue(s['page']['pygments_style'].startswith('<style>'))
+
+        s = self._get_settings('template.yml', force_no_template=True).get('test.md', frontmatter=OrderedDict())
+        self.assertIsNone(s['page']['pygments_style'])
+
+    def test_pygments_css_cache(self):
+        """Test that the Pygments CSS is generated once and cached on disk."""
+
+        cache_dir = tempfile.mkdtemp()
+        try:
+            settings._pygments_css.clear()
+            css = settings.get_pygment_style('default', 'cache-test', cache_dir)
+            self.assertIs(settings.get_pygment_style('default', 'cache-test', cache_dir), css)
+
+            cache_file = settings.get_pygment_style_cache('default', 'cache-test', cache_dir)
+            with codecs.open(cache_file, 'r', encoding='utf-8') as f:
+                self.assertEqual(f.read(), css)
+            with codecs.open(cache_file, 'w', encoding='utf-8') as f:
+                f.write('<style>\ncached\n</style>\n')
+
+            # A new process would pick up the cached CSS.
+            settings._pygments_css.clear()
+            self.assertEqual(
+                settings.get_pygment_style('default', 'cache-test', cache_dir),
+                '<style>\ncached\n</style>\n'
+            )
+        finally:
+            settings._pygments_css.clear()
+            shutil.rmtree(cache_dir)
+
+    def test_snapshot(self):
+        """Test that validated settings are loaded from a snapshot until the settings file changes."""
+
+        tempdir = tempfile.mkdtemp()
+        yaml_load = util.yaml_load
+        try:
+            settings_path = os.path.join(tempdir, 'pymdown.yml')
+            cache_dir = os.path.join(tempdir, 'cache')
+            with codecs.open(settings_path, 'w', encoding='utf-8') as f:
+                f.write(
+                    'markdown_extensions:\n'
+                    '  markdown.extensions.toc:\n'
+                    '    slugify: !!python/name:pymdownx.slugs.uslugify\n'
+                )
+            s = settings.Settings(settings_path=settings_path, cache=cache_dir)
+            s.read_settings()
+            parsed = s.settings['pymdown_settings']
+
+            def fail(*args, **kwargs):
+                """YAML should not be parsed."""
+
+                raise AssertionError('Settings were parsed')
+
+            util.yaml_load = fail
+            s = settings.Settings(settings_path=settings_path, cache=cache_dir)
+            s.read_settings()
+            snapshot = s.settings['pymdown_settings']
+            slugify = snapshot['markdown_extensions']['markdown.extensions.toc']['slugify']
+            self.assertIsInstance(slugify, util.PythonName)
+            self.assertIs(slugify.resolve(), parsed['markdown_extensions']['markdown.extensions.toc']['slugify'])
+            self.assertEqual(util.fingerprint(snapshot), util.fingerprint(parsed))
+
+            util.yaml_load = yaml_load
+            with codecs.open(settings_path, 'w', encoding='utf-8') as f:
+                f.write('use_jinja2: true\n')
+            os.utime(settings_path, (1, 1))
+            s = settings.Settings(settings_path=settings_path, cache=cache_dir)
+            s.read_settings()
+            self.assertTrue(s.settings['pymdown_settings']['use_jinja2'])
+        finally:
+            util.yaml_load = yaml_load
+            shutil.rmtree(tempdir)
+
+    def test_snapshot_prune(self):
+        """Test that only the most recently saved snapshots are kept."""
+
+        tempdir = tempfile.mkdtemp()
+        try:
+            for i in range(4):
+                snapshot_path = os.path.join(tempdir, '%d.json' % i)
+                settings.save_snapshot(snapshot_path, 'key', OrderedDict())
+                os.utime(snapshot_path, (i, i))
+            settings.prune_snapshots(tempdir, limit=2)
+            self.assertEqual(sorted(os.listdir(tempdir)), ['2.json', '3.json'])
+            self.assertEqual(settings.load_snapshot(os.path.join(tempdir, '3.json'), 'key'), OrderedDict())
+        finally:
+            shutil.rmtree(tempdir)
+
+    def test_package_version(self):
+        """Test that package versions are read from the installed metadata."""
+
+        self.assertIsNotNone(settings.get_package_version('Markdown'))
+        self.assertIsNone(settings.get_package_version('not-a-real-package'))
@@ -0,0 +1,115 @@
+"""Test the template lib."""
+from __future__ import unicode_literals
+import unittest
+import base64
+import codecs
+import os
+import shutil
+import tempfile
+from pymdown import template
+
+
+class TestTemplate(unittest.TestCase):
+    """TestTemplate."""
+
+    def setUp(self):
+        """Setup temp folders with a template and a text resource each."""
+
+        self.tempdir = tempfile.mkdtemp()
+        self.folders = []
+        for name in ('a', 'b'):
+            folder = os.path.join(self.tempdir, name)
+            os.mkdir(folder)
+            self._write(os.path.join(folder, 'text.txt'), 'text %s' % name)
+            self.folders.append(folder)
+        self.template = os.path.join(self.tempdir, 'template.html')
+        self._write(self.template, '{{ "text.txt"|gettxt }}: {{ page.content }}', 100)
+
+    def tearDown(self):
+        """Cleanup."""
+
+        shutil.rmtree(self.tempdir)
+
+    def _write(self, name, text, mtime=None):
+        """Write the file and set its mtime."""
+
+        with codecs.open(name, 'w', encoding='utf-8') as f:
+            f.write(text)
+        if mtime is not None:
+            os.utime(name, (mtime, mtime))
+
+    def _render(self, basepath, content):
+        """Render the template for a document."""
+
+        t = template.Template(basepath=basepath)
+        return t.render(t.get_template(self.template), page={'content': content}, settings={}, extra={})
+
+    def test_shared_environment(self):
+        """Test that environments are shared by delimiters."""
+
+        tags = {'block': ('<%', '%>')}
+        self.assertIs(template.Template().env, template.Template().env)
+        self.assertIs(template.Template(template_tags=tags).env, template.Template(template_tags=tags).env)
+        self.assertIsNot(template.Template().env, template.Template(template_tags=tags).env)
+
+    def test_filters(self):
+        """Test that filters run against the document being rendered."""
+
+        self.assertEqual(self._render(self.folders[0], 'one'), 'text a: one')
+        self.assertEqual(self._render(self.folders[1], 'two'), 'text b: two')
+
+    def test_modified(self):
+        """Test that compiled templates are reused until the template is modified."""
+
+        t = template.Template(basepath=self.folders[0])
+        compiled = t.get_template(self.template)
+        self.assertIs(template.Template().get_template(self.template), compiled)
+        self.assertEqual(t.dependencies, set([self.template]))
+
+        self._write(self.template, 'changed: {{ page.content }}', 200)
+        self.assertEqual(self._render(self.folders[0], 'one'), 'changed: one')
+
+    def test_missing(self):
+        """Test that a missing template just outputs the content."""
+
+        t = template.Template()
+        self.assertEqual(
+            t.render(t.get_template(os.path.join(self.tempdir, 'missing.html')), page={'content': 'content'}),
+            'content'
+        )
+        self.assertEqual(t.dependencies, set())
+
+    def test_resources(self):
+        """Test that included resources are read once per version of the file."""
+
+        css = os.path.join(self.folders[0], 'style.css')
+        self._write(css, 'p {}', 100)
+        t = template.Template(basepath=self.folders[0])
+        self.assertEqual(t.get_css('^style.css'), '<style>\np {}\n</style>\n')
+
+        # Changing the content without changing the mtime or size is not noticed.
+        self._write(css, 'a {}', 100)
+        self.assertEqual(t.get_css('^style.css'), '<style>\np {}\n</style>\n')
+
+        self._write(css, 'a {}', 200)
+        self.assertEqual(t.get_css('^style.css'), '<style>\na {}\n</style>\n')
+        self.assertEqual(t.get_txt('style.css'), 'a {}')
+        self.assertEqual(t.dependencies, set([css]))
+
+    def test_embed_image(self):
+        """Test that embedded images are cached and that large images are linked."""
+
+        png = os.path.join(self.folders[0], 'image.png')
+        with open(png, 'wb') as f:
+            f.write(b'\x89PNG' * 1000)
+        os.utime(png, (100, 100))
+        t = template.Template(basepath=self.folders[0])
+        data = t.embed_image('image.png')
+        self.assertEqual(data, 'data:image/png;base64,' + base64.b64encode(b'\x89PNG' * 1000).decode('ascii'))
+        self.assertIs(template.Template(basepath=self.folders[0]).embed_image('image.png'), data)
+        self.assertEqual(t.dependencies, set([png]))
+
+        t = template.Template(basepath=self.folders[0], embed_image_max_size=1000)
+        self.assertEqual(t.embed_image('image.png'), t.get_path_url('image.png'))
+        self.assertEqual(t.embed_image(' image.png;utf-8 '), t.get_path_url('image.png'))
+        self.assertEqual(t.dependencies, set([png]))
@@ -7,6 +7,8 @@ from pymdown import util
 from . import common
 import os
 import codecs
+import shutil
+import tempfile
 from pymdown import compat
 
 
@@ -48,6 +50,50 @@ class TestFrontmatter(unittest.TestCase):
         self.assertTrue(isinstance(result["test"]["key1"], compat.unicode_type))
         self.assertTrue(isinstance(result["test"]["key2"], compat.unicode_type))
 
+    def test_yaml_loader_cached(self):
+        """Test that the custom loader is only created once."""
+
+        self.assertIs(util.get_yaml_loader(), util.get_yaml_loader())
+        self.assertIsNot(util.get_yaml_loader(), util.get_yaml_loader(safe=True))
+
+    def test_frontmatter(self):
+        """Test finding frontmatter."""
+
+        self.assertEqual(
+            util.get_frontmatter('---\r\ntitle: Title\r\n...\r\ncontent'),
+            (OrderedDict([('title', 'Title')]), 'content')
+        )
+        self.assertEqual(util.get_frontmatter('---\n---\ncontent'), (OrderedDict(), 'content'))
+
+        # Not frontmatter
+        for text in ('---\n\ntitle: Title\n---\n', '---\ntitle: Title\n---', '---\ntitle: Title\n--- \n'):
+            self.assertEqual(util.get_frontmatter(text), (OrderedDict(), text))
+
+    def test_json_frontmatter(self):
+        """Test finding JSON frontmatter."""
+
+        expected = OrderedDict([('title', 'Title'), ('pymdown_settings', OrderedDict([('use_jinja2', True)]))])
+        self.assertEqual(
+            util.get_frontmatter(';;;\n{"title": "Title", "pymdown_settings": {"use_jinja2": true}}\n;;;\ncontent'),
+            (expected, 'content')
+        )
+        self.assertEqual(
+            util.get_frontmatter('{\n  "title": "Title",\n  "pymdown_settings": {"use_jinja2": true}\n}\r\ncontent'),
+            (expected, 'content')
+        )
+
+        # Not frontmatter
+        for text in ('{{ page.title }}\n', '{"title": "Title"} content\n', ';;;\n[1, 2]\n;;;\n'):
+            self.assertEqual(util.get_frontmatter(text), (OrderedDict(), text))
+
+    def test_frontmatter_max_size(self):
+        """Test that frontmatter is only looked for up to the max size."""
+
+        text = '---\n%s---\ncontent' % ('key: value\n' * 10)
+        self.assertEqual(util.get_frontmatter(text, 110)[1], 'content')
+        self.assertEqual(util.get_frontmatter(text, 100)[1], text)
+        self.assertEqual(util.get_frontmatter(text, 0)[1], 'content')
+
 
 class TestResources(unittest.TestCase):
     """TestResources."""
@@ -74,3 +120,115 @@ class TestResources(unittest.TestCase):
         self.assertEqual(text1, text3)
         self.assertEqual(text2, text3)
         self.assertEqual(None, text4)
+
+
+class TestUserFiles(unittest.TestCase):
+    """TestUserFiles."""
+
+    def setUp(self):
+        """Point the user folder at a temp folder."""
+
+        self.tempdir = tempfile.mkdtemp()
+        self.folder = os.path.join(self.tempdir, 'config', 'PyMdown')
+        self.get_user_folder = util.get_user_folder
+        util.get_user_folder = lambda: self.folder
+        self._new_process()
+
+    def tearDown(self):
+        """Restore the user folder and cleanup."""
+
+        util.get_user_folder = self.get_user_folder
+        self._new_process()
+        shutil.rmtree(self.tempdir)
+
+    def _new_process(self):
+        """Forget what this process already resolved."""
+
+        util._user_path = None
+        util._unpacked = False
+
+    def test_unpack(self):
+        """Test unpacking, the stamp, and restoring files once the stamp is removed."""
+
+        stamp = os.path.join(self.folder, util.USER_STAMP % util.version)
+        css = os.path.join(self.folder, 'default', 'markdown.css')
+
+        util.unpack_user_files()
+        self.assertEqual(util.get_user_path(), self.folder)
+        self.assertTrue(os.path.exists(stamp))
+        self.assertTrue(os.path.exists(css))
+        self.assertTrue(os.path.exists(os.path.join(self.folder, 'version.txt')))
+        self.assertFalse(os.path.exists(os.path.join(self.folder, 'default', 'licenses.txt')))
+
+        # The stamp is all that is checked.
+        os.remove(css)
+        self._new_process()
+        util.unpack_user_files()
+        self.assertEqual(util.get_user_path(), self.folder)
+        self.assertFalse(os.path.exists(css))
+
+        # Without the stamp, missing files are restored.
+        os.remove(stamp)
+        self._new_process()
+        util.unpack_user_files()
+        self.assertTrue(os.path.exists(css))
+        self.assertTrue(os.path.exists(stamp))
+
+    def test_unpack_once(self):
+        """Test that nothing is checked again in the same process."""
+
+        util.unpack_user_files()
+        shutil.rmtree(self.folder)
+        util.unpack_user_files()
+        self.assertFalse(os.path.exists(self.folder))
+
+
+class TestPathCache(unittest.TestCase):
+    """TestPathCache."""
+
+    def setUp(self):
+        """Setup a temp folder with a file and a folder."""
+
+        self.tempdir = tempfile.mkdtemp()
+        self.file = os.path.join(self.tempdir, 'file.txt')
+        self.folder = os.path.join(self.tempdir, 'folder')
+        with open(self.file, 'w') as f:
+            f.write('text')
+        os.mkdir(self.folder)
+        util.clear_path_cache()
+
+    def tearDown(self):
+        """Cleanup."""
+
+        util.set_path_listings(False)
+        util.clear_path_cache()
+        shutil.rmtree(self.tempdir)
+
+    def _check(self):
+        """Check lookups and that they are remembered until the cache is cleared."""
+
+        missing = os.path.join(self.tempdir, 'missing.txt')
+        self.assertTrue(util.isfile(self.file))
+        self.assertFalse(util.isdir(self.file))
+        self.assertTrue(util.isdir(self.folder))
+        self.assertTrue(util.exists(self.folder))
+        self.assertFalse(util.exists(missing))
+
+        with open(missing, 'w') as f:
+            f.write('text')
+        self.assertFalse(util.exists(missing))
+        util.clear_path_cache()
+        self.assertTrue(util.isfile(missing))
+
+    def test_stat(self):
+        """Test lookups with stat."""
+
+        self._check()
+
+    def test_listings(self):
+        """Test lookups from directory listings."""
+
+        util.set_path_listings(True)
+        self._check()
+        if compat.scandir is not None:
+            self.assertIn(self.tempdir, util._listings)
@@ -0,0 +1,157 @@
+"""Test the watch lib."""
+from __future__ import unicode_literals
+import unittest
+import os
+import shutil
+import tempfile
+from pymdown import watch
+
+
+class Converter(object):
+    """Converter that records what it was asked to convert."""
+
+    class Config(object):
+        """Config."""
+
+    def __init__(self, settings_path):
+        """Initialize."""
+
+        self.config = self.Config()
+        self.config.settings_path = settings_path
+        self.dependencies = {}
+        self.manifest = None
+        self.report = None
+        self.profiler = None
+        self.converted = []
+        self.reloads = 0
+        self.failing = set()
+
+    def load_settings(self):
+        """Count reloads."""
+
+        self.reloads += 1
+
+    def convert_file(self, source):
+        """Record the source and fail if asked to."""
+
+        self.converted.append(source)
+        return watch.FAIL if source in self.failing else watch.PASS
+
+
+class Report(object):
+    """Report (or profiler) that counts how many times it was saved."""
+
+    per_file = False
+
+    def __init__(self):
+        """Initialize."""
+
+        self.saves = 0
+
+    def save(self):
+        """Count saves."""
+
+        self.saves += 1
+
+
+class TestWatcher(unittest.TestCase):
+    """TestWatcher."""
+
+    def setUp(self):
+        """Setup temp folder with sources, a template, and settings."""
+
+        self.tempdir = tempfile.mkdtemp()
+        self.files = {}
+        for name in ('a.md', 'b.md', 'c.md', 'template.html', 'settings.yml'):
+            self.files[name] = os.path.join(self.tempdir, name)
+            self._touch(name, 100)
+        self.converter = Converter(self.files['settings.yml'])
+        self.converter.dependencies = {
+            self.files['a.md']: set([self.files['template.html']]),
+            self.files['b.md']: set([self.files['template.html']]),
+            self.files['c.md']: set()
+        }
+        self.watcher = watch.Watcher(
+            self.converter,
+            [self.files['a.md'], self.files['b.md'], self.files['c.md']],
+            focus=self.files['b.md']
+        )
+        self.watcher.scan()
+
+    def tearDown(self):
+        """Remove temp folder."""
+
+        shutil.rmtree(self.tempdir)
+
+    def _touch(self, name, mtime):
+        """Write the file with the given mtime."""
+
+        with open(self.files[name], 'w') as f:
+            f.write(name)
+        os.utime(self.files[name], (mtime, mtime))
+
+    def test_source(self):
+        """Test that only the changed source is converted."""
+
+        self._touch('c.md', 200)
+        self.watcher.process(self.watcher.scan())
+        self.assertEqual(self.converter.converted, [self.files['c.md']])
+
+    def test_dependency(self):
+        """Test that sources using a changed file are converted with the focus file first."""
+
+        self._touch('a.md', 300)
+        self._touch('template.html', 200)
+        self.watcher.process(self.watcher.scan())
+        self.assertEqual(self.converter.converted, [self.files['b.md'], self.files['a.md']])
+
+    def test_settings(self):
+        """Test that a settings change reloads settings and converts everything."""
+
+        self._touch('settings.yml', 200)
+        self.watcher.process(self.watcher.scan())
+        self.assertEqual(self.converter.reloads, 1)
+        self.assertEqual(
+            self.converter.converted,
+            [self.files['b.md'], self.files['a.md'], self.files['c.md']]
+        )
+
+    def test_run_status(self):
+        """Test that the status of the first build is returned when interrupted."""
+
+        def interrupt():
+            """Stop watching."""
+
+            raise KeyboardInterrupt
+
+        self.watcher.wait = interrupt
+        self.assertEqual(self.watcher.run(), watch.PASS)
+        self.converter.failing.add(self.files['c.md'])
+        self.assertEqual(self.watcher.run(), watch.FAIL)
+
+    def test_report(self):
+        """Test that the timings report is saved after each rebuild, even an interrupted one."""
+
+        self.converter.report = Report()
+        self._touch('c.md', 200)
+        self.watcher.process(self.watcher.scan())
+        self.assertEqual(self.converter.report.saves, 1)
+
+        def interrupt(source):
+            """Stop watching in the middle of a rebuild."""
+
+            raise KeyboardInterrupt
+
+        self.converter.convert_file = interrupt
+        self._touch('c.md', 300)
+        with self.assertRaises(KeyboardInterrupt):
+            self.watcher.process(self.watcher.scan())
+        self.assertEqual(self.converter.report.saves, 2)
+
+    def test_profile(self):
+        """Test that the profile is saved after each rebuild."""
+
+        self.converter.profiler = Report()
+        self._touch('c.md', 200)
+        self.watcher.process(self.watcher.scan())
+        self.assertEqual(self.converter.profiler.saves, 1)